@@ -3,8 +3,10 @@ Liquidity Engine - Main Application
 Personal & Business Finance Management System
 """
 import streamlit as st
+from datetime import date
 import config
 from utils import database as db
+from utils.bootstrap import ensure_database
 
 # Page configuration
 st.set_page_config(
@@ -56,6 +58,8 @@ def check_password():
 if not check_password():
     st.stop()
 
+ensure_database()
+
 # ============ MAIN APP (only shows after password) ============
 
 # Custom CSS for mobile-friendly display
@@ -86,9 +90,10 @@ with st.sidebar:
     
     st.divider()
     
-    total_debt = db.get_total_debt()
-    monthly_obligations = db.get_monthly_obligations()
-    rewards_value = db.get_total_rewards_value()
+    snapshot = db.get_liquidity_snapshot()
+    total_debt = snapshot.total_debt
+    monthly_obligations = snapshot.monthly_obligations
+    rewards_value = snapshot.rewards_value
     
     st.metric("Debt", f"${total_debt/1000:.0f}K")
     st.metric("Due", f"${monthly_obligations/1000:.0f}K")
@@ -110,25 +115,23 @@ st.divider()
 
 # Debt breakdown - collapsible
 with st.expander("📊 Debt Breakdown", expanded=True):
-    debt_by_type = db.get_debt_by_type()
-    for row in debt_by_type:
-        account_type = row['account_type'].replace('_', ' ').title()
-        st.markdown(f"**{account_type}:** ${row['total']:,.0f} ({row['count']} accounts)")
+    for account_type, total, count in snapshot.debt_by_type:
+        account_type = account_type.replace('_', ' ').title()
+        st.markdown(f"**{account_type}:** ${total:,.0f} ({count} accounts)")
 
 # Upcoming payments - collapsible
 with st.expander("📅 Upcoming Payments", expanded=False):
-    upcoming = db.get_upcoming_payments(days=30)
+    upcoming = db.get_upcoming_payments(config.UPCOMING_PAYMENT_DAYS)
     if upcoming:
-        for payment in upcoming[:8]:
-            if payment['minimum_payment'] > 0:
-                st.markdown(f"• **{payment['name'][:20]}**: ${payment['minimum_payment']:,.0f} (Day {payment['due_day']})")
+        for payment in upcoming:
+            due = "today" if payment['days_until'] == 0 else date.fromisoformat(payment['due_date']).strftime("%a %b %d")
+            st.markdown(f"• **{payment['name'][:20]}**: ${payment['minimum_payment']:,.0f} ({due})")
     else:
-        st.caption("No upcoming payments")
+        st.caption(f"No payments due in the next {config.UPCOMING_PAYMENT_DAYS} days")
 
 # Rewards - collapsible
 with st.expander("✨ Rewards Points", expanded=False):
-    rewards = db.get_all_rewards()
-    for r in rewards:
+    for r in snapshot.rewards:
         value = r['current_balance'] * r['point_value']
         st.markdown(f"**{r['program_name'][:20]}**: {r['current_balance']:,} pts (${value:,.0f})")
 
@@ -0,0 +1,118 @@
+"""
+Partner draw import benchmark: vectorized importer vs. the old iterrows loop.
+Usage: python3 benchmarks/bench_draw_import.py [rows]
+
+Builds a synthetic 'Draw 2025' workbook shaped like MK_Private.xlsx (Katie in
+columns 0-3, Mark in 5-7, gaps in dates and rows), imports it both ways into
+throwaway databases and checks that both produce the same draws.
+"""
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import config
+
+def build_workbook(path, rows, seed=7):
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Draw 2025')
+    sheet.append(['Date', 'Katie', 'Amount', 'Notes', None, 'Date', 'Mark', 'Amount'])
+    day = date(2025, 1, 1)
+    for i in range(rows):
+        if rng.random() < 0.3:
+            day += timedelta(days=1)
+        katie_date = datetime.combine(day, datetime.min.time()) if rng.random() < 0.6 else None
+        katie = [katie_date, f"Draw {i}", round(rng.uniform(50, 5000), 2),
+                 'note' if rng.random() < 0.1 else None] if rng.random() < 0.8 else [katie_date, None, None, None]
+        mark_date = datetime.combine(day, datetime.min.time()) if rng.random() < 0.2 else None
+        mark = [mark_date, f"Mark draw {i}", round(rng.uniform(50, 5000), 2)] if rng.random() < 0.7 else [None, None, None]
+        sheet.append(katie + [None] + mark)
+    workbook.save(path)
+
+def legacy_import(filepath, conn):
+    """The previous implementation: pandas read of the whole sheet, two iterrows passes."""
+    import pandas as pd
+
+    df = pd.read_excel(filepath, sheet_name='Draw 2025', header=None)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM partner_draws")
+
+    def as_text(value):
+        return value.strftime('%Y-%m-%d') if isinstance(value, datetime) else str(value)
+
+    last = None
+    for _, row in df.iloc[1:].iterrows():
+        if pd.isna(row[1]) or pd.isna(row[2]):
+            continue
+        if pd.notna(row[0]):
+            last = as_text(row[0])
+        cursor.execute("INSERT INTO partner_draws (partner, draw_date, description, amount, notes) VALUES (?, ?, ?, ?, ?)",
+                       ('Katie', last or '2024-01-01', str(row[1]), float(row[2]), row[3] if pd.notna(row[3]) else None))
+    last = None
+    for _, row in df.iloc[1:].iterrows():
+        if pd.isna(row[6]) or pd.isna(row[7]):
+            continue
+        if pd.notna(row[5]):
+            last = as_text(row[5])
+        elif pd.notna(row[0]):
+            last = as_text(row[0])
+        cursor.execute("INSERT INTO partner_draws (partner, draw_date, description, amount, notes) VALUES (?, ?, ?, ?, ?)",
+                       ('Mark', last or '2024-01-01', str(row[6]), float(row[7]), None))
+    conn.commit()
+
+def draws(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("""
+            SELECT partner, draw_date, description, amount, notes FROM partner_draws
+            ORDER BY partner, description
+        """).fetchall()
+    finally:
+        conn.close()
+
+def main(rows=100_000):
+    tmp = Path(tempfile.mkdtemp())
+    workbook = tmp / "draws.xlsx"
+    started = time.perf_counter()
+    build_workbook(workbook, rows)
+    print(f"Built {rows:,}-row workbook in {time.perf_counter() - started:.1f}s")
+
+    config.DATABASE_PATH = tmp / "vectorized.db"
+    from utils import database as db
+    db.bootstrap()
+    started = time.perf_counter()
+    counts = db.import_partner_draws_from_excel(str(workbook))
+    vectorized = time.perf_counter() - started
+    started = time.perf_counter()
+    db._read_draw_sheet(str(workbook))
+    read_only = time.perf_counter() - started
+    db.close_pool()
+
+    legacy_db = tmp / "legacy.db"
+    config.DATABASE_PATH = legacy_db
+    db.init_database()
+    db.close_pool()
+    conn = sqlite3.connect(legacy_db)
+    started = time.perf_counter()
+    legacy_import(str(workbook), conn)
+    legacy = time.perf_counter() - started
+    conn.close()
+
+    same = draws(tmp / "vectorized.db") == draws(legacy_db)
+    print(f"  draws imported       Katie {counts['Katie']:,}, Mark {counts['Mark']:,}")
+    print(f"  legacy (iterrows)    {legacy:8.2f} s")
+    print(f"  vectorized           {vectorized:8.2f} s  ({legacy / vectorized:.1f}x)")
+    print(f"    sheet read         {read_only:8.2f} s  (openpyxl read-only XML parse)")
+    print(f"  identical results    {same}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
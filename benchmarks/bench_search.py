@@ -0,0 +1,93 @@
+"""
+Search benchmark: FTS5 index vs. LIKE '%term%' over transaction descriptions.
+Usage: python3 benchmarks/bench_search.py [rows]
+
+Loads synthetic card transactions into a throwaway database the way the CSV
+importer does (staged, then one INSERT ... SELECT, so the FTS triggers fill
+the index), then times the same searches both ways.
+"""
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import config
+
+MERCHANTS = [
+    "AMAZON MKTPL", "AMAZON PRIME", "STARBUCKS", "UBER TRIP", "UBER EATS", "SHELL OIL",
+    "DELTA AIR", "MARRIOTT", "WHOLE FOODS", "TRADER JOE'S", "COSTCO WHSE", "TARGET",
+    "FACEBK ADS", "GOOGLE ADS", "GUSTO", "ADOBE", "NETFLIX", "SPOTIFY", "HOME DEPOT",
+]
+RARE_MERCHANTS = ["CHEWY", "ETSY", "PELOTON"]  # about 1 row in 1,500 each
+CITIES = ["SEATTLE WA", "NEW YORK NY", "AUSTIN TX", "DENVER CO", "MIAMI FL", "CHICAGO IL"]
+
+# (label, search box text, equivalent LIKE pattern)
+SEARCHES = [
+    ("common word", "amazon", "%amazon%"),
+    ("two words", "uber eats", "%uber eats%"),
+    ("prefix", "marr", "%marr%"),
+    ("rare word", "peloton", "%peloton%"),
+    ("no match", "zzyzx", "%zzyzx%"),
+]
+
+def generate(rows, seed=11):
+    rng = random.Random(seed)
+    for i in range(rows):
+        merchant = rng.choice(RARE_MERCHANTS) if rng.random() < 0.002 else rng.choice(MERCHANTS)
+        yield (1, f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+               f"{merchant} #{rng.randint(1000, 99999)} {rng.choice(CITIES)}",
+               -round(rng.uniform(1, 900), 2), f"bench-{i}")
+
+def timed(fn, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), result
+
+def main(rows=1_000_000):
+    config.DATABASE_PATH = Path(tempfile.mkdtemp()) / "search.db"
+    from utils import database as db
+    db.bootstrap()
+
+    started = time.perf_counter()
+    with db.get_connection() as conn:
+        conn.execute("CREATE TEMP TABLE staged (account_id, transaction_date, description, amount, import_hash)")
+        conn.executemany("INSERT INTO staged VALUES (?, ?, ?, ?, ?)", generate(rows))
+        conn.execute("""
+            INSERT INTO transactions (account_id, transaction_date, description, amount, import_hash)
+            SELECT * FROM staged
+        """)
+        conn.commit()
+    print(f"Loaded {rows:,} transactions (with FTS triggers) in {time.perf_counter() - started:.1f}s")
+
+    print(f"  {'search':<12} {'LIKE ms':>10} {'FTS ms':>10} {'speedup':>8} {'matches':>9}")
+    with db.get_connection() as conn:
+        for label, text, pattern in SEARCHES:
+            like_s, like_n = timed(lambda: conn.execute(
+                "SELECT COUNT(*) FROM transactions WHERE description LIKE ?", (pattern,)).fetchone()[0])
+            fts_s, fts_n = timed(lambda: conn.execute(
+                "SELECT COUNT(*) FROM transactions_fts WHERE transactions_fts MATCH ?",
+                (db.fts_query(text),)).fetchone()[0])
+            print(f"  {label:<12} {like_s * 1000:10.1f} {fts_s * 1000:10.1f} {like_s / fts_s:7.0f}x {fts_n:9,}"
+                  + ("" if fts_n == like_n else f"  (LIKE: {like_n:,})"))
+
+    # What a page runs: the first 50 results. LIKE can stop early when the term
+    # is common; BM25 ranking has to score every match.
+    print(f"  {'top 50':<12} {'LIKE ms':>10} {'FTS ms':>10}  (FTS ranked by relevance, LIKE newest first)")
+    for text in ("chewy", "amazon"):
+        with db.get_connection() as conn:
+            like_s, _ = timed(lambda: conn.execute(
+                "SELECT * FROM transactions WHERE description LIKE ? ORDER BY transaction_date DESC LIMIT 50",
+                (f"%{text}%",)).fetchall())
+        fts_s, _ = timed(lambda: db.search_transactions.__wrapped__(text, limit=50))
+        print(f"  {text:<12} {like_s * 1000:10.1f} {fts_s * 1000:10.1f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
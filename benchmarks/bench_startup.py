@@ -0,0 +1,57 @@
+"""
+Startup cost benchmark: what a cold Streamlit process pays before first render.
+Usage: python3 benchmarks/bench_startup.py [runs]
+
+Each measurement runs in a fresh interpreter against a throwaway database,
+so nothing is served from a warm module cache.
+"""
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROBE = """
+import sys, time
+sys.path.insert(0, {root!r})
+import config
+from pathlib import Path
+config.DATABASE_PATH = Path({db!r})
+t0 = time.perf_counter()
+from utils import database as db
+t1 = time.perf_counter()
+db.bootstrap()
+t2 = time.perf_counter()
+db.bootstrap()
+t3 = time.perf_counter()
+print(t1 - t0, t2 - t1, t3 - t2, 'pandas' in sys.modules)
+"""
+
+def run_probe(db_path):
+    code = PROBE.format(root=str(ROOT), db=str(db_path))
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    import_s, bootstrap_s, repeat_s, pandas_loaded = out.split()
+    return float(import_s), float(bootstrap_s), float(repeat_s), pandas_loaded == 'True'
+
+def main(runs=5):
+    tmp = Path(tempfile.mkdtemp())
+    cold, warm = [], []
+    for i in range(runs):
+        db_path = tmp / f"cold_{i}.db"
+        cold.append(run_probe(db_path))   # empty file: full migration + seed
+        warm.append(run_probe(db_path))   # already current: one PRAGMA read
+
+    def ms(samples, col):
+        return statistics.median(s[col] for s in samples) * 1000
+
+    print(f"Startup benchmark ({runs} runs, median)")
+    print(f"  import utils.database        {ms(warm, 0):8.2f} ms")
+    print(f"  bootstrap, new database       {ms(cold, 1):8.2f} ms")
+    print(f"  bootstrap, current database   {ms(warm, 1):8.2f} ms")
+    print(f"  bootstrap, repeat in process  {ms(warm, 2):8.3f} ms")
+    print(f"  pandas imported at startup    {any(s[3] for s in cold + warm)}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
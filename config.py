@@ -13,6 +13,13 @@ RULES_DIR = BASE_DIR / "rules"
 # Database
 DATABASE_PATH = DATA_DIR / "liquidity.db"
 
+# Connection pool & SQLite tuning
+DB_POOL_SIZE = 8                # Max pooled connections per process
+DB_POOL_TIMEOUT = 5.0           # Seconds to wait for a free connection before opening an overflow one
+DB_BUSY_TIMEOUT_MS = 5000       # How long a writer waits on a locked database
+DB_CACHE_SIZE_KB = 16384        # Page cache per connection (16 MB)
+DB_MMAP_SIZE = 128 * 1024 * 1024  # Memory-mapped I/O window (128 MB)
+
 # Ensure directories exist
 DATA_DIR.mkdir(exist_ok=True)
 IMPORTS_DIR.mkdir(exist_ok=True)
@@ -27,9 +34,33 @@ CASH_WARNING_THRESHOLD = 50000  # Yellow zone below this
 CASH_DANGER_THRESHOLD = 20000   # Red zone below this
 CREDIT_UTILIZATION_WARNING = 0.50  # 50%
 CREDIT_UTILIZATION_DANGER = 0.80   # 80%
+UPCOMING_PAYMENT_DAYS = 14         # Window for the Home page's upcoming payments
+
+# Import Settings
+IMPORT_CHUNK_SIZE = 5000  # Rows per executemany batch when streaming bank CSVs
+TRIAGE_BATCH_SIZE = 25    # Description groups fetched per triage queue page
+
+# Rule Learning
+RULE_MIN_SUPPORT = 3        # Manual categorizations a learned rule must be based on
+RULE_MIN_CONFIDENCE = 0.80  # Smoothed share of a feature's matches that agree on one category
+
+# Recurring Detection
+RECURRING_LOOKBACK_DAYS = 1100  # History scanned for recurring charges and deposits (3 years + slack)
+RECURRING_AMOUNT_CV = 0.25      # Max spread of amounts (std / mean) for a series to count
+RECURRING_MIN_REGULARITY = 0.70 # Share of gaps that must match the inferred frequency
+
+# Background Jobs
+JOB_WORKERS = 2  # Imports and maintenance jobs running at once; the rest wait in the queue
+
+# AI Query
+ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")  # Optional: model fallback for questions the offline matcher can't place
+AI_QUERY_MODEL = os.getenv("AI_QUERY_MODEL", "claude-3-5-haiku-latest")
 
 # Forecast Settings
 FORECAST_DAYS = 90
+SCENARIO_PATHS = 10000        # Monte Carlo paths per what-if run
+SCENARIO_CHUNK_PATHS = 5000   # Paths per worker when a run is split across processes
+PAYOFF_MAX_MONTHS = 360       # Debt payoff simulations stop after this many months
 
 # Buckets
 BUCKETS = ["ENGINE", "OVERHEAD", "LIFESTYLE"]
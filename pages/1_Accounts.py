@@ -3,7 +3,6 @@ Liquidity Engine - Accounts Management
 Mobile-friendly with credit limits display
 """
 import streamlit as st
-import pandas as pd
 from datetime import date, datetime
 import sys
 from pathlib import Path
@@ -13,6 +12,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import config
 from utils import database as db
 from utils.auth import require_auth
+from utils.bootstrap import ensure_database
 
 st.set_page_config(
     page_title="Accounts | Liquidity Engine",
@@ -21,6 +21,7 @@ st.set_page_config(
 )
 
 require_auth()
+ensure_database()
 
 # Custom CSS for mobile-friendly compact display
 st.markdown("""
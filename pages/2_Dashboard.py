@@ -3,8 +3,9 @@ Liquidity Engine - Dashboard (The Pulse)
 Mobile-friendly financial overview
 """
 import streamlit as st
-import pandas as pd
 import plotly.graph_objects as go
+import numpy as np
+from datetime import date, timedelta
 import sys
 from pathlib import Path
 
@@ -12,11 +13,14 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import config
 from utils import database as db
+from utils import balance_history
 from utils.auth import require_auth
+from utils.bootstrap import ensure_database
 
 st.set_page_config(page_title="Dashboard | Liquidity Engine", page_icon="📊", layout="wide")
 
 require_auth()
+ensure_database()
 
 # Custom CSS for mobile-friendly compact display
 st.markdown("""
@@ -43,32 +47,23 @@ st.markdown("""
 
 st.markdown("## 📊 Dashboard")
 
-# Get all accounts
-accounts = db.get_all_accounts()
+snapshot = db.get_liquidity_snapshot()
 
-# Calculate totals by type
-debt_by_type = {}
-credit_cards = []
-for acc in accounts:
-    acc_type = acc['account_type']
-    balance = acc['current_balance']
-    
-    if acc_type not in debt_by_type:
-        debt_by_type[acc_type] = {'total': 0, 'accounts': []}
-    debt_by_type[acc_type]['total'] += balance
-    debt_by_type[acc_type]['accounts'].append(acc)
-    
-    if acc_type == 'credit_card':
-        credit_cards.append(acc)
+# Group accounts by type for the loan sections
+accounts_by_type = {}
+for acc in snapshot.accounts:
+    accounts_by_type.setdefault(acc['account_type'], []).append(acc)
+debt_by_type = {account_type: total for account_type, total, count in snapshot.debt_by_type}
 
-total_debt = sum(d['total'] for d in debt_by_type.values())
-total_payments = sum(acc['minimum_payment'] or 0 for acc in accounts)
+total_debt = snapshot.total_debt
+total_payments = snapshot.monthly_obligations
 
 # Credit card totals
-cc_balance = sum(acc['current_balance'] for acc in credit_cards)
-cc_limit = sum(acc['credit_limit'] or 0 for acc in credit_cards)
-cc_available = cc_limit - cc_balance
-cc_utilization = (cc_balance / cc_limit * 100) if cc_limit > 0 else 0
+credit_cards = snapshot.credit_cards
+cc_balance = snapshot.cc_balance
+cc_limit = snapshot.cc_limit
+cc_available = snapshot.cc_available
+cc_utilization = snapshot.cc_utilization
 
 # Partner draw totals
 draw_totals = db.get_partner_totals()
@@ -120,10 +115,9 @@ loan_types = {
 }
 
 for loan_type, (label, key) in loan_types.items():
-    if key in debt_by_type:
-        data = debt_by_type[key]
-        with st.expander(f"{label}: ${data['total']:,.0f}", expanded=False):
-            for acc in data['accounts']:
+    if key in accounts_by_type:
+        with st.expander(f"{label}: ${debt_by_type.get(key, 0):,.0f}", expanded=False):
+            for acc in accounts_by_type[key]:
                 payment = acc['minimum_payment'] or 0
                 due = acc['due_day'] or '-'
                 c1, c2 = st.columns([3, 2])
@@ -135,6 +129,40 @@ for loan_type, (label, key) in loan_types.items():
                     else:
                         st.markdown(f"${acc['current_balance']:,.0f}")
 
+# ============ TRENDS ============
+TREND_RANGES = {"6M": 183, "1Y": 365, "3Y": 1095, "All": None}
+
+with st.expander("📈 Debt & Utilization Trend", expanded=False):
+    span = st.radio("Range", list(TREND_RANGES), index=1, horizontal=True, label_visibility="collapsed")
+    days = TREND_RANGES[span]
+    history = balance_history.get_balance_history(
+        start=(date.today() - timedelta(days=days)) if days else None
+    )
+    debt = balance_history.debt_over_time(history)
+    utilization = balance_history.utilization_over_time(history)
+
+    if len(history.dates) < 2 or not (~np.isnan(history.balances)).any():
+        st.caption("Balance history builds up as balances are updated on the Accounts page")
+    else:
+        dates = history.dates.astype(object)
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=dates, y=debt, name="Total Debt", line=dict(color='#E53935'),
+                                 hovertemplate="$%{y:,.0f}<extra>Debt</extra>"))
+        fig.add_trace(go.Scatter(x=dates, y=utilization * 100, name="CC Utilization", yaxis='y2',
+                                 line=dict(color='#1E88E5', dash='dot'),
+                                 hovertemplate="%{y:.0f}%<extra>Utilization</extra>"))
+        fig.update_layout(
+            height=260,
+            margin=dict(l=0, r=0, t=10, b=0),
+            legend=dict(orientation='h', y=-0.2),
+            yaxis=dict(tickprefix='$', tickformat=',.0s'),
+            yaxis2=dict(overlaying='y', side='right', ticksuffix='%', rangemode='tozero', showgrid=False),
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)'
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption(f"{history.resolution.title()} end-of-period balances, {len(history.account_ids)} accounts")
+
 st.divider()
 
 # ============ PARTNER DRAWS (compact) ============
@@ -167,8 +195,8 @@ with st.expander(f"👫 Partner Draws: Mark ${draw_totals['Mark']:,.0f} | Katie
     st.plotly_chart(fig, use_container_width=True)
 
 # ============ REWARDS POINTS (compact) ============
-rewards = db.get_all_rewards()
-total_value = sum(r['current_balance'] * r['point_value'] for r in rewards)
+rewards = snapshot.rewards
+total_value = snapshot.rewards_value
 
 with st.expander(f"✨ Rewards: ${total_value:,.0f} value", expanded=False):
     for r in rewards:
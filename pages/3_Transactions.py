@@ -1,57 +1,189 @@
 """
 Liquidity Engine - Transactions
-Coming in Phase 2-3
+CSV import and the triage queue for uncategorized transactions
 """
 import streamlit as st
+import os
 import sys
+import tempfile
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+from utils import database as db
+from utils import importer
+from utils import categorizer
+from utils import triage
+from utils import rule_learning
+from utils import jobs
+from utils.job_status import job_panel
 from utils.auth import require_auth
+from utils.bootstrap import ensure_database
 
 st.set_page_config(page_title="Transactions | Liquidity Engine", page_icon="📥", layout="wide")
 
 require_auth()
+ensure_database()
 
 st.title("📥 Transactions")
 st.caption("Import, view, and categorize your transactions")
 
 st.divider()
 
-st.info("🚧 **Coming in Phase 2-3**")
+# ============ CSV IMPORT ============
+st.markdown("### 📤 Import Transactions")
+st.caption("Chase, Capital One and Amex CSV exports. Lines already imported are skipped automatically.")
 
-st.markdown("""
-### Phase 2: CSV Import
-- Upload Chase CSV exports
-- Upload Capital One CSV exports  
-- Upload Amex CSV exports
-- Automatic duplicate detection
-- Import history tracking
+accounts = db.get_all_accounts()
+account_labels = {f"{a['name']} ({a['institution']})": a['id'] for a in accounts}
 
-### Phase 3: Categorization
-- Auto-categorization using smart rules
-- Triage queue for uncategorized transactions
-- Tag/project assignment (e.g., "NYC Trip")
-- Learn from your categorization choices
-""")
+c1, c2 = st.columns(2)
+with c1:
+    account_label = st.selectbox("Account", list(account_labels.keys()))
+with c2:
+    institution = st.selectbox("Format", ["Auto-detect"] + list(importer.INSTITUTION_MAPPERS.keys()))
+
+uploaded_file = st.file_uploader("Upload CSV from your bank", type=['csv'])
+
+if uploaded_file and st.button("Import Transactions", type="primary"):
+    # The upload is written to disk so the import can stream it on a worker thread
+    fd, temp_path = tempfile.mkstemp(prefix="txn_import_", suffix=".csv")
+    with os.fdopen(fd, "wb") as f:
+        f.write(uploaded_file.getbuffer())
+    st.session_state['import_job'] = jobs.submit(
+        'transactions_csv',
+        label=f"Import {uploaded_file.name}",
+        path=temp_path,
+        account_id=account_labels[account_label],
+        institution=None if institution == "Auto-detect" else institution
+    )
+
+job_panel('import_job')
 
 st.divider()
 
-# Preview of the interface
-st.markdown("### Preview: Transaction Import")
+# ============ TRIAGE QUEUE ============
+VISIBLE_GROUPS = 10
+
+# "ENGINE › Ad Spend" -> ("ENGINE", "Ad Spend")
+CATEGORY_OPTIONS = {
+    f"{bucket} › {category}": (bucket, category)
+    for bucket, categories in config.DEFAULT_CATEGORIES.items()
+    for category in categories
+}
+
+def reset_queue():
+    for key in ('triage_queue', 'triage_cursor', 'triage_prefetch', 'triage_exhausted'):
+        st.session_state.pop(key, None)
+
+def fill_queue():
+    """Keep the queue topped up from a background prefetch so clicks never wait on a read."""
+    state = st.session_state
+    if 'triage_queue' not in state:
+        page = triage.get_queue_page()
+        state['triage_queue'] = page
+        state['triage_cursor'] = page[-1]['group_key'] if page else None
+        state['triage_prefetch'] = None
+        state['triage_exhausted'] = len(page) < config.TRIAGE_BATCH_SIZE
+
+    queue = state['triage_queue']
+    future = state['triage_prefetch']
+    if future is not None and (future.done() or len(queue) < VISIBLE_GROUPS):
+        page = future.result()
+        state['triage_prefetch'] = None
+        queued = {g['group_key'] for g in queue}
+        queue.extend(g for g in page if g['group_key'] not in queued)
+        if page:
+            state['triage_cursor'] = page[-1]['group_key']
+        state['triage_exhausted'] = len(page) < config.TRIAGE_BATCH_SIZE
+
+    if state['triage_prefetch'] is None and not state['triage_exhausted'] \
+            and len(queue) < VISIBLE_GROUPS + config.TRIAGE_BATCH_SIZE:
+        state['triage_prefetch'] = triage.prefetch_queue_page(after=state['triage_cursor'])
+    return queue
+
+def drop_group(group_key):
+    queue = st.session_state['triage_queue']
+    queue[:] = [g for g in queue if g['group_key'] != group_key]
+
+def apply_category(group_key):
+    choice = st.session_state.get(f"triage_cat_{group_key}")
+    if not choice:
+        st.session_state['triage_message'] = ("warning", "Pick a category first")
+        return
+    bucket, category = CATEGORY_OPTIONS[choice]
+    changed = triage.categorize_group(group_key, bucket, category)
+    drop_group(group_key)
+    # Learning folds in every categorization since its last run, so it runs in
+    # the background and clicks made meanwhile share one run
+    jobs.ensure_queued('learn_rules')
+    st.session_state['triage_message'] = ("success", f"{group_key}: {changed:,} transactions → {choice}")
+
+def skip(group_key):
+    triage.skip_group(group_key)
+    drop_group(group_key)
+
+st.markdown("### 🗂️ Triage Queue")
+st.caption("Uncategorized transactions, grouped by cleaned description - one choice categorizes the whole group")
+
+group_count, pending_count = triage.get_queue_size()
+c1, c2, c3 = st.columns([1, 1, 1])
+with c1:
+    st.metric("Groups to Review", f"{group_count:,}")
+with c2:
+    st.metric("Transactions", f"{pending_count:,}")
+with c3:
+    st.button("🔄 Refresh Queue", on_click=reset_queue, use_container_width=True)
+
+if 'triage_message' in st.session_state:
+    kind, message = st.session_state.pop('triage_message')
+    getattr(st, kind)(message)
+
+queue = fill_queue()
+if not queue:
+    st.success("🎉 Nothing left to triage")
+
+for group in queue[:VISIBLE_GROUPS]:
+    key = group['group_key']
+    total = group['total'] or 0
+    amount = f"${total:,.2f}" if total >= 0 else f"-${abs(total):,.2f}"
+    cols = st.columns([4, 3, 1, 1])
+    with cols[0]:
+        st.markdown(f"**{group['merchant_name'] or key}** · {group['count']} × · {amount}")
+        st.caption(f"{group['sample']} · {group['first_date']} → {group['last_date']}")
+    with cols[1]:
+        st.selectbox("Category", list(CATEGORY_OPTIONS), index=None, placeholder="Category…",
+                     key=f"triage_cat_{key}", label_visibility="collapsed")
+    with cols[2]:
+        st.button("✓", key=f"triage_apply_{key}", on_click=apply_category, args=(key,), use_container_width=True)
+    with cols[3]:
+        st.button("Skip", key=f"triage_skip_{key}", on_click=skip, args=(key,), use_container_width=True)
 
-uploaded_file = st.file_uploader("Upload CSV from your bank", type=['csv'], disabled=True)
+if len(queue) > VISIBLE_GROUPS:
+    st.caption(f"+ {len(queue) - VISIBLE_GROUPS} more loaded")
 
-st.markdown("### Preview: Triage Queue")
-st.caption("Uncategorized transactions will appear here for quick categorization")
+# ============ SUGGESTED RULES ============
+def accept_rule(rule_id):
+    rule_learning.accept_proposal(rule_id)
+    result = categorizer.apply_rule(rule_id)
+    reset_queue()
+    st.session_state['triage_message'] = ("success", f"Rule added - {result['categorized']:,} transactions categorized")
 
-# Mock triage interface
-cols = st.columns([3, 1, 1, 1])
-with cols[0]:
-    st.text("AMAZON MARKETPLACE - $127.43")
-with cols[1]:
-    st.button("ENGINE", disabled=True, key="e1")
-with cols[2]:
-    st.button("OVERHEAD", disabled=True, key="o1")
-with cols[3]:
-    st.button("LIFESTYLE", disabled=True, key="l1")
+proposals = rule_learning.get_rule_proposals(limit=10)
+if proposals:
+    st.markdown("### 🧠 Suggested Rules")
+    st.caption("Learned from your categorization choices")
+    for rule in proposals:
+        cols = st.columns([3, 3, 2, 1, 1])
+        with cols[0]:
+            st.markdown(f"**{rule['match_pattern']}**")
+        with cols[1]:
+            st.markdown(f"{rule['bucket']} → {rule['category']}")
+        with cols[2]:
+            st.caption(f"{rule['confidence']:.0%} confident · {rule['support']} transactions")
+        with cols[3]:
+            st.button("Add", key=f"rule_accept_{rule['id']}", on_click=accept_rule, args=(rule['id'],),
+                      use_container_width=True)
+        with cols[4]:
+            st.button("✕", key=f"rule_reject_{rule['id']}", on_click=rule_learning.reject_proposal,
+                      args=(rule['id'],), use_container_width=True)
@@ -1,19 +1,23 @@
 """
 Liquidity Engine - Categories
-Coming in Phase 3
+The Three Buckets, with period-over-period bucket reporting
 """
 import streamlit as st
+import pandas as pd
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import config
+from utils import reports
 from utils.auth import require_auth
+from utils.bootstrap import ensure_database
 
 st.set_page_config(page_title="Categories | Liquidity Engine", page_icon="🏷️", layout="wide")
 
 require_auth()
+ensure_database()
 
 st.title("🏷️ Categories")
 st.caption("Manage your Three Buckets and categorization rules")
@@ -58,6 +62,48 @@ with col3:
 
 st.divider()
 
+# ============ BUCKET REPORT ============
+st.markdown("### 📊 Bucket Report")
+
+COMPARISONS = {
+    "This month vs last month": ("this-month", "last-month"),
+    "This quarter vs last quarter": ("this-quarter", "last-quarter"),
+    "This year vs last year": ("this-year", "last-year"),
+}
+
+c1, c2 = st.columns([2, 1])
+with c1:
+    comparison = st.selectbox("Compare", list(COMPARISONS))
+with c2:
+    level = st.radio("Group by", ["Bucket", "Category"], horizontal=True)
+
+current, previous = COMPARISONS[comparison]
+group_by = ('bucket',) if level == "Bucket" else ('bucket', 'category')
+rows = reports.compare_periods(current, previous, group_by=group_by)
+
+if rows:
+    df = pd.DataFrame(rows)
+    for column in group_by:
+        df[column] = df[column].fillna("Uncategorized")
+    df = df.rename(columns={'bucket': 'Bucket', 'category': 'Category', 'current': 'Current',
+                            'previous': 'Previous', 'change': 'Change', 'change_pct': 'Change %'})
+    st.dataframe(
+        df,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            'Current': st.column_config.NumberColumn(format="$%.2f"),
+            'Previous': st.column_config.NumberColumn(format="$%.2f"),
+            'Change': st.column_config.NumberColumn(format="$%.2f"),
+            'Change %': st.column_config.NumberColumn(format="percent"),
+        },
+    )
+    st.caption("Net amounts (inflows less outflows) from the monthly rollup")
+else:
+    st.caption("No transactions in either period yet")
+
+st.divider()
+
 st.info("🚧 **Full category management coming in Phase 3**")
 
 st.markdown("""
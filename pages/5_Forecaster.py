@@ -1,70 +1,89 @@
 """
 Liquidity Engine - Forecaster (Crystal Ball)
-Coming in Phase 6
+Cash flow projection from recurring items and account payments, and debt payoff planning
 """
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-from datetime import date, timedelta
+from datetime import date
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+import config
 from utils import database as db
+from utils import forecast
+from utils import jobs
+from utils import payoff
+from utils import scenarios
 from utils.auth import require_auth
+from utils.bootstrap import ensure_database
+from utils.job_status import job_panel
 
 st.set_page_config(page_title="Forecaster | Liquidity Engine", page_icon="🔮", layout="wide")
 
 require_auth()
+ensure_database()
 
 st.title("🔮 Forecaster")
 st.caption("The Crystal Ball - Predict and prevent cash crunches")
 
 st.divider()
 
-st.info("🚧 **Coming in Phase 6**")
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 
-# Show a preview with current data
-st.markdown("### Preview: 90-Day Cash Flow Projection")
+# ============ INPUTS ============
+c1, c2 = st.columns(2)
+with c1:
+    start_balance = st.number_input(
+        "Starting Cash",
+        value=float(forecast.get_cash_on_hand()),
+        step=5000.0,
+        format="%.0f",
+        help="Defaults to your checking and savings balances"
+    )
+with c2:
+    horizon = st.slider("Days to Project", min_value=30, max_value=365, value=config.FORECAST_DAYS, step=15)
 
-# Mock data for preview
-start_balance = 200000  # Placeholder
+items = forecast.get_cash_items(days=horizon)
+result = forecast.project_cash_flow(start_balance, items, days=horizon)
 
-# Generate mock forecast
-dates = [date.today() + timedelta(days=i) for i in range(90)]
-balances = [start_balance]
+# ============ SUMMARY ============
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric("Ending Balance", f"${result.end_balance:,.0f}", f"${result.end_balance - start_balance:,.0f}")
+with col2:
+    st.metric("Low Point", f"${result.low_balance:,.0f}", result.low_date.strftime("%b %d"), delta_color="off")
+with col3:
+    st.metric("Days in Red Zone", result.danger_days)
 
-# Get actual monthly obligations
-monthly_payments = db.get_monthly_obligations()
+if result.first_danger:
+    st.error(f"🔴 Cash drops below ${config.CASH_DANGER_THRESHOLD:,.0f} on {result.first_danger:%b %d, %Y}")
+elif result.first_warning:
+    st.warning(f"🟡 Cash drops below ${config.CASH_WARNING_THRESHOLD:,.0f} on {result.first_warning:%b %d, %Y}")
+else:
+    st.success(f"🟢 Cash stays above ${config.CASH_WARNING_THRESHOLD:,.0f} for the next {horizon} days")
 
-for i in range(1, 90):
-    # Simulate daily changes
-    daily_change = -monthly_payments / 30  # Spread monthly payments
-    if dates[i].day == 15:  # Simulate revenue on 15th
-        daily_change += 100000
-    balances.append(balances[-1] + daily_change)
-
-# Create visualization
+# ============ WATERLINE CHART ============
 fig = go.Figure()
 
-# Add balance line
 fig.add_trace(go.Scatter(
-    x=dates,
-    y=balances,
+    x=result.dates,
+    y=result.balance,
     mode='lines',
     name='Projected Balance',
     line=dict(color='#00cc00', width=2)
 ))
 
-# Add danger zone
-fig.add_hline(y=20000, line_dash="dash", line_color="red", 
-              annotation_text="Danger Zone ($20k)")
-fig.add_hline(y=50000, line_dash="dash", line_color="orange",
-              annotation_text="Warning Zone ($50k)")
+fig.add_hline(y=config.CASH_DANGER_THRESHOLD, line_dash="dash", line_color="red",
+              annotation_text=f"Danger Zone (${config.CASH_DANGER_THRESHOLD/1000:.0f}k)")
+fig.add_hline(y=config.CASH_WARNING_THRESHOLD, line_dash="dash", line_color="orange",
+              annotation_text=f"Warning Zone (${config.CASH_WARNING_THRESHOLD/1000:.0f}k)")
 
 fig.update_layout(
-    title="Projected Cash Balance (Mock Data)",
+    title=f"Projected Cash Balance ({horizon} Days)",
     xaxis_title="Date",
     yaxis_title="Balance ($)",
     hovermode="x unified",
@@ -73,29 +92,185 @@ fig.update_layout(
 
 st.plotly_chart(fig, use_container_width=True)
 
-st.caption("⚠️ This is a preview with simulated data. Actual forecasting will use your real transactions and recurring payments.")
+with st.expander("📋 Projected Cash Events", expanded=False):
+    events = forecast.cash_events(result)
+    if events:
+        df = pd.DataFrame(events, columns=['Date', 'Description', 'Amount'])
+        df['Amount'] = df['Amount'].apply(lambda x: f"${x:,.2f}" if x >= 0 else f"-${abs(x):,.2f}")
+        st.dataframe(df, use_container_width=True, hide_index=True)
+    else:
+        st.caption("No recurring items or payments in this window")
+
+# ============ RECURRING ITEMS ============
+with st.expander("🔁 Recurring Income & Expenses", expanded=False):
+    if st.button("🔍 Detect from Transaction History", use_container_width=True):
+        st.session_state['detect_recurring_job'] = jobs.submit('detect_recurring')
+    job_panel('detect_recurring_job')
+
+    for r in db.get_recurring_transactions():
+        c1, c2, c3 = st.columns([3, 2, 1])
+        with c1:
+            st.markdown(f"{'🟢' if r['is_income'] else '🔴'} **{r['description']}**")
+        with c2:
+            detail = f"${r['expected_amount']:,.2f} • {r['frequency']}"
+            if r['source'] == 'detected':
+                detail += f" • detected, next {r['next_expected']}"
+            st.caption(detail)
+        with c3:
+            if st.button("Remove", key=f"rec_del_{r['id']}"):
+                db.delete_recurring_transaction(r['id'])
+                st.rerun()
+
+    with st.form("new_recurring"):
+        c1, c2 = st.columns(2)
+        with c1:
+            description = st.text_input("Description")
+            amount = st.number_input("Amount", min_value=0.0, step=100.0, format="%.2f")
+            is_income = st.checkbox("Income")
+        with c2:
+            frequency = st.selectbox("Frequency", ["monthly", "weekly", "biweekly", "quarterly", "annual"])
+            day_of_month = st.number_input("Day of Month (monthly/quarterly/annual)", min_value=1, max_value=31, value=1)
+            day_of_week = st.selectbox("Day of Week (weekly/biweekly)", WEEKDAYS)
+        next_expected = st.date_input("Next Occurrence", value=date.today())
+
+        if st.form_submit_button("Add Recurring Item", use_container_width=True):
+            if description and amount > 0:
+                db.add_recurring_transaction(
+                    description=description,
+                    expected_amount=amount,
+                    frequency=frequency,
+                    day_of_month=day_of_month,
+                    day_of_week=WEEKDAYS.index(day_of_week),
+                    is_income=is_income,
+                    next_expected=next_expected.isoformat()
+                )
+                st.success(f"Added {description}")
+                st.rerun()
+            else:
+                st.error("Enter description and amount")
 
+# ============ WHAT-IF SCENARIOS ============
 st.divider()
+st.markdown("### 🎲 What-If Scenarios")
+st.caption("Simulates thousands of paths with revenue timing and amount variance from your history")
 
-st.markdown("""
-### Phase 6 Features:
-- **Recurring Transaction Setup** - Define expected income and expenses
-- **Cash Flow Projection Engine** - 90-day forward projection
-- **Waterline Visualization** - Green/Yellow/Red zones
-- **Liquidity Alerts** - Get warned before cash crunches
-- **What-If Scenarios** - Test different spending/income scenarios
-""")
+c1, c2, c3 = st.columns(3)
+with c1:
+    revenue_change = st.slider("Revenue Change", min_value=-50, max_value=50, value=0, step=5, format="%d%%")
+with c2:
+    expense_change = st.slider("Expense Change", min_value=-50, max_value=50, value=0, step=5, format="%d%%",
+                               help="Scales recurring expenses; account minimum payments stay as contracted")
+with c3:
+    revenue_delay = st.slider("Revenue Delay (days)", min_value=0, max_value=30, value=0)
+
+if st.toggle("Run simulation", value=False):
+    sim = scenarios.simulate(
+        start_balance,
+        items,
+        days=horizon,
+        revenue_scale=1 + revenue_change / 100,
+        expense_scale=1 + expense_change / 100,
+        revenue_delay_days=revenue_delay,
+        variance=scenarios.estimate_variance(),
+    )
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Chance of Red Zone", f"{sim.cum_breach_prob[-1]:.0%}")
+    with col2:
+        st.metric("Median Ending", f"${sim.p50[-1]:,.0f}")
+    with col3:
+        st.metric("Bad Case (P5)", f"${sim.p5[-1]:,.0f}")
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=sim.dates, y=sim.p95, mode='lines', name='P95',
+                             line=dict(width=0), showlegend=False))
+    fig.add_trace(go.Scatter(x=sim.dates, y=sim.p5, mode='lines', name='P5-P95',
+                             line=dict(width=0), fill='tonexty', fillcolor='rgba(0,204,0,0.2)'))
+    fig.add_trace(go.Scatter(x=sim.dates, y=sim.p50, mode='lines', name='Median',
+                             line=dict(color='#00cc00', width=2)))
+    fig.add_trace(go.Scatter(x=sim.dates, y=sim.breach_prob * 100, mode='lines', name='Red Zone %',
+                             line=dict(color='red', width=1, dash='dot'), yaxis='y2'))
+    fig.add_hline(y=config.CASH_DANGER_THRESHOLD, line_dash="dash", line_color="red")
+    fig.update_layout(
+        title=f"{sim.paths:,} Simulated Paths",
+        yaxis=dict(title="Balance ($)"),
+        yaxis2=dict(title="Red Zone %", overlaying='y', side='right', range=[0, 100]),
+        hovermode="x unified",
+        template="plotly_dark"
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"Simulated in {sim.seconds * 1000:,.0f} ms")
+
+# ============ DEBT PAYOFF ============
+st.divider()
+st.markdown("### 💸 Debt Payoff Planner")
+st.caption("Minimums on every debt, with the rest of the budget going to one debt at a time")
+
+debts = payoff.get_debts()
+if not len(debts.names):
+    st.info("No debt balances to pay off")
+else:
+    minimums = payoff.minimum_budget(debts)
+    c1, c2 = st.columns(2)
+    with c1:
+        budget = st.number_input("Monthly Debt Budget", min_value=0.0, value=float(np.ceil(minimums / 100) * 100),
+                                 step=500.0, format="%.0f", help=f"Minimum payments total ${minimums:,.0f}")
+    with c2:
+        strategy = st.radio("Strategy", ["Avalanche", "Snowball", "Custom"], horizontal=True,
+                            help="Avalanche: highest APR first. Snowball: smallest balance first.").lower()
+    order = None
+    if strategy == 'custom':
+        names = st.multiselect("Pay off in this order", list(debts.names))
+        order = [int(debts.account_ids[debts.names.index(n)]) for n in names]
+
+    plan = payoff.simulate_payoff(budget, strategy, order, debts)
+    baseline = payoff.simulate_payoff(budget, 'snowball' if strategy == 'avalanche' else 'avalanche', debts=debts)
+    when = payoff.payoff_date(int(plan.debt_free[0]))
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Debt Free", when.strftime("%b %Y") if when else f"Not within {config.PAYOFF_MAX_MONTHS // 12} years",
+                  f"{plan.debt_free[0]} months" if when else None, delta_color="off")
+    with col2:
+        st.metric("Total Interest", f"${plan.total_interest[0]:,.0f}")
+    with col3:
+        saved = baseline.total_interest[0] - plan.total_interest[0]
+        st.metric(f"vs {baseline.strategy.title()}", f"${saved:,.0f} saved" if saved >= 0 else f"${-saved:,.0f} more")
+    if plan.short[0]:
+        st.warning(f"The budget is below the ${minimums:,.0f} in minimum payments; the plan pays the minimums anyway")
+
+    df = pd.DataFrame(payoff.payoff_schedule(plan))
+    df = df[['name', 'balance', 'interest_rate', 'minimum_payment', 'payoff_date', 'interest']]
+    df.columns = ['Account', 'Balance', 'APR %', 'Minimum', 'Paid Off', 'Interest']
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
+    with st.expander("📉 Budget Sweep", expanded=False):
+        budgets = np.linspace(max(minimums, 1), max(minimums, 1) * 2, 200)
+        sweep = payoff.compare_strategies(budgets, order, debts)
+        fig = go.Figure()
+        for name, result in sweep.items():
+            months = np.where(result.debt_free >= 0, result.debt_free, np.nan)
+            fig.add_trace(go.Scatter(x=budgets, y=months, mode='lines', name=f"{name.title()} months"))
+            fig.add_trace(go.Scatter(x=budgets, y=result.total_interest, mode='lines', yaxis='y2',
+                                     name=f"{name.title()} interest", line=dict(dash='dot')))
+        fig.update_layout(
+            xaxis=dict(title="Monthly Budget ($)"),
+            yaxis=dict(title="Months to Debt Free"),
+            yaxis2=dict(title="Total Interest ($)", overlaying='y', side='right'),
+            hovermode="x unified",
+            template="plotly_dark"
+        )
+        st.plotly_chart(fig, use_container_width=True)
 
 # Show current payment schedule
 st.divider()
 st.markdown("### Current Payment Schedule")
+st.caption(f"Account payments due in the next {horizon} days")
 
-accounts = db.get_all_accounts()
-payments = [(a['name'], a['minimum_payment'], a['due_day']) 
-            for a in accounts if a['minimum_payment'] and a['minimum_payment'] > 0]
-payments.sort(key=lambda x: x[2] if x[2] else 32)
-
+payments = db.get_upcoming_payments(horizon)
 if payments:
-    df = pd.DataFrame(payments, columns=['Account', 'Payment', 'Due Day'])
+    df = pd.DataFrame([(p['due_date'], p['name'], p['minimum_payment']) for p in payments],
+                      columns=['Due Date', 'Account', 'Payment'])
     df['Payment'] = df['Payment'].apply(lambda x: f"${x:,.2f}")
     st.dataframe(df, use_container_width=True, hide_index=True)
@@ -1,70 +1,108 @@
 """
 Liquidity Engine - AI Query
-Coming in Phase 5
+Plain-English questions answered from transactions, accounts and partner draws
 """
 import streamlit as st
+import pandas as pd
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import config
+from utils import nl_query
 from utils.auth import require_auth
+from utils.bootstrap import ensure_database
 
 st.set_page_config(page_title="AI Query | Liquidity Engine", page_icon="🤖", layout="wide")
 
 require_auth()
+ensure_database()
 
 st.title("🤖 AI Query")
 st.caption("Ask questions about your finances in plain English")
 
 st.divider()
 
-st.info("🚧 **Coming in Phase 5**")
-
-# Preview interface
-st.markdown("### Ask Claude about your finances")
-
-query = st.text_input(
-    "Your question",
-    placeholder="e.g., What did my NYC trip cost me all in?",
-    disabled=True
-)
-
-st.button("Ask", disabled=True, type="primary")
-
-st.divider()
-
-st.markdown("""
-### Example Questions You'll Be Able to Ask:
-
-**Spending Analysis**
-- "What did my NYC trip cost me all in?"
-- "How much did I spend on ads last month?"
-- "Show me all restaurant expenses over $100"
-- "What are my top 10 expenses this month?"
-
-**Revenue & Performance**
-- "What's my average weekly revenue?"
-- "Compare Q4 vs Q3 revenue"
-- "What's my ROAS for the last 30 days?"
-
-**Cash Flow**
-- "Project my cash position for next 30 days"
-- "When will I run out of money if spending continues?"
-- "What's my burn rate?"
-
-**Debt Analysis**
-- "How much do I owe on credit cards?"
-- "When will the Sandra Lopez loan be paid off?"
-- "What's my total monthly debt payment?"
-""")
+EXAMPLES = {
+    "Spending Analysis": [
+        "What did my NYC trip cost me all in?",
+        "How much did I spend on ads last month?",
+        "Show me all restaurant expenses over $100",
+        "What are my top 10 expenses this month?",
+    ],
+    "Revenue & Performance": [
+        "What's my average weekly revenue?",
+        "Compare Q4 vs Q3 revenue",
+        "What's my ROAS for the last 30 days?",
+    ],
+    "Cash Flow": [
+        "Project my cash position for next 30 days",
+        "When will I run out of money if spending continues?",
+        "What's my burn rate?",
+    ],
+    "Debt Analysis": [
+        "How much do I owe on credit cards?",
+        "When will the Sandra Lopez loan be paid off?",
+        "What's my total monthly debt payment?",
+    ],
+}
+
+if 'ai_history' not in st.session_state:
+    st.session_state['ai_history'] = []
+
+def run_question(question):
+    history = st.session_state['ai_history']
+    # The last answered question is the context for follow-ups ("and last month?")
+    context = next((r['context'] for r in history if r['intent']), None)
+    result = nl_query.ask(question, context=context)
+    if result:
+        history.insert(0, result)
+        del history[20:]
+
+def show_result(result):
+    st.markdown(result['answer'])
+    if result['rows']:
+        df = pd.DataFrame(list(result['rows']), columns=list(result['columns']))
+        st.dataframe(df, hide_index=True, use_container_width=True)
+    if result['intent']:
+        st.caption(f"{result['intent']} · {result['backend']} · {result['seconds'] * 1000:.0f} ms")
+    if result['sql']:
+        with st.expander("SQL"):
+            st.code(result['sql'], language="sql")
+            st.caption(f"Parameters: {list(result['sql_params'])}")
+
+# ============ ASK ============
+with st.form("ask"):
+    question = st.text_input("Your question", placeholder="e.g., What did my NYC trip cost me all in?")
+    if st.form_submit_button("Ask", type="primary") and question.strip():
+        run_question(question)
+
+if config.ANTHROPIC_API_KEY:
+    st.caption(f"Questions the built-in matcher can't place are interpreted by {config.AI_QUERY_MODEL}")
+else:
+    st.caption("Answering offline - set ANTHROPIC_API_KEY to let a model interpret other questions")
+
+history = st.session_state['ai_history']
+if history:
+    latest = history[0]
+    st.markdown(f"### {latest['question']}")
+    show_result(latest)
+
+    if len(history) > 1:
+        st.markdown("##### Earlier")
+        for result in history[1:]:
+            with st.expander(result['question']):
+                show_result(result)
 
 st.divider()
 
-st.markdown("""
-### How It Works (Phase 5):
-1. You type a question in plain English
-2. Claude interprets your question
-3. The system queries your transaction database
-4. Claude formats and explains the results
-5. You can ask follow-up questions for clarification
-""")
+# ============ EXAMPLES ============
+st.markdown("### Example Questions")
+cols = st.columns(len(EXAMPLES))
+for col, (group, questions) in zip(cols, EXAMPLES.items()):
+    with col:
+        st.markdown(f"**{group}**")
+        for example in questions:
+            st.button(example, key=f"example_{example}", on_click=run_question, args=(example,),
+                      use_container_width=True)
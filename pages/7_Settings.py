@@ -9,11 +9,15 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import config
 from utils import database as db
+from utils import jobs
 from utils.auth import require_auth
+from utils.bootstrap import ensure_database
+from utils.job_status import job_panel
 
 st.set_page_config(page_title="Settings | Liquidity Engine", page_icon="⚙️", layout="wide")
 
 require_auth()
+ensure_database()
 
 st.title("⚙️ Settings")
 st.caption("Configure your Liquidity Engine")
@@ -68,10 +72,7 @@ with tab2:
     st.caption("Rules that automatically categorize transactions based on description matching")
     
     # Show current rules
-    with db.get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM auto_rules WHERE is_active = 1 ORDER BY priority")
-        rules = cursor.fetchall()
+    rules = db.get_auto_rules()
     
     if rules:
         for rule in rules:
@@ -79,7 +80,8 @@ with tab2:
             with col1:
                 st.markdown(f"**{rule['match_pattern']}**")
             with col2:
-                st.caption(rule['match_type'])
+                st.caption(rule['match_type'] if rule['source'] != 'learned'
+                           else f"{rule['match_type']} · learned ({rule['confidence']:.0%})")
             with col3:
                 st.markdown(f"{rule['bucket']} → {rule['category']}")
             with col4:
@@ -99,15 +101,13 @@ with tab2:
         
         if st.form_submit_button("Add Rule"):
             if pattern and category:
-                with db.get_connection() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO auto_rules (match_pattern, match_type, bucket, category, priority)
-                        VALUES (?, ?, ?, ?, 100)
-                    """, (pattern.upper(), match_type, bucket, category))
-                    conn.commit()
-                st.success("Rule added!")
-                st.rerun()
+                try:
+                    db.add_auto_rule(pattern, match_type, bucket, category)
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    st.success("Rule added!")
+                    st.rerun()
 
 with tab3:
     st.markdown("### Data Management")
@@ -131,7 +131,20 @@ with tab3:
         st.markdown(f"**Accounts:** {acc_count}")
         st.markdown(f"**Transactions:** {txn_count}")
         st.markdown(f"**Auto-Rules:** {rule_count}")
-    
+
+        st.markdown("#### Connection Pool")
+        pool = db.get_pool_stats()
+        st.markdown(f"**Open:** {pool['open']} / {pool['max_size']} ({pool['in_use']} in use)")
+        st.markdown(f"**Checkouts:** {pool['checkouts']:,} ({pool['hit_rate']:.0%} reused)")
+        st.markdown(f"**Waits:** {pool['waits']} ({pool['wait_seconds']:.2f}s) | **Overflow:** {pool['overflow']}")
+
+        st.markdown("#### Read Cache")
+        cache = db.get_cache_stats()
+        st.markdown(f"**Hits:** {cache['hits']:,} | **Misses:** {cache['misses']:,} ({cache['hit_rate']:.0%} hit rate)")
+        st.markdown(f"**Entries:** {cache['entries']} | **Invalidations:** {cache['invalidations']}")
+        if cache['tags']:
+            st.caption(" • ".join(f"{tag} v{version}" for tag, version in sorted(cache['tags'].items())))
+
     with col2:
         st.markdown("#### Danger Zone")
         st.warning("These actions cannot be undone!")
@@ -145,10 +158,55 @@ with tab3:
                     cursor = conn.cursor()
                     cursor.execute("DELETE FROM transactions")
                     conn.commit()
+                db.invalidate('transactions')
                 st.success("All transactions deleted.")
                 st.session_state['confirm_clear_txn'] = False
                 st.rerun()
 
+    st.divider()
+    st.markdown("#### Background Jobs")
+    st.caption(f"Maintenance runs in the background, {config.JOB_WORKERS} at a time; "
+               "you can leave this page while it works.")
+
+    MAINTENANCE_JOBS = {
+        "🏷️ Apply Rules": 'recategorize',
+        "🧠 Learn Rules": 'learn_rules',
+        "🔁 Detect Recurring": 'detect_recurring',
+        "📊 Rebuild Rollup": 'rebuild_rollup',
+    }
+    for column, (label, kind) in zip(st.columns(len(MAINTENANCE_JOBS)), MAINTENANCE_JOBS.items()):
+        with column:
+            if st.button(label, key=f"job_{kind}", use_container_width=True):
+                st.session_state['maintenance_job'] = jobs.submit(kind)
+
+    job_panel('maintenance_job')
+
+    recent = jobs.get_jobs(limit=10)
+    if recent:
+        st.dataframe(
+            [{
+                'Job': j['label'],
+                'Status': j['status'],
+                'Progress': j['progress'] or 0.0,
+                'Started': j['started_at'] or '',
+                'Finished': j['finished_at'] or '',
+                'Result': j['error'] or j['message'] or '',
+            } for j in recent],
+            column_config={'Progress': st.column_config.ProgressColumn(min_value=0.0, max_value=1.0)},
+            hide_index=True,
+            use_container_width=True,
+        )
+        running = [j for j in recent if j['active'] and j['id'] != st.session_state.get('maintenance_job')]
+        for j in running:
+            c1, c2 = st.columns([5, 1])
+            with c1:
+                st.caption(f"{j['label']} ({j['status']})")
+            with c2:
+                if j['cancellable'] and st.button("Cancel", key=f"cancel_job_{j['id']}",
+                                                  disabled=bool(j['cancel_requested'])):
+                    jobs.cancel(j['id'])
+                    st.rerun()
+
 # Version info
 st.divider()
 st.caption(f"Liquidity Engine v{config.APP_VERSION}")
@@ -4,16 +4,21 @@ Track personal draws between Mark & Katie from the business
 Mobile-friendly with full transaction history
 """
 import streamlit as st
-import pandas as pd
+import plotly.graph_objects as go
 from datetime import date, datetime
+import os
 import sys
+import tempfile
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import config
 from utils import database as db
+from utils import jobs
 from utils.auth import require_auth
+from utils.bootstrap import ensure_database
+from utils.job_status import job_panel
 
 st.set_page_config(
     page_title="Partner Draws | Liquidity Engine",
@@ -22,6 +27,7 @@ st.set_page_config(
 )
 
 require_auth()
+ensure_database()
 
 # Custom CSS for compact mobile display
 st.markdown("""
@@ -55,6 +61,32 @@ with col3:
     else:
         st.metric("Balance", "Even")
 
+# ============ RUNNING DIFFERENCE ============
+with st.expander("📈 Running Difference", expanded=False):
+    # Free-text dates from old workbooks sort after real ones; leave them off the axis
+    series = [r for r in db.get_partner_running_difference() if r['draw_date'][:4].isdigit()]
+    if series:
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=[r['draw_date'] for r in series],
+            y=[r['difference'] for r in series],
+            mode='lines',
+            name='Mark − Katie',
+            line=dict(color='#4a90d9', width=2),
+            fill='tozeroy'
+        ))
+        fig.add_hline(y=0, line_dash="dash", line_color="gray")
+        fig.update_layout(
+            yaxis_title="Mark ahead (+) / Katie ahead (−)",
+            hovermode="x unified",
+            height=280,
+            margin=dict(l=0, r=0, t=10, b=0),
+            template="plotly_dark"
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.caption("No draws yet")
+
 st.divider()
 
 # ============ ADD NEW DRAW ============
@@ -82,133 +114,124 @@ with st.expander("➕ Add New Draw", expanded=False):
 st.divider()
 
 # ============ TRANSACTION FILTERS ============
+SORTS = {"Newest First": "newest", "Oldest First": "oldest", "Highest Amount": "highest", "Lowest Amount": "lowest"}
+PAGE_SIZE = 50
+
 col1, col2, col3 = st.columns(3)
 with col1:
     filter_partner = st.selectbox("Filter", ["All", "Mark", "Katie"], key="partner_filter")
 with col2:
-    sort_order = st.selectbox("Sort", ["Newest First", "Oldest First", "Highest Amount", "Lowest Amount"], key="sort")
+    sort_order = st.selectbox("Sort", list(SORTS), key="sort")
 with col3:
-    search = st.text_input("Search", placeholder="Description...", key="search")
+    search = st.text_input("Search", placeholder="Description or notes...", key="search")
+
+partner_arg = None if filter_partner == "All" else filter_partner
+sort = SORTS[sort_order]
 
 # ============ TRANSACTION LIST ============
-# Get all draws
-with db.get_connection() as conn:
-    cursor = conn.cursor()
-    
-    query = "SELECT * FROM partner_draws WHERE 1=1"
-    params = []
-    
-    if filter_partner != "All":
-        query += " AND partner = ?"
-        params.append(filter_partner)
-    
-    if search:
-        query += " AND description LIKE ?"
-        params.append(f"%{search}%")
-    
-    # Sort
-    if sort_order == "Newest First":
-        query += " ORDER BY draw_date DESC, id DESC"
-    elif sort_order == "Oldest First":
-        query += " ORDER BY draw_date ASC, id ASC"
-    elif sort_order == "Highest Amount":
-        query += " ORDER BY amount DESC"
-    else:
-        query += " ORDER BY amount ASC"
-    
-    cursor.execute(query, params)
-    draws = cursor.fetchall()
+# Keyset cursors of the pages visited so far; start over when the view changes
+view = (partner_arg, search, sort)
+if st.session_state.get('draws_view') != view:
+    st.session_state['draws_view'] = view
+    st.session_state['draws_cursors'] = [None]
+cursors = st.session_state['draws_cursors']
+
+def draw_table(rows, show_partner=True, show_notes=False):
+    """Render draws as one dataframe instead of a widget per row."""
+    data = {}
+    if show_partner:
+        data["Partner"] = [("🔵 " if r['partner'] == 'Mark' else "🔴 ") + r['partner'] for r in rows]
+    data["Date"] = [r['draw_date'] for r in rows]
+    data["Description"] = [r['description'] for r in rows]
+    data["Amount"] = [r['amount'] for r in rows]
+    if show_notes:
+        data["Notes"] = [r['notes'] or '' for r in rows]
+    st.dataframe(
+        data,
+        use_container_width=True,
+        hide_index=True,
+        column_config={"Amount": st.column_config.NumberColumn(format="$%.2f")},
+    )
+
+page = db.get_partner_draws_page(partner_arg, search or None, sort, after=cursors[-1], limit=PAGE_SIZE)
+total = db.count_partner_draws(partner_arg, search or None)
+first = (len(cursors) - 1) * PAGE_SIZE
 
 # Display count
-st.caption(f"Showing {len(draws)} transactions")
+if page['rows']:
+    st.caption(f"Showing {first + 1}-{first + len(page['rows'])} of {total} transactions")
+else:
+    st.caption("No matching transactions")
+
+def pager():
+    c1, c2, c3 = st.columns([1, 2, 1])
+    with c1:
+        st.button("◀ Prev", disabled=len(cursors) == 1, use_container_width=True,
+                  on_click=cursors.pop)
+    with c2:
+        st.caption(f"Page {len(cursors)} of {max(1, -(-total // PAGE_SIZE))}")
+    with c3:
+        st.button("Next ▶", disabled=page['next'] is None, use_container_width=True,
+                  on_click=cursors.append, args=(page['next'],))
 
 # Create tabs for Mark and Katie views
 if filter_partner == "All":
     tab1, tab2 = st.tabs(["📋 All Transactions", "📊 Side by Side"])
     
     with tab1:
-        # Display as compact list
-        for draw in draws:
-            emoji = "🔵" if draw['partner'] == 'Mark' else "🔴"
-            amount = draw['amount']
-            amt_str = f"${amount:,.2f}" if amount >= 0 else f"-${abs(amount):,.2f}"
-            color = "" if amount >= 0 else "~~"
-            
-            c1, c2, c3 = st.columns([1, 4, 2])
-            with c1:
-                st.markdown(f"{emoji}")
-            with c2:
-                st.markdown(f"**{draw['description'][:30]}**")
-                st.caption(f"{draw['draw_date']}")
-            with c3:
-                st.markdown(f"**{amt_str}**")
+        draw_table(page['rows'])
+        pager()
     
     with tab2:
         # Side by side comparison
-        mark_draws = [d for d in draws if d['partner'] == 'Mark']
-        katie_draws = [d for d in draws if d['partner'] == 'Katie']
-        
         c1, c2 = st.columns(2)
-        with c1:
-            st.markdown("### Mark")
-            for d in mark_draws[:50]:  # Show first 50
-                amt = d['amount']
-                st.markdown(f"${amt:,.0f} - {d['description'][:20]}")
-            if len(mark_draws) > 50:
-                st.caption(f"+ {len(mark_draws) - 50} more...")
-        
-        with c2:
-            st.markdown("### Katie")
-            for d in katie_draws[:50]:
-                amt = d['amount']
-                st.markdown(f"${amt:,.0f} - {d['description'][:20]}")
-            if len(katie_draws) > 50:
-                st.caption(f"+ {len(katie_draws) - 50} more...")
+        for column, name in ((c1, "Mark"), (c2, "Katie")):
+            with column:
+                st.markdown(f"### {name}")
+                side = db.get_partner_draws_page(name, search or None, sort, limit=50)
+                draw_table(side['rows'], show_partner=False)
+                remaining = db.count_partner_draws(name, search or None) - len(side['rows'])
+                if remaining > 0:
+                    st.caption(f"+ {remaining} more...")
 
 else:
-    # Single partner view - show all transactions
+    # Single partner view
     st.markdown(f"### {filter_partner}'s Draws")
-    
-    for draw in draws:
-        amount = draw['amount']
-        amt_str = f"${amount:,.2f}" if amount >= 0 else f"-${abs(amount):,.2f}"
-        
-        c1, c2 = st.columns([3, 1])
-        with c1:
-            st.markdown(f"**{draw['description']}**")
-            st.caption(f"{draw['draw_date']} {draw['notes'] or ''}")
-        with c2:
-            if amount >= 0:
-                st.markdown(f"**{amt_str}**")
-            else:
-                st.markdown(f"*{amt_str}* (return)")
+    draw_table(page['rows'], show_partner=False, show_notes=True)
+    pager()
 
 # ============ IMPORT SECTION ============
 st.divider()
+job_panel('draw_import_job')
+
 with st.expander("📤 Import from Excel", expanded=False):
     st.markdown("""
     Upload an Excel file with partner draws.
     Expected format: Katie in columns A-D, Mark in columns F-H
+
+    Re-importing is safe: only new draws are added and manual entries are kept.
     """)
     
     uploaded_file = st.file_uploader("Choose Excel file", type=['xlsx', 'xls'])
+    remove_missing = st.checkbox("Remove imported draws that are no longer in the file")
     
     if uploaded_file:
         if st.button("Import Draws", type="primary"):
-            # Save temp file
-            temp_path = Path("/tmp/draws_import.xlsx")
-            with open(temp_path, "wb") as f:
+            # Save temp file for the import job, which removes it when done
+            fd, temp_path = tempfile.mkstemp(prefix="draws_import_", suffix=Path(uploaded_file.name).suffix)
+            with os.fdopen(fd, "wb") as f:
                 f.write(uploaded_file.getbuffer())
-            
-            results = db.import_partner_draws_from_excel(str(temp_path))
-            st.success(f"Imported: Mark ({results['Mark']}), Katie ({results['Katie']})")
+            st.session_state['draw_import_job'] = jobs.submit(
+                'partner_draws_excel', path=temp_path, remove_missing=remove_missing
+            )
             st.rerun()
 
 # ============ EXPORT SECTION ============
 with st.expander("📥 Export Data", expanded=False):
     if st.button("Download as CSV"):
+        import pandas as pd
         with db.get_connection() as conn:
-            df = pd.read_sql_query("SELECT partner, draw_date, description, amount, notes FROM partner_draws ORDER BY draw_date DESC", conn)
+            df = pd.read_sql_query("SELECT partner, draw_date, description, amount, notes FROM partner_draws WHERE is_active = 1 ORDER BY draw_date DESC", conn)
         
         csv = df.to_csv(index=False)
         st.download_button(
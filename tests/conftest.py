@@ -0,0 +1,21 @@
+"""
+Shared fixtures: the app pointed at a throwaway database
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import config
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A freshly migrated, empty database for the test."""
+    from utils import database as db
+
+    monkeypatch.setattr(config, 'DATABASE_PATH', tmp_path / 'test.db')
+    db.bootstrap()
+    yield db
+    db.invalidate()
@@ -0,0 +1,49 @@
+"""
+Accepting a rule categorizes only the triage rows it matches
+"""
+from utils import categorizer, triage
+
+def _insert(db, description):
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO transactions (account_id, transaction_date, description, clean_description, amount)
+            VALUES (1, '2026-01-05', ?, ?, -10)
+        """, (description, description))
+        conn.commit()
+        return cursor.lastrowid
+
+def _category(db, txn_id):
+    with db.get_connection() as conn:
+        return conn.execute("SELECT category FROM transactions WHERE id = ?", (txn_id,)).fetchone()[0]
+
+def test_apply_rule_touches_only_matching_pending_rows(database):
+    matched = _insert(database, 'ACME 100% SOFTWARE')
+    skipped = _insert(database, 'ACME 100% TOOLS')
+    other = _insert(database, 'UNRELATED SHOP')
+    wildcard = _insert(database, 'ACME 1000 SOFTWARE')  # '%' in the pattern is literal
+    triage.skip_group('ACME 100% TOOLS')
+    # An older rule only ever catches rows added after it; it must not run here
+    database.add_auto_rule('UNRELATED', 'contains', 'OPERATIONS', 'Shops')
+
+    rule_id = database.add_auto_rule('acme 100%', 'contains', 'OPERATIONS', 'Software')
+    result = categorizer.apply_rule(rule_id)
+
+    assert result['categorized'] == 1
+    assert _category(database, matched) == 'Software'
+    assert _category(database, skipped) is None
+    assert _category(database, other) is None
+    assert _category(database, wildcard) is None
+
+def test_apply_rule_defers_to_higher_ranked_rule(database):
+    txn = _insert(database, 'ACME CLOUD HOSTING')
+    database.add_auto_rule('ACME CLOUD', 'contains', 'OPERATIONS', 'Hosting', priority=1)
+    rule_id = database.add_auto_rule('ACME', 'contains', 'OPERATIONS', 'Software', priority=50)
+    categorizer.apply_rule(rule_id)
+    assert _category(database, txn) == 'Hosting'
+
+def test_apply_rule_regex(database):
+    txn = _insert(database, 'PAYROLL 0042 GUSTO')
+    rule_id = database.add_auto_rule(r'payroll \d+', 'regex', 'OPERATIONS', 'Payroll')
+    assert categorizer.apply_rule(rule_id)['categorized'] == 1
+    assert _category(database, txn) == 'Payroll'
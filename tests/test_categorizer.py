@@ -0,0 +1,80 @@
+"""
+RuleMatcher: regex rules that can't share the combined alternation, and the compiled rule cache
+"""
+import pytest
+
+from utils import categorizer
+from utils.categorizer import RuleMatcher
+
+def _rule(rule_id, pattern, match_type='regex', priority=100):
+    return {'id': rule_id, 'match_pattern': pattern, 'match_type': match_type, 'priority': priority,
+            'bucket': 'OPERATIONS', 'category': f"Rule {rule_id}", 'subcategory': None, 'tag': None}
+
+def _matched(matcher, text):
+    rule = matcher.match(text)
+    return rule['id'] if rule else None
+
+def test_plain_regexes_share_one_pattern():
+    matcher = RuleMatcher([_rule(1, r'UBER\s+TRIP'), _rule(2, r'LYFT|UBER')])
+    assert matcher._regex is not None and not matcher._separate
+    assert _matched(matcher, 'UBER   TRIP 1234') == 1
+    assert _matched(matcher, 'LYFT RIDE') == 2
+    assert _matched(matcher, 'TAXI') is None
+
+def test_inline_flags():
+    matcher = RuleMatcher([_rule(1, r'(?i)uber'), _rule(2, r'LYFT')])
+    assert _matched(matcher, 'UBER EATS') == 1
+    assert _matched(matcher, 'LYFT RIDE') == 2
+
+def test_duplicate_named_groups():
+    matcher = RuleMatcher([_rule(1, r'(?P<m>UBER)'), _rule(2, r'(?P<m>LYFT)')])
+    assert _matched(matcher, 'UBER EATS') == 1
+    assert _matched(matcher, 'LYFT RIDE') == 2
+
+def test_numbered_backreference():
+    matcher = RuleMatcher([_rule(1, r'LYFT'), _rule(2, r'(AB)\1')])
+    assert _matched(matcher, 'PAYMENT ABAB 99') == 2
+    assert _matched(matcher, 'PAYMENT AB 99') is None
+
+def test_separate_regexes_keep_rank_order():
+    rules = [_rule(1, r'(?P<m>COFFEE)', priority=50), _rule(2, r'STARBUCKS', priority=10),
+             _rule(3, r'(?i)starbucks coffee', priority=5), _rule(4, 'STAR', match_type='contains', priority=20)]
+    matcher = RuleMatcher(rules)
+    assert _matched(matcher, 'STARBUCKS COFFEE #12') == 3
+    assert _matched(matcher, 'STARBUCKS #12') == 2
+    assert _matched(matcher, 'STAR MARKET') == 4
+    assert _matched(matcher, 'PEETS COFFEE') == 1
+
+def test_invalid_regex_is_skipped():
+    matcher = RuleMatcher([_rule(1, r'(UBER'), _rule(2, r'LYFT')])
+    assert _matched(matcher, 'UBER') is None
+    assert _matched(matcher, 'LYFT') == 2
+
+def test_invalid_regex_is_rejected_when_saved(database):
+    with pytest.raises(ValueError):
+        database.add_auto_rule('(UBER', 'regex', 'OPERATIONS', 'Travel')
+    assert database.add_auto_rule('(?i)uber', 'regex', 'OPERATIONS', 'Travel')
+
+def test_matcher_is_reused_until_rules_change(database):
+    matcher = categorizer.get_matcher()
+    assert categorizer.get_matcher() is matcher
+    database.add_auto_rule('ZZTEST MERCHANT', 'contains', 'OPERATIONS', 'Software')
+    changed = categorizer.get_matcher()
+    assert changed is not matcher
+    assert changed.match('ZZTEST MERCHANT 123')['category'] == 'Software'
+
+@pytest.mark.parametrize("text, expected", [
+    ("IRS USATAXPYMT 270", 1),
+    ("FIRST NATIONAL BANK", None),
+    ("RME LLC PAYMENT", 2),
+    ("FARMERS INSURANCE", None),
+    ("GUSTO/PAY 1234", 3),
+    ("PAYROLL GUSTO123", 3),
+])
+def test_contains_rules_match_whole_words(text, expected):
+    matcher = RuleMatcher([_rule(1, 'IRS', 'contains'), _rule(2, 'RME', 'contains'), _rule(3, 'GUSTO', 'contains')])
+    assert _matched(matcher, text) == expected
+
+def test_contains_rule_edge_punctuation_needs_no_boundary():
+    matcher = RuleMatcher([_rule(1, 'AMAZON.', 'contains')])
+    assert _matched(matcher, 'AMAZON.COM*2K4') == 1
@@ -0,0 +1,33 @@
+"""
+Cash forecast: account payments follow the shared payment calendar
+"""
+from datetime import date
+
+from utils import forecast
+
+def _add_card(db, due_day):
+    with db.get_connection() as conn:
+        conn.execute("""
+            INSERT INTO accounts (name, institution, account_type, minimum_payment, due_day)
+            VALUES ('Test Card', 'Test', 'credit_card', 100, ?)
+        """, (due_day,))
+        conn.commit()
+    db.invalidate('accounts')
+
+def _due_dates(db, start, days):
+    return [p['due_date'] for p in db.get_upcoming_payments(days=days, start=start) if p['name'] == 'Test Card']
+
+def _forecast_dates(start, days):
+    result = forecast.project_cash_flow(0.0, forecast.get_cash_items(start_date=start, days=days),
+                                        start_date=start, days=days)
+    return [when.isoformat() for when, name, amount in forecast.cash_events(result) if name == 'Test Card']
+
+def test_due_day_31_falls_on_the_last_day_of_short_months(database):
+    _add_card(database, 31)
+    assert _due_dates(database, date(2026, 1, 15), 120) == ['2026-01-31', '2026-02-28', '2026-03-31', '2026-04-30']
+    assert _due_dates(database, date(2026, 12, 15), 60) == ['2026-12-31', '2027-01-31']
+
+def test_forecast_pays_accounts_on_calendar_dates(database):
+    _add_card(database, 31)
+    for start, days in ((date(2026, 1, 15), 120), (date(2026, 12, 15), 60)):
+        assert _forecast_dates(start, days) == _due_dates(database, start, days)
@@ -0,0 +1,65 @@
+"""
+Bank CSV import: duplicate lines and overlapping re-imports
+"""
+import io
+
+from utils import importer
+
+HEADER = "Transaction Date,Post Date,Description,Category,Type,Amount,Memo\n"
+
+# Chase sorts by post date, so identical same-day charges needn't be adjacent
+FIRST_EXPORT = HEADER + (
+    "01/05/2026,01/06/2026,COFFEE SHOP,Food,Sale,-4.50,\n"
+    "01/04/2026,01/06/2026,GROCERY MART,Food,Sale,-52.10,\n"
+    "01/05/2026,01/07/2026,COFFEE SHOP,Food,Sale,-4.50,\n"
+)
+# Overlaps the first export and adds one line
+SECOND_EXPORT = HEADER + (
+    "01/05/2026,01/06/2026,COFFEE SHOP,Food,Sale,-4.50,\n"
+    "01/04/2026,01/06/2026,GROCERY MART,Food,Sale,-52.10,\n"
+    "01/05/2026,01/07/2026,COFFEE SHOP,Food,Sale,-4.50,\n"
+    "01/08/2026,01/08/2026,BOOKSTORE,Shopping,Sale,-20.00,\n"
+)
+
+def _descriptions(db):
+    with db.get_connection() as conn:
+        return sorted(row[0] for row in conn.execute("SELECT description FROM transactions"))
+
+def test_non_adjacent_identical_lines_are_kept(database):
+    result = importer.import_transactions_csv(io.StringIO(FIRST_EXPORT), 1, institution='Chase')
+    assert result['inserted'] == 3 and result['duplicates'] == 0
+    assert _descriptions(database) == ['COFFEE SHOP', 'COFFEE SHOP', 'GROCERY MART']
+
+def test_overlapping_reimport_adds_only_new_lines(database):
+    importer.import_transactions_csv(io.StringIO(FIRST_EXPORT), 1, institution='Chase')
+    result = importer.import_transactions_csv(io.StringIO(SECOND_EXPORT), 1, institution='Chase')
+    assert result['inserted'] == 1 and result['duplicates'] == 3
+    assert _descriptions(database) == ['BOOKSTORE', 'COFFEE SHOP', 'COFFEE SHOP', 'GROCERY MART']
+
+def test_id_range_covers_only_inserted_rows(database):
+    importer.import_transactions_csv(io.StringIO(FIRST_EXPORT), 1, institution='Chase')
+    result = importer.import_transactions_csv(io.StringIO(SECOND_EXPORT), 1, institution='Chase')
+    first, last = result['id_range']
+    with database.get_connection() as conn:
+        rows = conn.execute("SELECT description FROM transactions WHERE id BETWEEN ? AND ?",
+                            (first, last)).fetchall()
+    assert [row[0] for row in rows] == ['BOOKSTORE']
+
+    again = importer.import_transactions_csv(io.StringIO(SECOND_EXPORT), 1, institution='Chase')
+    assert again['inserted'] == 0
+    assert again['id_range'][0] > again['id_range'][1]
+
+def test_import_spanning_chunks(database):
+    result = importer.import_transactions_csv(io.StringIO(SECOND_EXPORT), 1, institution='Chase', chunk_size=1)
+    assert result['inserted'] == 4
+
+def test_failed_import_leaves_nothing(database):
+    def fail(rows):
+        if rows >= 2:
+            raise RuntimeError("stop")
+    try:
+        importer.import_transactions_csv(io.StringIO(SECOND_EXPORT), 1, institution='Chase',
+                                         chunk_size=1, progress=fail)
+    except RuntimeError:
+        pass
+    assert _descriptions(database) == []
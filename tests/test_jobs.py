@@ -0,0 +1,119 @@
+"""
+Background jobs: queueing, cancellation and upload cleanup
+"""
+import json
+import threading
+import time
+
+import config
+from utils import jobs
+from utils.database import get_connection
+
+_release = threading.Event()
+
+@jobs.job('_test_block', "Blocking test job")
+def _block(ctx):
+    _release.wait(10)
+    return "done", None
+
+@jobs.job('_test_writer', "Writing test job")
+def _writer(ctx):
+    # Reports progress from inside a write transaction, like an import
+    with get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT INTO accounts (name, institution, account_type) VALUES ('Test', 'Test', 'checking')")
+        for step in range(500):
+            ctx.progress(step / 500, f"step {step}")
+            time.sleep(0.02)
+        conn.commit()
+    return "done", None
+
+def _wait(job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while jobs.get_job(job_id)['active']:
+        assert time.monotonic() < deadline, "job did not finish"
+        time.sleep(0.02)
+    return jobs.get_job(job_id)
+
+def test_cancelled_queued_job_never_starts_and_removes_its_upload(database, tmp_path):
+    _release.clear()
+    blockers = [jobs.submit('_test_block') for _ in range(config.JOB_WORKERS)]
+    upload = tmp_path / 'upload.csv'
+    upload.write_text("Transaction Date,Post Date,Description,Category,Type,Amount,Memo\n")
+    queued = jobs.submit('transactions_csv', path=str(upload), account_id=1)
+    assert jobs.get_job(queued)['status'] == 'queued'
+
+    assert jobs.cancel(queued)
+    _release.set()
+    for job_id in blockers:
+        assert _wait(job_id)['status'] == 'succeeded'
+    job = _wait(queued)
+    assert job['status'] == 'cancelled' and job['started_at'] is None
+    # The worker that picks it up only cleans up
+    deadline = time.monotonic() + 5
+    while upload.exists() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert not upload.exists()
+    assert jobs.get_job(queued)['status'] == 'cancelled'
+
+def test_failed_job_removes_its_upload(database, tmp_path):
+    upload = tmp_path / 'bad.csv'
+    upload.write_text("foo,bar\n1,2\n")
+    job = _wait(jobs.submit('transactions_csv', path=str(upload), account_id=1))
+    assert job['status'] == 'failed' and 'Unrecognized CSV format' in job['error']
+    assert not upload.exists()
+
+def test_upload_kept_when_asked(database, tmp_path):
+    upload = tmp_path / 'bad.csv'
+    upload.write_text("foo,bar\n1,2\n")
+    _wait(jobs.submit('transactions_csv', path=str(upload), account_id=1, remove_file=False))
+    assert upload.exists()
+
+def test_jobs_that_cant_stop_are_only_cancellable_while_queued(database):
+    _release.clear()
+    blockers = [jobs.submit('_test_block') for _ in range(config.JOB_WORKERS)]
+    queued = jobs.submit('rebuild_rollup')
+    assert jobs.get_job(queued)['cancellable']
+    assert all(jobs.get_job(job_id)['cancellable'] for job_id in blockers)
+    _release.set()
+    job = _wait(queued)
+    assert job['status'] == 'succeeded' and not job['cancellable']
+    assert not jobs._JOBS['rebuild_rollup'][2] and jobs._JOBS['learn_rules'][2]
+
+def test_ensure_queued_reuses_a_waiting_job(database):
+    _release.clear()
+    blockers = [jobs.submit('_test_block') for _ in range(config.JOB_WORKERS)]
+    first = jobs.ensure_queued('learn_rules')
+    assert jobs.ensure_queued('learn_rules') == first
+    _release.set()
+    for job_id in blockers + [first]:
+        _wait(job_id)
+    assert jobs.ensure_queued('learn_rules') != first
+
+def test_job_inside_a_write_transaction_reports_progress_and_cancels(database):
+    job_id = jobs.submit('_test_writer')
+    deadline = time.monotonic() + 5
+    while not (jobs.get_job(job_id)['message'] or '').startswith('step'):
+        assert time.monotonic() < deadline, "no progress reported"
+        time.sleep(0.02)
+    assert jobs.cancel(job_id)
+    job = _wait(job_id)
+    assert job['status'] == 'cancelled'
+    with get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM accounts WHERE name = 'Test'").fetchone()[0] == 0
+
+def test_restart_settles_only_jobs_whose_process_is_gone(database, tmp_path):
+    upload = tmp_path / 'orphan.csv'
+    upload.write_text("")
+    with get_connection() as conn:
+        conn.executemany("INSERT INTO jobs (kind, status, params, owner) VALUES (?, ?, ?, ?)", [
+            ('recategorize', 'running', '{}', jobs._OWNER),
+            ('transactions_csv', 'running', json.dumps({'path': str(upload)}), '999999999:1'),
+            ('recategorize', 'queued', '{}', None),
+        ])
+        conn.commit()
+    jobs._recover_interrupted()
+    with get_connection() as conn:
+        statuses = [row[0] for row in conn.execute("SELECT status FROM jobs ORDER BY id")]
+    assert statuses == ['running', 'failed', 'failed']
+    assert not upload.exists()
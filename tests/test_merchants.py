@@ -0,0 +1,29 @@
+"""
+Merchant normalization: aliases only rewrite merchants they actually name
+"""
+import pytest
+
+from utils.merchants import normalize_description
+
+@pytest.mark.parametrize("raw, clean, merchant", [
+    ("UNITED HEALTHCARE", "UNITED HEALTHCARE", "United Healthcare"),
+    ("DELTA DENTAL OF CA", "DELTA DENTAL OF", "Delta Dental Of"),
+    ("TARGET OPTICAL", "TARGET OPTICAL", "Target Optical"),
+    ("SHELL LUMBER", "SHELL LUMBER", "Shell Lumber"),
+    ("META MEDICAL", "META MEDICAL", "Meta Medical"),
+    ("APPLE VALLEY FARMS", "APPLE VALLEY FARMS", "Apple Valley Farms"),
+])
+def test_generic_words_are_not_aliased(raw, clean, merchant):
+    assert normalize_description(raw) == (clean, merchant)
+
+@pytest.mark.parametrize("raw, clean, merchant", [
+    ("UNITED AIRLINES 0162345", "UNITED AIRLINES", "United Airlines"),
+    ("DELTA AIR 00623", "DELTA AIR LINES", "Delta Air Lines"),
+    ("TARGET 00012345", "TARGET", "Target"),
+    ("SHELL OIL 5744", "SHELL", "Shell"),
+    ("APPLE.COM/BILL", "APPLE", "Apple"),
+    ("FACEBK *ADS 1101", "FACEBOOK ADS", "Facebook"),
+    ("SQ *BLUE BOTTLE", "BLUE BOTTLE", "Blue Bottle"),
+])
+def test_specific_aliases(raw, clean, merchant):
+    assert normalize_description(raw) == (clean, merchant)
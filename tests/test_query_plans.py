@@ -0,0 +1,56 @@
+"""
+EXPLAIN QUERY PLAN regression check for the hot queries, built by the helpers that run them
+"""
+from datetime import date
+
+from utils import nl_query, recurring, reports, triage
+
+PERIOD = {'start': '2025-01-01', 'end': '2025-03-31', 'label': 'Q1 2025'}
+
+def _answer_sql(intent, **params):
+    result = nl_query.RUNNERS[intent]({'period': PERIOD, **params}, date(2025, 4, 15))
+    return result['sql'], result['sql_params']
+
+def _hot_queries(db):
+    return {
+        'partner draws by partner + date range': db.partner_draws_query('Mark', '2025-01-01', '2025-12-31'),
+        'partner draws by date range': db.partner_draws_query(start_date='2025-01-01'),
+        'draw page (partner, newest first)': db.partner_draws_page_query('Mark'),
+        'draw page (partner, by amount)': db.partner_draws_page_query('Katie', sort='highest'),
+        'draw page (all, newest first, keyset)': db.partner_draws_page_query(after=('2025-06-01', 1000)),
+        'draw page (partner, by amount, keyset)': db.partner_draws_page_query('Mark', sort='highest',
+                                                                              after=(500.0, 1000)),
+        'draw page (all, by amount, keyset)': db.partner_draws_page_query(sort='lowest', after=(500.0, 1000)),
+        'triage queue first page': triage.queue_page_query(),
+        'triage queue next page': triage.queue_page_query(after='NETFLIX'),
+        'recurring detection history': (recurring._HISTORY_QUERY, ('2025-01-01', recurring.DEBT_SERVICE_CATEGORY)),
+        'rollup by month range': reports.rollup_query('2025-01', '2025-03'),
+        'largest expenses': _answer_sql('large_expenses', threshold=100.0),
+        'top expenses in a category': _answer_sql('top_expenses', category=('Ad Spend', None)),
+        'category spend by merchant': _answer_sql('category_spend', category=('Ad Spend', 'Google')),
+        'average weekly revenue': _answer_sql('average_revenue', unit='weekly'),
+    }
+
+# Allowed a temp B-tree once an index has narrowed the rows to one period:
+# the rollup sorts a few pre-aggregated rows per month, expense lists keep
+# only the top LIMIT rows by amount, and the answers group one category's rows
+TEMP_SORT_OK = {
+    'rollup by month range',
+    'largest expenses',
+    'top expenses in a category',
+    'category spend by merchant',
+    'average weekly revenue',
+}
+
+def test_hot_queries_use_indexes(database):
+    failing = {r['name']: r['plan'] for r in database.check_query_plans(_hot_queries(database), TEMP_SORT_OK)
+               if not r['ok']}
+    assert not failing, f"Hot queries scanning or sorting in a temp B-tree: {failing}"
+
+def test_check_flags_scans_and_temp_sorts(database):
+    results = {r['name']: r for r in database.check_query_plans({
+        'scan': ("SELECT * FROM transactions WHERE description = ?", ('X',)),
+        'sort': ("SELECT * FROM transactions WHERE account_id = ? ORDER BY amount", (1,)),
+    })}
+    assert not results['scan']['uses_index'] and not results['scan']['ok']
+    assert results['sort']['temp_sort'] and not results['sort']['ok']
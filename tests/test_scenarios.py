@@ -0,0 +1,64 @@
+"""
+What-if scenarios: which flows the sliders scale
+"""
+from datetime import date, timedelta
+
+import numpy as np
+
+from utils import forecast, scenarios
+
+ACCOUNTS = [{'id': 1, 'name': 'Card', 'account_type': 'credit_card', 'minimum_payment': 200.0, 'due_day': 10}]
+PAYMENTS = [{**ACCOUNTS[0], 'due_date': '2026-01-10'}]
+RECURRING = [{'is_active': 1, 'expected_amount': 100.0, 'is_income': 0, 'account_id': None,
+              'description': 'Software', 'frequency': 'monthly', 'day_of_month': 20, 'day_of_week': None,
+              'next_expected': '2026-01-20', 'last_occurrence': '2025-12-20'}]
+NO_VARIANCE = {'revenue_cv': 0.0, 'revenue_delay_sd': 0.0, 'expense_cv': 0.0}
+
+def _end_balance(items, expense_scale):
+    result = scenarios.simulate(1000.0, items, days=31, paths=4, start_date=date(2026, 1, 1),
+                                expense_scale=expense_scale, variance=NO_VARIANCE, seed=1)
+    return float(result.p50[-1])
+
+def test_expense_scale_leaves_account_payments_fixed():
+    items = forecast.build_cash_items(RECURRING, ACCOUNTS, PAYMENTS)
+    assert np.isclose(_end_balance(items, 1.0), 1000 - 200 - 100)
+    assert np.isclose(_end_balance(items, 1.5), 1000 - 200 - 150)
+
+def test_payments_alone_ignore_expense_scale():
+    items = forecast.build_cash_items([], ACCOUNTS, PAYMENTS)
+    assert np.isclose(_end_balance(items, 2.0), 1000 - 200)
+
+def _add_account(db, account_type):
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO accounts (name, institution, account_type) VALUES (?, 'Test', ?)",
+                       (f"Test {account_type}", account_type))
+        conn.commit()
+        return cursor.lastrowid
+
+def _add_transactions(db, rows):
+    with db.get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO transactions (account_id, transaction_date, description, amount, category)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+    db.invalidate('transactions')
+
+def test_card_payments_and_transfers_are_not_revenue(database):
+    checking, card = _add_account(database, 'checking'), _add_account(database, 'credit_card')
+    today = date.today()
+    months = [today - timedelta(days=30 * n) for n in range(1, 5)]
+    _add_transactions(database, [
+        (checking, when.isoformat(), 'CLIENT CO', amount, 'Revenue')
+        for when, amount in zip(months, (1000.0, 1200.0, 800.0, 1000.0))
+    ] + [(checking, when.isoformat(), 'RENT', -500.0, 'Home') for when in months])
+    before = scenarios.estimate_variance()
+
+    _add_transactions(database, [
+        (card, months[0].isoformat(), 'PAYMENT THANK YOU', 5000.0, None),
+        (checking, months[0].isoformat(), 'CARD AUTOPAY', -5000.0, 'Debt Service'),
+        (checking, months[1].isoformat(), 'TRANSFER FROM SAVINGS', 3000.0, None),
+    ])
+    assert scenarios.estimate_variance() == before
+    assert before['revenue_cv'] > 0 and before['expense_cv'] == 0
@@ -0,0 +1,53 @@
+"""
+Triage queue: grouping, skipping and keyset paging
+"""
+from utils import triage
+
+def _insert(db, description, clean=None, amount=-10.0):
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO transactions (account_id, transaction_date, description, clean_description, amount)
+            VALUES (1, '2026-01-05', ?, ?, ?)
+        """, (description, clean, amount))
+        conn.commit()
+        return cursor.lastrowid
+
+def _keys(page):
+    return [group['group_key'] for group in page]
+
+def test_groups_by_clean_description_falling_back_to_raw(database):
+    _insert(database, 'NETFLIX.COM 123', 'NETFLIX', -15.0)
+    _insert(database, 'NETFLIX.COM 456', 'NETFLIX', -15.0)
+    _insert(database, 'RAW ONLY SHOP')
+
+    page = triage.get_queue_page()
+    assert _keys(page) == ['NETFLIX', 'RAW ONLY SHOP']
+    assert page[0]['count'] == 2 and page[0]['total'] == -30.0
+    assert page[0]['sample'] == 'NETFLIX.COM 123'
+    assert triage.get_queue_size() == (2, 3)
+
+def test_skipped_and_categorized_groups_leave_the_queue(database):
+    _insert(database, 'COFFEE 1', 'COFFEE')
+    _insert(database, 'COFFEE 2', 'COFFEE')
+    _insert(database, 'GAS STATION')
+    _insert(database, 'HARDWARE')
+
+    assert triage.skip_group('COFFEE') == 2
+    assert triage.categorize_group('GAS STATION', 'OPERATIONS', 'Fuel') == 1
+    assert _keys(triage.get_queue_page()) == ['HARDWARE']
+    assert triage.get_queue_size() == (1, 1)
+    # Already reviewed, so skipping again changes nothing
+    assert triage.skip_group('COFFEE') == 0
+
+def test_pages_follow_group_key_order(database):
+    for name in ('DELTA', 'ALPHA', 'CHARLIE', 'BRAVO', 'ECHO'):
+        _insert(database, name)
+
+    first = triage.get_queue_page(limit=2)
+    second = triage.get_queue_page(after=first[-1]['group_key'], limit=2)
+    last = triage.get_queue_page(after=second[-1]['group_key'], limit=2)
+    assert _keys(first) == ['ALPHA', 'BRAVO']
+    assert _keys(second) == ['CHARLIE', 'DELTA']
+    assert _keys(last) == ['ECHO']
+    assert triage.prefetch_queue_page(after='ECHO').result() == []
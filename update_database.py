@@ -1,57 +1,35 @@
 """
-Update existing database with credit limits and rewards changes.
+Bring an existing database up to the current schema.
 Run this after updating from an older version.
+Usage: python3 update_database.py
 """
-import sqlite3
-from pathlib import Path
-
-db_path = Path(__file__).parent / "data" / "liquidity.db"
+from utils import database as db
+from utils import merchants, migrations, recurring, rule_learning
 
 print("Updating database...")
 
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
-
-# Add credit_limit column if not exists
-try:
-    cursor.execute("ALTER TABLE accounts ADD COLUMN credit_limit DECIMAL(12,2)")
-    print("Added credit_limit column")
-except:
-    print("credit_limit column already exists")
+applied = db.init_database()
 
-# Update credit limits for credit cards
-credit_limits = {
-    "Chase Ink Reserve": 150000,
-    "Capital One Venture X": 30000,
-    "Amex Gold (Ad Account)": 25000,
-    "Amex Gold (Marketing)": 25000,
-    "Amex Amazon": 10000,
-    "Amex Plum": 50000,
-    "Chase Sapphire": 15000,
-    "Chase Biz Ink": 25000,
-    "Capital One Savor": 10000,
-    "John Lyon Card": 25000,
-}
+if applied:
+    for version, description in applied:
+        print(f"  Applied migration {version}: {description}")
+else:
+    print("  Already up to date")
 
-for name, limit in credit_limits.items():
-    cursor.execute("UPDATE accounts SET credit_limit = ? WHERE name = ?", (limit, name))
-    if cursor.rowcount > 0:
-        print(f"  Updated {name}: ${limit:,}")
+# Every row is re-normalized so alias table changes reach older transactions;
+# only rows whose values change are written
+result = merchants.normalize_transactions(force=True)
+if result['normalized']:
+    print(f"  Normalized {result['normalized']:,} transaction descriptions")
 
-# Update rewards points
-cursor.execute("DELETE FROM rewards_points WHERE program_name = 'Alaska Airlines'")
-cursor.execute("""
-    UPDATE rewards_points SET current_balance = 26789, last_updated = '2026-01-27'
-    WHERE program_name = 'American Airlines'
-""")
-cursor.execute("""
-    INSERT OR REPLACE INTO rewards_points (program_name, current_balance, point_value, last_updated)
-    VALUES ('Atmos Rewards (Alaska/Hawaiian)', 551625, 0.014, '2026-01-27')
-""")
+# Manual categorizations not yet folded into the rule-learning counts
+result = rule_learning.learn_rules()
+if result['proposed']:
+    print(f"  Proposed {result['proposed']:,} auto-categorization rules (review on the Transactions page)")
 
-conn.commit()
-conn.close()
+# Recurring charges and deposits found in the transaction history
+result = recurring.sync_recurring()
+if result['added']:
+    print(f"  Detected {result['added']:,} new recurring transactions (review on the Forecaster page)")
 
-print("\n✅ Database updated successfully!")
-print("\nCredit cards now have credit limits.")
-print("Rewards updated: AA=26,789 | Atmos=551,625")
+print(f"\n✅ Database at schema version {db.get_schema_version()} (latest {migrations.LATEST_VERSION})")
@@ -0,0 +1,166 @@
+"""
+Liquidity Engine - Balance History
+Account balances over time as a NumPy matrix, downsampled in SQL for long ranges
+"""
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+
+from utils.database import cached, get_connection, get_all_accounts
+from utils.forecast import CASH_ACCOUNT_TYPES
+
+# Ranges up to this many days stay daily, up to the next are weekly, longer are monthly
+DAILY_MAX_DAYS = 120
+WEEKLY_MAX_DAYS = 730
+
+# Period start for each resolution, as SQLite date expressions
+_PERIOD_SQL = {
+    'daily': "balance_date",
+    'weekly': "date(balance_date, 'weekday 0', '-6 days')",  # Monday of the week
+    'monthly': "date(balance_date, 'start of month')",
+}
+
+BalanceSeries = namedtuple('BalanceSeries', [
+    'dates',         # datetime64[D] (n,): start of each day / week / month
+    'account_ids',   # int64 (k,)
+    'names',         # tuple of str (k,)
+    'types',         # tuple of str (k,)
+    'limits',        # float64 (k,): credit limits, NaN where none
+    'balances',      # float64 (n, k): end-of-period balance, carried forward; NaN before the first record
+    'resolution',    # 'daily' | 'weekly' | 'monthly'
+])
+
+def pick_resolution(start, end):
+    days = (end - start).days
+    if days <= DAILY_MAX_DAYS:
+        return 'daily'
+    if days <= WEEKLY_MAX_DAYS:
+        return 'weekly'
+    return 'monthly'
+
+def _period_axis(start, end, resolution):
+    start, end = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+    if resolution == 'daily':
+        return np.arange(start, end + 1)
+    if resolution == 'weekly':
+        monday = start - (start.astype(np.int64) - 4) % 7  # 1970-01-05 was a Monday
+        return np.arange(monday, end + 1, 7)
+    return np.arange(start.astype('datetime64[M]'), end.astype('datetime64[M]') + 1).astype('datetime64[D]')
+
+def _forward_fill(matrix):
+    """Carry each column's last value down over NaN gaps."""
+    rows = np.where(np.isnan(matrix), 0, np.arange(len(matrix))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return matrix[rows, np.arange(matrix.shape[1])]
+
+def get_balance_history(account_ids=None, start=None, end=None, resolution='auto'):
+    """Balances for many accounts at once, one row per day, week or month.
+
+    account_ids defaults to every active account and start to the first
+    recorded balance. 'auto' resolution picks daily, weekly or monthly from
+    the range length. Each period holds the last balance recorded in it;
+    balances carry forward until the next record. The arrays are shared
+    through the read cache and are read-only.
+    """
+    if account_ids is None:
+        account_ids = [acc['id'] for acc in get_all_accounts()]
+    end = date.fromisoformat(str(end)) if end else date.today()
+    start = date.fromisoformat(str(start)) if start else None
+    return _balance_history(tuple(sorted(account_ids)), start, end, resolution)
+
+@cached('balances', 'accounts')
+def _balance_history(account_ids, start, end, resolution):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        marks = ', '.join('?' * len(account_ids))
+        if start is None:
+            cursor.execute(f"SELECT MIN(balance_date) FROM balance_history WHERE account_id IN ({marks})",
+                           account_ids)
+            first = cursor.fetchone()[0]
+            start = date.fromisoformat(first) if first else end
+        if resolution == 'auto':
+            resolution = pick_resolution(start, end)
+        period = _PERIOD_SQL[resolution]
+
+        cursor.execute(f"SELECT id, name, account_type, credit_limit FROM accounts WHERE id IN ({marks})",
+                       account_ids)
+        info = {row[0]: row[1:] for row in cursor.fetchall()}
+
+        # Last balance per account per period (SQLite returns the bare
+        # columns from the row that holds the MAX)
+        cursor.execute(f"""
+            SELECT account_id, {period} AS period, balance, MAX(balance_date)
+            FROM balance_history
+            WHERE balance_date BETWEEN ? AND ? AND account_id IN ({marks})
+            GROUP BY account_id, period
+        """, (start.isoformat(), end.isoformat()) + account_ids)
+        rows = cursor.fetchall()
+        # Balance carried in from before the range
+        cursor.execute(f"""
+            SELECT account_id, balance, MAX(balance_date)
+            FROM balance_history
+            WHERE balance_date < ? AND account_id IN ({marks})
+            GROUP BY account_id
+        """, (start.isoformat(),) + account_ids)
+        carried = cursor.fetchall()
+
+    dates = _period_axis(start, end, resolution)
+    ids = np.array(account_ids, dtype=np.int64)
+    column = {account_id: i for i, account_id in enumerate(account_ids)}
+    matrix = np.full((len(dates) + 1, len(ids)), np.nan)  # row 0 holds the carried-in balances
+
+    for account_id, balance, _ in carried:
+        matrix[0, column[account_id]] = balance
+    if rows:
+        accounts, periods, balances, _ = zip(*rows)
+        cols = np.fromiter((column[a] for a in accounts), np.int64, len(accounts))
+        positions = np.searchsorted(dates, np.array(periods, dtype='datetime64[D]'))
+        matrix[positions + 1, cols] = np.array(balances, dtype=np.float64)
+
+    balances = _forward_fill(matrix)[1:]
+    limits = np.array([info.get(a, (None, None, None))[2] or np.nan for a in account_ids], dtype=np.float64)
+    for array in (dates, ids, balances, limits):
+        array.flags.writeable = False
+    return BalanceSeries(
+        dates=dates,
+        account_ids=ids,
+        names=tuple(info.get(a, ('?',))[0] for a in account_ids),
+        types=tuple(info.get(a, (None, None))[1] for a in account_ids),
+        limits=limits,
+        balances=balances,
+        resolution=resolution,
+    )
+
+# ============ Aggregates ============
+
+def debt_over_time(series):
+    """Total owed per period: positive balances on every non-cash account.
+
+    Accounts with no balance recorded yet count as zero.
+    """
+    debt = np.array([t not in CASH_ACCOUNT_TYPES for t in series.types], dtype=bool)
+    return np.nansum(np.clip(series.balances[:, debt], 0, None), axis=1)
+
+def utilization_over_time(series):
+    """Credit card utilization (0-1) per period, against today's credit limits.
+
+    Only cards with a limit and a recorded balance in a period count
+    toward that period, so a card's history starting late doesn't dilute
+    the early periods. NaN where no card has a balance.
+    """
+    cards = np.array([t == 'credit_card' for t in series.types], dtype=bool) & (np.nan_to_num(series.limits) > 0)
+    balances = series.balances[:, cards]
+    known = ~np.isnan(balances)
+    limit = (known * series.limits[cards]).sum(axis=1)
+    used = np.where(known, balances, 0).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(limit > 0, used / limit, np.nan)
+
+def to_frame(series):
+    """The balance matrix as a DataFrame: one column per account name, indexed by period."""
+    import pandas as pd
+
+    return pd.DataFrame(series.balances, index=pd.DatetimeIndex(series.dates, name='date'),
+                        columns=series.names)
@@ -0,0 +1,19 @@
+"""
+One-time app startup shared by all pages
+"""
+import streamlit as st
+
+from utils import database as db
+
+@st.cache_resource(show_spinner=False)
+def _bootstrap_process():
+    db.bootstrap()
+    return True
+
+def ensure_database():
+    """Call near the top of each page before touching the database.
+
+    Streamlit reruns page scripts on every interaction; the cached resource
+    makes this free after the first run in the process.
+    """
+    _bootstrap_process()
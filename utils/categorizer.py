@@ -0,0 +1,346 @@
+"""
+Liquidity Engine - Auto-Categorization
+Compiles auto_rules into a single matcher and applies it to transactions
+"""
+import re
+import time
+from collections import deque
+
+from utils.database import cached, get_connection, invalidate
+from utils.triage import PENDING
+
+# Rules are ranked by (priority, id): lower priority numbers win, ties go to the older rule.
+
+MATCH_MEMO_SIZE = 50000  # Distinct descriptions whose match a categorize pass remembers
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: one pass over the text finds every pattern.
+
+    Transitions are precomputed into a full DFA over the pattern alphabet, so
+    scanning is a single dict lookup per character; characters that never
+    appear in a pattern drop straight back to the root. With whole_words, a
+    pattern that starts or ends with a letter only matches where the text
+    has no letter next to that end (IRS matches "IRS USATAXPYMT", not "FIRST").
+    """
+
+    def __init__(self, patterns, whole_words=False):
+        # patterns: iterable of (pattern, value)
+        goto = [{}]
+        outputs = [[]]
+        for pattern, value in patterns:
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append((value, len(pattern), pattern[0].isalpha(), pattern[-1].isalpha()))
+
+        # Breadth-first pass: failure links, merged outputs, full transition table
+        fail = [0] * len(goto)
+        delta = [dict(g) for g in goto]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                fail[nxt] = delta[fail[state]].get(ch, 0)
+                outputs[nxt] = outputs[nxt] + outputs[fail[nxt]]
+            for ch, target in delta[fail[state]].items():
+                delta[state].setdefault(ch, target)
+
+        self._delta = delta
+        # Smallest value first, so best() can stop at the first hit that counts
+        self._outputs = [tuple(sorted(o, key=lambda item: item[0])) for o in outputs]
+        self._whole_words = whole_words
+
+    def _counts(self, text, end, length, check_start, check_end):
+        """Whether the hit ending at text[end] satisfies whole_words."""
+        if not self._whole_words:
+            return True
+        start = end - length + 1
+        if check_start and start > 0 and text[start - 1].isalpha():
+            return False
+        if check_end and end + 1 < len(text) and text[end + 1].isalpha():
+            return False
+        return True
+
+    def iter_matches(self, text):
+        """Yield the value of every pattern occurring in text."""
+        delta = self._delta
+        outputs = self._outputs
+        state = 0
+        for end, ch in enumerate(text):
+            state = delta[state].get(ch, 0)
+            for value, length, check_start, check_end in outputs[state]:
+                if self._counts(text, end, length, check_start, check_end):
+                    yield value
+
+    def best(self, text):
+        """Smallest value among all patterns occurring in text, or None."""
+        delta = self._delta
+        outputs = self._outputs
+        best = None
+        state = 0
+        for end, ch in enumerate(text):
+            state = delta[state].get(ch, 0)
+            out = outputs[state]
+            if not out:
+                continue
+            for value, length, check_start, check_end in out:
+                if best is not None and value >= best:
+                    break
+                if self._counts(text, end, length, check_start, check_end):
+                    best = value
+                    break
+        return best
+
+REGEX_FLAGS = re.IGNORECASE | re.DOTALL
+
+def _branch(pattern, name):
+    # Lookahead scans for the rule anywhere; the empty marker group
+    # closes last, so lastgroup names the winning rule
+    return f"(?=.*?(?:{pattern}))(?P<{name}>)"
+
+def _branch_error(pattern):
+    """Why pattern can't be a branch of the combined regex (inline flags, etc.), or None."""
+    try:
+        re.compile(_branch(pattern, "_rule"), REGEX_FLAGS)
+    except re.error as e:
+        return str(e)
+    return None
+
+class RuleMatcher:
+    """Compiled form of the active auto_rules.
+
+    - contains: one Aho-Corasick automaton over all patterns, matched as whole words
+    - exact: dict lookup on the normalized description
+    - regex: one alternation, ordered by rank, so the first branch that
+      matches is the best regex rule. Patterns that can't share it - inline
+      flags, capturing groups (backreferences would be renumbered), or a
+      combination Python refuses - are compiled on their own and tried in
+      rank order.
+    """
+
+    def __init__(self, rules):
+        self.rules = {}
+        contains, exact, regexes = [], {}, []
+        self._separate = []
+        for rule in rules:
+            rank = (rule['priority'] if rule['priority'] is not None else 100, rule['id'])
+            self.rules[rank] = rule
+            pattern = rule['match_pattern'] or ''
+            match_type = (rule['match_type'] or 'contains').lower()
+            if match_type == 'exact':
+                key = pattern.strip().upper()
+                if key not in exact or rank < exact[key]:
+                    exact[key] = rank
+            elif match_type == 'regex':
+                try:
+                    compiled = re.compile(pattern, REGEX_FLAGS)
+                except re.error:
+                    continue  # Invalid; rejected when rules are saved, skipped if one slips in
+                if compiled.groups or _branch_error(pattern):
+                    self._separate.append((rank, compiled))
+                else:
+                    regexes.append((rank, pattern))
+            else:
+                contains.append((pattern.upper(), rank))
+
+        self._contains = AhoCorasick(contains, whole_words=True) if contains else None
+        self._exact = exact
+        self._regex = None
+        self._regex_ranks = {}
+        if regexes:
+            branches = []
+            for i, (rank, pattern) in enumerate(sorted(regexes)):
+                name = f"_rule{i}"
+                self._regex_ranks[name] = rank
+                branches.append(_branch(pattern, name))
+            try:
+                self._regex = re.compile("|".join(branches), REGEX_FLAGS)
+            except re.error:
+                self._regex_ranks = {}
+                self._separate.extend((rank, re.compile(pattern, REGEX_FLAGS)) for rank, pattern in regexes)
+        self._separate.sort(key=lambda item: item[0])
+
+    def match_rank(self, text):
+        """Rank of the best matching rule for text, or None."""
+        if not text:
+            return None
+        upper = text.upper()
+        best = self._exact.get(upper.strip())
+        if self._contains is not None:
+            rank = self._contains.best(upper)
+            if rank is not None and (best is None or rank < best):
+                best = rank
+        if self._regex is not None:
+            m = self._regex.match(text)
+            if m:
+                rank = self._regex_ranks[m.lastgroup]
+                if best is None or rank < best:
+                    best = rank
+        for rank, compiled in self._separate:
+            if best is not None and rank > best:
+                break
+            if compiled.search(text):
+                return rank
+        return best
+
+    def match(self, description, clean_description=None):
+        """Best matching rule row for a transaction, or None."""
+        best = self.match_rank(description)
+        if clean_description:
+            rank = self.match_rank(clean_description)
+            if rank is not None and (best is None or rank < best):
+                best = rank
+        return self.rules[best] if best is not None else None
+
+# ============ Compiled Rule Cache ============
+
+def _load_rules():
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, match_pattern, match_type, bucket, category, subcategory, tag, priority
+            FROM auto_rules
+            WHERE is_active = 1
+            ORDER BY priority, id
+        """)
+        return [dict(row) for row in cursor.fetchall()]
+
+@cached('rules')
+def get_matcher():
+    """Get the compiled matcher for the active rules.
+
+    Cached under the 'rules' tag, which every rule write invalidates, so
+    the next call after a change recompiles and other calls cost a dict lookup.
+    """
+    return RuleMatcher(_load_rules())
+
+def categorize_transactions(transaction_ids=None, batch_size=10000, progress=None, id_range=None):
+    """Apply auto_rules to uncategorized transactions.
+
+    Each distinct description is matched once; hits are staged in a temp
+    table and written back with a single UPDATE ... FROM. transaction_ids
+    or an inclusive (first, last) id_range - such as a fresh import's -
+    limit the pass to those rows.
+    Returns counts of rows scanned and categorized. progress, if given, is
+    called with the rows scanned so far after each batch.
+    """
+    started = time.perf_counter()
+    matcher = get_matcher()
+    scanned = 0
+    memo = {}
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        # Take the write lock up front: a read transaction that upgrades at the
+        # final UPDATE fails outright if another writer committed in between
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS _rule_hits (txn_id INTEGER PRIMARY KEY, rule_id INTEGER NOT NULL)")
+        cursor.execute("DELETE FROM _rule_hits")
+
+        query = """
+            SELECT id, description, clean_description FROM transactions
+            WHERE is_categorized = 0
+        """
+        if transaction_ids is not None:
+            ids = list(transaction_ids)
+            if not ids:
+                return {'scanned': 0, 'categorized': 0, 'seconds': 0.0}
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS _rule_targets (txn_id INTEGER PRIMARY KEY)")
+            cursor.execute("DELETE FROM _rule_targets")
+            cursor.executemany("INSERT OR IGNORE INTO _rule_targets VALUES (?)", ((i,) for i in ids))
+            query += " AND id IN (SELECT txn_id FROM _rule_targets)"
+        params = ()
+        if id_range is not None:
+            query += " AND id BETWEEN ? AND ?"
+            params = tuple(id_range)
+
+        reader = conn.cursor()
+        reader.row_factory = None  # plain tuples; Row objects cost more than the matching
+        reader.execute(query, params)
+        while True:
+            rows = reader.fetchmany(batch_size)
+            if not rows:
+                break
+            scanned += len(rows)
+            hits = []
+            for txn_id, description, clean_description in rows:
+                key = (description, clean_description)
+                rule = memo.get(key, False)
+                if rule is False:
+                    if len(memo) >= MATCH_MEMO_SIZE:
+                        memo.clear()
+                    rule = memo[key] = matcher.match(description, clean_description)
+                if rule is not None:
+                    hits.append((txn_id, rule['id']))
+            cursor.executemany("INSERT INTO _rule_hits (txn_id, rule_id) VALUES (?, ?)", hits)
+            if progress:
+                progress(scanned)
+
+        cursor.execute("""
+            UPDATE transactions
+            SET bucket = r.bucket,
+                category = r.category,
+                subcategory = r.subcategory,
+                tag = r.tag,
+                is_categorized = 1,
+                auto_categorized = 1
+            FROM _rule_hits h
+            JOIN auto_rules r ON r.id = h.rule_id
+            WHERE transactions.id = h.txn_id
+        """)
+        categorized = cursor.rowcount
+        cursor.execute("DELETE FROM _rule_hits")
+        conn.commit()
+        invalidate('transactions')
+
+    return {
+        'scanned': scanned,
+        'categorized': categorized,
+        'seconds': time.perf_counter() - started,
+    }
+
+def apply_rule(rule_id):
+    """Categorize the transactions awaiting triage that one rule matches.
+
+    For a rule just added or accepted: only rows the rule itself matches are
+    passed to categorize_transactions (which still lets a higher-ranked rule
+    win), and rows the user skipped in triage are left alone. contains and
+    exact rules are narrowed in SQL first.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, match_pattern, match_type, bucket, category, subcategory, tag, priority
+            FROM auto_rules WHERE id = ? AND is_active = 1
+        """, (rule_id,))
+        rule = cursor.fetchone()
+        if rule is None:
+            return {'scanned': 0, 'categorized': 0, 'seconds': 0.0}
+        query = f"SELECT id, description, clean_description FROM transactions WHERE {PENDING}"
+        params = []
+        pattern = (rule['match_pattern'] or '').upper()
+        match_type = (rule['match_type'] or 'contains').lower()
+        if match_type == 'exact':
+            query += " AND (UPPER(TRIM(description)) = ? OR UPPER(TRIM(clean_description)) = ?)"
+            params = [pattern.strip()] * 2
+        elif match_type != 'regex':
+            like = '%' + re.sub(r'([%_\\])', r'\\\1', pattern) + '%'
+            query += " AND (description LIKE ? ESCAPE '\\' OR clean_description LIKE ? ESCAPE '\\')"
+            params = [like] * 2
+        cursor.row_factory = None
+        cursor.execute(query, params)
+        candidates = cursor.fetchall()
+
+    matcher = RuleMatcher([dict(rule)])
+    ids = [txn_id for txn_id, description, clean_description in candidates
+           if matcher.match(description, clean_description) is not None]
+    return categorize_transactions(ids)
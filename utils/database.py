@@ -1,284 +1,312 @@
 """
 Liquidity Engine - Database Operations
 """
+import functools
+import hashlib
+import re
 import sqlite3
-from datetime import datetime, date
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from datetime import datetime, date, timedelta
 from pathlib import Path
 from contextlib import contextmanager
+from types import MappingProxyType
 import config
+from utils import migrations
+
+# ============ Connection Pool ============
+
+class ConnectionPool:
+    """Process-wide pool of long-lived SQLite connections.
+
+    Connections are opened once, tuned with WAL and the pragmas from config,
+    and handed out to one thread at a time. Streamlit sessions run on separate
+    threads, so each rerun borrows an already-open connection instead of
+    paying for a file open and schema load.
+    """
+
+    def __init__(self, db_path, max_size=None, timeout=None):
+        self.db_path = str(db_path)
+        self.max_size = max_size or config.DB_POOL_SIZE
+        self.timeout = config.DB_POOL_TIMEOUT if timeout is None else timeout
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._open = 0
+        self._stats = {
+            'opened': 0,
+            'closed': 0,
+            'checkouts': 0,
+            'reused': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'overflow': 0,
+            'rollbacks': 0,
+        }
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(config.DB_BUSY_TIMEOUT_MS)}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = -{int(config.DB_CACHE_SIZE_KB)}")
+        conn.execute(f"PRAGMA mmap_size = {int(config.DB_MMAP_SIZE)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def acquire(self):
+        """Borrow a connection, opening one if the pool is not yet full."""
+        with self._cond:
+            self._stats['checkouts'] += 1
+            if self._idle:
+                self._stats['reused'] += 1
+                return self._idle.pop(), False
+            if self._open < self.max_size:
+                self._open += 1
+                self._stats['opened'] += 1
+                overflow = False
+            else:
+                self._stats['waits'] += 1
+                started = time.perf_counter()
+                self._cond.wait_for(lambda: self._idle, timeout=self.timeout)
+                self._stats['wait_seconds'] += time.perf_counter() - started
+                if self._idle:
+                    self._stats['reused'] += 1
+                    return self._idle.pop(), False
+                # Pool exhausted (e.g. nested get_connection calls) - don't deadlock
+                self._stats['opened'] += 1
+                self._stats['overflow'] += 1
+                overflow = True
+        try:
+            return self._connect(), overflow
+        except Exception:
+            if not overflow:
+                with self._cond:
+                    self._open -= 1
+            raise
+
+    def release(self, conn, overflow=False):
+        """Return a connection, discarding any transaction the caller left open."""
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                self.discard(conn, overflow)
+                return
+            with self._cond:
+                self._stats['rollbacks'] += 1
+        if overflow:
+            conn.close()
+            with self._cond:
+                self._stats['closed'] += 1
+            return
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def discard(self, conn, overflow=False):
+        """Close a connection that is no longer safe to reuse."""
+        try:
+            conn.close()
+        finally:
+            with self._cond:
+                self._stats['closed'] += 1
+                if not overflow:
+                    self._open -= 1
+                    self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection (borrowed ones are closed on release)."""
+        with self._cond:
+            while self._idle:
+                self._idle.pop().close()
+                self._open -= 1
+                self._stats['closed'] += 1
+
+    def stats(self):
+        """Snapshot of pool counters."""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['db_path'] = self.db_path
+            stats['max_size'] = self.max_size
+            stats['open'] = self._open
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._open - len(self._idle)
+            stats['hit_rate'] = (stats['reused'] / stats['checkouts']) if stats['checkouts'] else 0.0
+            return stats
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Get the process-wide pool, rebuilding it if DATABASE_PATH changed."""
+    global _pool
+    db_path = str(config.DATABASE_PATH)
+    pool = _pool
+    if pool is not None and pool.db_path == db_path:
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.db_path != db_path:
+            if _pool is not None:
+                _pool.close_all()
+            _pool = ConnectionPool(db_path)
+        return _pool
+
+def get_pool_stats():
+    """Get connection pool counters (opened, reused, waits, in_use, ...)."""
+    return get_pool().stats()
+
+def close_pool():
+    """Close all pooled connections (tests, shutdown, or before replacing the DB file)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
 
 @contextmanager
 def get_connection():
-    """Context manager for database connections."""
-    conn = sqlite3.connect(config.DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
+    """Context manager for database connections.
+
+    Borrows a pooled connection; uncommitted work is rolled back when the
+    block exits, matching the old open/close-per-call behaviour.
+    """
+    pool = get_pool()
+    conn, overflow = pool.acquire()
     try:
         yield conn
     finally:
-        conn.close()
+        pool.release(conn, overflow)
+
+# ============ Read Cache ============
+# Read helpers are memoized under one or more tags; write helpers bump the
+# tags they touch, which makes every cached entry under that tag stale.
+
+CACHE_MAX_ENTRIES = 256
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_tag_versions = {}
+_cache_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+def invalidate(*tags):
+    """Mark cached reads under these tags stale (no tags = everything)."""
+    with _cache_lock:
+        if not tags:
+            _cache.clear()
+            tags = tuple(_tag_versions)
+        for tag in tags:
+            _tag_versions[tag] = _tag_versions.get(tag, 0) + 1
+        _cache_stats['invalidations'] += 1
+
+def cached(*tags):
+    """Memoize a read helper until one of its tags is invalidated."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__qualname__, str(config.DATABASE_PATH), args, tuple(sorted(kwargs.items())))
+            with _cache_lock:
+                versions = tuple(_tag_versions.get(t, 0) for t in tags)
+                entry = _cache.get(key)
+                if entry is not None and entry[0] == versions:
+                    _cache.move_to_end(key)
+                    _cache_stats['hits'] += 1
+                    value = entry[1]
+                    return dict(value) if isinstance(value, dict) else value
+                _cache_stats['misses'] += 1
+            value = func(*args, **kwargs)
+            if isinstance(value, list):
+                value = tuple(value)  # shared across sessions, so keep it read-only
+            with _cache_lock:
+                _cache[key] = (versions, value)
+                _cache.move_to_end(key)
+                while len(_cache) > CACHE_MAX_ENTRIES:
+                    _cache.popitem(last=False)
+            return dict(value) if isinstance(value, dict) else value
+        wrapper.cache_tags = tags
+        return wrapper
+    return decorator
+
+def get_cache_stats():
+    """Get read-cache counters and the current version of each tag."""
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['entries'] = len(_cache)
+        stats['tags'] = dict(_tag_versions)
+        return stats
 
 def init_database():
-    """Initialize the database with all tables."""
+    """Bring the database schema up to date.
+
+    Returns the migrations applied; once the database is current this is a
+    single PRAGMA user_version read.
+    """
     with get_connection() as conn:
-        cursor = conn.cursor()
-        
-        # Accounts table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS accounts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                institution TEXT NOT NULL,
-                account_type TEXT NOT NULL,
-                last_four TEXT,
-                current_balance DECIMAL(12,2) DEFAULT 0,
-                credit_limit DECIMAL(12,2),
-                minimum_payment DECIMAL(12,2) DEFAULT 0,
-                due_day INTEGER,
-                interest_rate DECIMAL(5,2),
-                payoff_date DATE,
-                is_business BOOLEAN DEFAULT 1,
-                is_active BOOLEAN DEFAULT 1,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Transactions table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                account_id INTEGER NOT NULL,
-                transaction_date DATE NOT NULL,
-                post_date DATE,
-                description TEXT NOT NULL,
-                clean_description TEXT,
-                amount DECIMAL(12,2) NOT NULL,
-                transaction_type TEXT,
-                bucket TEXT,
-                category TEXT,
-                subcategory TEXT,
-                tag TEXT,
-                is_categorized BOOLEAN DEFAULT 0,
-                is_reviewed BOOLEAN DEFAULT 0,
-                auto_categorized BOOLEAN DEFAULT 0,
-                merchant_name TEXT,
-                reference_number TEXT,
-                notes TEXT,
-                import_hash TEXT UNIQUE,
-                imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (account_id) REFERENCES accounts(id)
-            )
-        """)
-        
-        # Categories table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS categories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                bucket TEXT NOT NULL,
-                category TEXT NOT NULL,
-                subcategory TEXT,
-                is_active BOOLEAN DEFAULT 1,
-                display_order INTEGER,
-                UNIQUE(bucket, category, subcategory)
-            )
-        """)
-        
-        # Tags table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS tags (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE,
-                description TEXT,
-                start_date DATE,
-                end_date DATE,
-                budget DECIMAL(12,2),
-                is_active BOOLEAN DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Auto-categorization rules table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS auto_rules (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                match_pattern TEXT NOT NULL,
-                match_type TEXT DEFAULT 'contains',
-                bucket TEXT NOT NULL,
-                category TEXT NOT NULL,
-                subcategory TEXT,
-                tag TEXT,
-                priority INTEGER DEFAULT 100,
-                is_active BOOLEAN DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Recurring transactions table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS recurring_transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                account_id INTEGER,
-                description TEXT NOT NULL,
-                expected_amount DECIMAL(12,2),
-                frequency TEXT NOT NULL,
-                day_of_month INTEGER,
-                day_of_week INTEGER,
-                bucket TEXT,
-                category TEXT,
-                subcategory TEXT,
-                is_income BOOLEAN DEFAULT 0,
-                is_active BOOLEAN DEFAULT 1,
-                last_occurrence DATE,
-                next_expected DATE,
-                notes TEXT,
-                FOREIGN KEY (account_id) REFERENCES accounts(id)
-            )
-        """)
-        
-        # Balance history table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS balance_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                account_id INTEGER NOT NULL,
-                balance_date DATE NOT NULL,
-                balance DECIMAL(12,2) NOT NULL,
-                recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (account_id) REFERENCES accounts(id),
-                UNIQUE(account_id, balance_date)
-            )
-        """)
-        
-        # Rewards points table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS rewards_points (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                program_name TEXT NOT NULL UNIQUE,
-                current_balance INTEGER DEFAULT 0,
-                point_value DECIMAL(6,4),
-                last_updated DATE,
-                notes TEXT
-            )
-        """)
-        
-        # Partner draws table (Mark & Kelly personal draws from business)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS partner_draws (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                partner TEXT NOT NULL,
-                draw_date DATE NOT NULL,
-                description TEXT NOT NULL,
-                amount DECIMAL(12,2) NOT NULL,
-                notes TEXT,
-                transaction_id INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (transaction_id) REFERENCES transactions(id)
-            )
-        """)
-        
-        conn.commit()
+        applied = migrations.migrate(conn)
+    if applied:
+        invalidate()
+    return applied
+
+_bootstrapped_path = None
+_bootstrap_lock = threading.Lock()
+
+def bootstrap():
+    """One-time, per-process database setup; call before the first query.
+
+    Runs pending migrations the first time it is called for the configured
+    DATABASE_PATH and is a no-op afterwards. Pages reach it through
+    utils.bootstrap.ensure_database(), which adds st.cache_resource on top.
+    """
+    global _bootstrapped_path
+    db_path = str(config.DATABASE_PATH)
+    if _bootstrapped_path == db_path:
+        return False
+    with _bootstrap_lock:
+        if _bootstrapped_path != db_path:
+            init_database()
+            _bootstrapped_path = db_path
+            return True
+    return False
 
-def seed_initial_data():
-    """Seed the database with Mark's accounts and initial data."""
+def get_schema_version():
+    """Get the last applied migration number."""
     with get_connection() as conn:
-        cursor = conn.cursor()
-        
-        # Check if accounts already exist
-        cursor.execute("SELECT COUNT(*) FROM accounts")
-        if cursor.fetchone()[0] > 0:
-            return  # Already seeded
-        
-        # Insert accounts (name, institution, type, last4, balance, credit_limit, payment, due_day, rate, payoff, business, active, notes)
-        accounts = [
-            # Credit Cards
-            ("Chase Ink Reserve", "Chase", "credit_card", "0678", 141398.50, 150000, 122291.79, 17, None, None, 1, 1, "CRITICAL: Huge payment due"),
-            ("Capital One Venture X", "Capital One", "credit_card", "8615", 17538.56, 30000, 17538.56, 20, None, None, 1, 1, "Pay Full Balance"),
-            ("Amex Gold (Ad Account)", "Amex", "credit_card", "51008", 6560.22, 25000, 4355.21, 2, None, None, 1, 1, "Primary ad spend card"),
-            ("Amex Gold (Marketing)", "Amex", "credit_card", "51001", 5465.09, 25000, 1282.11, 18, None, None, 1, 1, "Marketing Card"),
-            ("Amex Amazon", "Amex", "credit_card", "61002", 1111.63, 10000, 35.00, 15, None, None, 1, 1, "Amazon Prime"),
-            ("Amex Plum", "Amex", "credit_card", "31003", 235.60, 50000, 0, None, None, None, 1, 1, "Flexible Pay"),
-            ("Chase Sapphire", "Chase", "credit_card", "5125", 887.07, 15000, 0, 4, None, None, 0, 1, "Personal"),
-            ("Chase Biz Ink", "Chase", "credit_card", "8187", 0, 25000, 0, 9, None, None, 1, 1, "Zero Balance"),
-            ("Capital One Savor", "Capital One", "credit_card", "5920", 1929.86, 10000, 1929.86, None, None, None, 0, 1, "Personal card"),
-            
-            # Loans (no credit limit)
-            ("Tax Debt (Katie)", "IRS", "tax_debt", None, 40377.78, None, 1230.00, 15, None, None, 1, 1, "2020/2021 Taxes"),
-            ("Land Rover Auto Loan", "Land Rover Financial", "auto_loan", None, 63940.87, None, 1596.07, 27, None, "2029-07-27", 0, 1, "Loan Ends July 2029"),
-            ("Best Egg Personal Loan", "Best Egg", "personal_loan", "1753", 32545.15, None, 1283.58, 7, None, None, 0, 1, "Autopay ON"),
-            ("LendingPoint Personal Loan", "LendingPoint", "personal_loan", "6143", 8744.74, None, 1139.15, 23, None, None, 0, 1, "16 Payments Left"),
-            
-            # Private Loans
-            ("Sandra Lopez Loan", "Sandra Lopez", "private_loan", None, 117000.00, None, 3000.00, 1, 0, None, 0, 1, "No interest - straight paydown"),
-            ("John Lyon Card", "Chase (for John Lyon)", "credit_card", None, 19600.00, 25000, 1400.00, 22, None, "2027-03-21", 0, 1, "Paying on behalf of John Lyon"),
-            ("Martin Toha", "Martin Toha", "private_loan", None, 30000.00, None, 0, None, None, None, 0, 1, "No payment plan yet - track balance only"),
-        ]
-        
-        cursor.executemany("""
-            INSERT INTO accounts (name, institution, account_type, last_four, current_balance, 
-                                  credit_limit, minimum_payment, due_day, interest_rate, payoff_date,
-                                  is_business, is_active, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, accounts)
-        
-        # Insert rewards points
-        rewards = [
-            ("Amex Membership Rewards", 1148376, 0.015, "2026-01-27"),
-            ("Chase Ultimate Rewards", 985997, 0.015, "2026-01-27"),
-            ("Capital One Miles", 313946, 0.01, "2026-01-27"),
-            ("Amazon Rewards", 221369, 0.01, "2026-01-27"),
-            ("American Airlines", 26789, 0.014, "2026-01-27"),
-            ("Atmos Rewards (Alaska/Hawaiian)", 551625, 0.014, "2026-01-27"),
-        ]
-        
-        cursor.executemany("""
-            INSERT INTO rewards_points (program_name, current_balance, point_value, last_updated)
-            VALUES (?, ?, ?, ?)
-        """, rewards)
-        
-        # Insert default categories
-        order = 0
-        for bucket, categories in config.DEFAULT_CATEGORIES.items():
-            for category, subcategories in categories.items():
-                if subcategories:
-                    for subcategory in subcategories:
-                        cursor.execute("""
-                            INSERT OR IGNORE INTO categories (bucket, category, subcategory, display_order)
-                            VALUES (?, ?, ?, ?)
-                        """, (bucket, category, subcategory, order))
-                        order += 1
-                else:
-                    cursor.execute("""
-                        INSERT OR IGNORE INTO categories (bucket, category, subcategory, display_order)
-                        VALUES (?, ?, NULL, ?)
-                    """, (bucket, category, order))
-                    order += 1
-        
-        # Insert default auto-categorization rules
-        rules = [
-            ("NEWLIN", "contains", "ENGINE", "Revenue", "Client Payments", None, 10),
-            ("RME", "contains", "ENGINE", "Revenue", "Client Payments", None, 10),
-            ("FACEBOOK", "contains", "ENGINE", "Ad Spend", "Facebook/Meta", None, 20),
-            ("META ADS", "contains", "ENGINE", "Ad Spend", "Facebook/Meta", None, 20),
-            ("GOOGLE ADS", "contains", "ENGINE", "Ad Spend", "Google", None, 20),
-            ("TIKTOK", "contains", "ENGINE", "Ad Spend", "TikTok", None, 20),
-            ("DIGITAL VIKING", "contains", "ENGINE", "Partner Payouts", "Digital Viking", None, 30),
-            ("GUSTO", "contains", "OVERHEAD", "Payroll", "Gusto/Salaries", None, 40),
-            ("BEST EGG", "contains", "OVERHEAD", "Debt Service", "Personal Loans", None, 50),
-            ("LENDINGPOINT", "contains", "OVERHEAD", "Debt Service", "Personal Loans", None, 50),
-            ("LAND ROVER FIN", "contains", "OVERHEAD", "Debt Service", "Auto Loan", None, 50),
-            ("IRS", "contains", "OVERHEAD", "Debt Service", "Tax Debt", None, 50),
-            ("EFTPS", "contains", "OVERHEAD", "Debt Service", "Tax Debt", None, 50),
-        ]
-        
-        cursor.executemany("""
-            INSERT INTO auto_rules (match_pattern, match_type, bucket, category, subcategory, tag, priority)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, rules)
-        
-        conn.commit()
+        return migrations.get_version(conn)
+
+# ============ Query Plan Checks ============
+
+def check_query_plans(queries, temp_sort_ok=()):
+    """Run EXPLAIN QUERY PLAN over {name: (sql, params)} and report which queries scan or sort.
+
+    Returns a list of {'name', 'plan', 'uses_index', 'temp_sort', 'ok'}. A
+    query is not ok when any step is a bare table SCAN, or when it sorts in
+    a temp B-tree and its name isn't in temp_sort_ok.
+    tests/test_query_plans.py runs it over the app's hot queries.
+    """
+    results = []
+    with get_connection() as conn:
+        for name, (sql, params) in queries.items():
+            plan = [row['detail'] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            full_scan = any(
+                step.startswith('SCAN ') and ' USING ' not in step
+                for step in plan
+            )
+            temp_sort = any('TEMP B-TREE' in step for step in plan)
+            results.append({
+                'name': name,
+                'plan': plan,
+                'uses_index': not full_scan,
+                'temp_sort': temp_sort,
+                'ok': not full_scan and (not temp_sort or name in temp_sort_ok),
+            })
+    return results
 
 # ============ Account Operations ============
 
+@cached('accounts')
 def get_all_accounts(active_only=True):
     """Get all accounts."""
     with get_connection() as conn:
@@ -289,6 +317,7 @@ def get_all_accounts(active_only=True):
             cursor.execute("SELECT * FROM accounts ORDER BY current_balance DESC")
         return cursor.fetchall()
 
+@cached('accounts')
 def get_account_by_id(account_id):
     """Get a single account by ID."""
     with get_connection() as conn:
@@ -311,6 +340,7 @@ def add_account(name, institution, account_type, last_four=None, current_balance
               credit_limit, minimum_payment, due_day, interest_rate,
               payoff_date, is_business, notes))
         conn.commit()
+        invalidate('accounts')
         return cursor.lastrowid
 
 def update_account(account_id, **kwargs):
@@ -330,6 +360,7 @@ def update_account(account_id, **kwargs):
             WHERE id = ?
         """, values)
         conn.commit()
+        invalidate('accounts')
 
 def update_account_balance(account_id, new_balance):
     """Update an account's balance and record in history."""
@@ -351,6 +382,7 @@ def update_account_balance(account_id, new_balance):
         """, (account_id, today, new_balance))
         
         conn.commit()
+        invalidate('accounts', 'balances')
 
 def delete_account(account_id):
     """Soft delete an account (set inactive)."""
@@ -358,6 +390,7 @@ def delete_account(account_id):
 
 # ============ Summary Functions ============
 
+@cached('accounts')
 def get_total_debt():
     """Get total debt across all accounts."""
     with get_connection() as conn:
@@ -369,6 +402,7 @@ def get_total_debt():
         """)
         return cursor.fetchone()['total']
 
+@cached('accounts')
 def get_monthly_obligations():
     """Get total monthly payment obligations."""
     with get_connection() as conn:
@@ -380,23 +414,45 @@ def get_monthly_obligations():
         """)
         return cursor.fetchone()['total']
 
-def get_upcoming_payments(days=7):
-    """Get payments due in the next N days."""
+# One row per payment falling in [start, end]: every month the window
+# touches, on the account's due day or the month's last day if shorter
+_PAYMENT_CALENDAR_QUERY = """
+    WITH RECURSIVE months(month_start) AS (
+        SELECT date(:start, 'start of month')
+        UNION ALL
+        SELECT date(month_start, '+1 month') FROM months
+        WHERE month_start < date(:end, 'start of month')
+    ),
+    due AS (
+        SELECT a.*, date(m.month_start, printf('+%d days', MIN(a.due_day,
+                    CAST(strftime('%d', m.month_start, '+1 month', '-1 day') AS INTEGER)) - 1)) AS due_date
+        FROM accounts a CROSS JOIN months m
+        WHERE a.is_active = 1 AND a.minimum_payment > 0 AND a.due_day BETWEEN 1 AND 31
+    )
+    SELECT *, CAST(julianday(due_date) - julianday(:start) AS INTEGER) AS days_until
+    FROM due
+    WHERE due_date BETWEEN :start AND :end
+    ORDER BY due_date, minimum_payment DESC
+"""
+
+def get_upcoming_payments(days=7, start=None):
+    """Account payments due in the next N days (today included), soonest first.
+
+    Each row is the account plus due_date and days_until. A window longer
+    than a month lists an account once per due date.
+    """
+    start = start or date.today()
+    return _payment_calendar(start.isoformat(), (start + timedelta(days=days - 1)).isoformat())
+
+@cached('accounts')
+def _payment_calendar(start, end):
+    # Keyed on the dates, so the cached calendar rolls over with the day
     with get_connection() as conn:
         cursor = conn.cursor()
-        today = date.today().day
-        
-        # Calculate which due days fall within the window
-        # This is simplified - in production you'd handle month boundaries
-        cursor.execute("""
-            SELECT * FROM accounts 
-            WHERE is_active = 1 
-            AND minimum_payment > 0 
-            AND due_day IS NOT NULL
-            ORDER BY due_day
-        """)
+        cursor.execute(_PAYMENT_CALENDAR_QUERY, {'start': start, 'end': end})
         return cursor.fetchall()
 
+@cached('accounts')
 def get_debt_by_type():
     """Get debt totals grouped by account type."""
     with get_connection() as conn:
@@ -410,8 +466,104 @@ def get_debt_by_type():
         """)
         return cursor.fetchall()
 
+# ============ Liquidity Snapshot ============
+
+LiquiditySnapshot = namedtuple('LiquiditySnapshot', [
+    'total_debt',           # sum of positive balances on active accounts
+    'monthly_obligations',  # sum of minimum payments
+    'rewards_value',        # points x point value across programs
+    'cc_balance',
+    'cc_limit',
+    'cc_available',
+    'cc_utilization',       # percent, 0-100
+    'debt_by_type',         # ((account_type, total, count), ...) largest first
+    'accounts',             # active accounts, largest balance first
+    'credit_cards',
+    'rewards',              # rewards programs, largest balance first
+])
+
+_SNAPSHOT_QUERY = """
+    SELECT 'account' AS kind, id, name, institution, account_type,
+           current_balance, credit_limit, minimum_payment, due_day, NULL AS point_value, is_business, notes,
+           SUM(CASE WHEN current_balance > 0 THEN current_balance ELSE 0 END) OVER () AS total_debt,
+           SUM(CASE WHEN minimum_payment > 0 THEN minimum_payment ELSE 0 END) OVER () AS monthly_obligations,
+           SUM(CASE WHEN account_type = 'credit_card' THEN current_balance ELSE 0 END) OVER () AS cc_balance,
+           SUM(CASE WHEN account_type = 'credit_card' THEN COALESCE(credit_limit, 0) ELSE 0 END) OVER () AS cc_limit,
+           SUM(CASE WHEN current_balance > 0 THEN current_balance ELSE 0 END) OVER w AS type_total,
+           COUNT(CASE WHEN current_balance > 0 THEN 1 END) OVER w AS type_count
+    FROM accounts
+    WHERE is_active = 1
+    WINDOW w AS (PARTITION BY account_type)
+    UNION ALL
+    SELECT 'reward', id, program_name, last_updated, NULL,
+           current_balance, NULL, NULL, NULL, point_value, NULL, notes,
+           SUM(current_balance * point_value) OVER (), NULL, NULL, NULL, NULL, NULL
+    FROM rewards_points
+"""
+
+@cached('accounts', 'rewards')
+def get_liquidity_snapshot():
+    """Everything the Home and Dashboard pages show, from one query.
+
+    Totals come from conditional window aggregates over the active accounts,
+    and rewards ride along in the same statement via UNION ALL.
+    """
+    with get_connection() as conn:
+        rows = conn.execute(_SNAPSHOT_QUERY).fetchall()
+
+    accounts, rewards, by_type = [], [], {}
+    totals = {'total_debt': 0, 'monthly_obligations': 0, 'cc_balance': 0, 'cc_limit': 0}
+    rewards_value = 0
+    for row in rows:
+        if row['kind'] == 'account':
+            accounts.append(MappingProxyType({
+                'id': row['id'],
+                'name': row['name'],
+                'institution': row['institution'],
+                'account_type': row['account_type'],
+                'current_balance': row['current_balance'],
+                'credit_limit': row['credit_limit'],
+                'minimum_payment': row['minimum_payment'],
+                'due_day': row['due_day'],
+                'is_business': row['is_business'],
+                'notes': row['notes'],
+            }))
+            for key in totals:
+                totals[key] = row[key] or 0
+            if row['type_count']:
+                by_type[row['account_type']] = (row['account_type'], row['type_total'], row['type_count'])
+        else:
+            rewards.append(MappingProxyType({
+                'id': row['id'],
+                'program_name': row['name'],
+                'current_balance': row['current_balance'],
+                'point_value': row['point_value'],
+                'last_updated': row['institution'],
+                'notes': row['notes'],
+            }))
+            rewards_value = row['total_debt'] or 0
+
+    accounts.sort(key=lambda a: a['current_balance'] or 0, reverse=True)
+    rewards.sort(key=lambda r: r['current_balance'] or 0, reverse=True)
+    credit_cards = tuple(a for a in accounts if a['account_type'] == 'credit_card')
+    cc_limit = totals['cc_limit']
+    return LiquiditySnapshot(
+        total_debt=totals['total_debt'],
+        monthly_obligations=totals['monthly_obligations'],
+        rewards_value=rewards_value,
+        cc_balance=totals['cc_balance'],
+        cc_limit=cc_limit,
+        cc_available=cc_limit - totals['cc_balance'],
+        cc_utilization=(totals['cc_balance'] / cc_limit * 100) if cc_limit > 0 else 0,
+        debt_by_type=tuple(sorted(by_type.values(), key=lambda t: t[1], reverse=True)),
+        accounts=tuple(accounts),
+        credit_cards=credit_cards,
+        rewards=tuple(rewards),
+    )
+
 # ============ Rewards Points ============
 
+@cached('rewards')
 def get_all_rewards():
     """Get all rewards programs."""
     with get_connection() as conn:
@@ -429,6 +581,7 @@ def update_rewards_balance(program_name, new_balance):
             WHERE program_name = ?
         """, (new_balance, date.today().isoformat(), program_name))
         conn.commit()
+        invalidate('rewards')
 
 def update_rewards_balance_by_id(reward_id, new_balance):
     """Update a rewards program balance by ID."""
@@ -440,7 +593,9 @@ def update_rewards_balance_by_id(reward_id, new_balance):
             WHERE id = ?
         """, (new_balance, date.today().isoformat(), reward_id))
         conn.commit()
+        invalidate('rewards')
 
+@cached('rewards')
 def get_total_rewards_value():
     """Get total estimated value of all rewards points."""
     with get_connection() as conn:
@@ -451,9 +606,85 @@ def get_total_rewards_value():
         """)
         return cursor.fetchone()['total']
 
-# Initialize database on import
-init_database()
-seed_initial_data()
+# ============ Recurring Transactions ============
+
+@cached('recurring')
+def get_recurring_transactions(active_only=True):
+    """Get recurring income and expense definitions."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        if active_only:
+            cursor.execute("SELECT * FROM recurring_transactions WHERE is_active = 1 ORDER BY is_income DESC, expected_amount DESC")
+        else:
+            cursor.execute("SELECT * FROM recurring_transactions ORDER BY is_income DESC, expected_amount DESC")
+        return cursor.fetchall()
+
+def add_recurring_transaction(description, expected_amount, frequency, day_of_month=None,
+                              day_of_week=None, is_income=False, account_id=None,
+                              next_expected=None, bucket=None, category=None, notes=None):
+    """Add a recurring income or expense."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO recurring_transactions (account_id, description, expected_amount, frequency,
+                                                day_of_month, day_of_week, bucket, category,
+                                                is_income, next_expected, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (account_id, description, expected_amount, frequency, day_of_month, day_of_week,
+              bucket, category, is_income, next_expected, notes))
+        conn.commit()
+        invalidate('recurring')
+        return cursor.lastrowid
+
+def delete_recurring_transaction(recurring_id):
+    """Deactivate a recurring transaction."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        # A removed detected item is remembered so detection doesn't add it back
+        cursor.execute("""
+            UPDATE recurring_transactions
+            SET is_active = 0, source = CASE WHEN source = 'detected' THEN 'dismissed' ELSE source END
+            WHERE id = ?
+        """, (recurring_id,))
+        conn.commit()
+        invalidate('recurring')
+
+# ============ Auto-Categorization Rules ============
+
+@cached('rules')
+def get_auto_rules(active_only=True):
+    """Get auto-categorization rules in match order."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        if active_only:
+            cursor.execute("SELECT * FROM auto_rules WHERE is_active = 1 ORDER BY priority, id")
+        else:
+            cursor.execute("SELECT * FROM auto_rules ORDER BY priority, id")
+        return cursor.fetchall()
+
+def add_auto_rule(match_pattern, match_type, bucket, category, subcategory=None, tag=None, priority=100):
+    """Add an auto-categorization rule.
+
+    contains/exact patterns are stored upper-case; regex patterns are kept
+    as typed (they are matched case-insensitively). Raises ValueError for a
+    regex that doesn't compile.
+    """
+    if match_type == 'regex':
+        try:
+            re.compile(match_pattern)
+        except re.error as e:
+            raise ValueError(f"Invalid regex: {e}")
+    else:
+        match_pattern = match_pattern.upper()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO auto_rules (match_pattern, match_type, bucket, category, subcategory, tag, priority)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (match_pattern, match_type, bucket, category, subcategory, tag, priority))
+        conn.commit()
+        invalidate('rules')
+        return cursor.lastrowid
 
 # ============ Partner Draws ============
 
@@ -466,40 +697,110 @@ def add_partner_draw(partner, draw_date, description, amount, notes=None, transa
             VALUES (?, ?, ?, ?, ?, ?)
         """, (partner, draw_date, description, amount, notes, transaction_id))
         conn.commit()
+        invalidate('draws')
         return cursor.lastrowid
 
+def partner_draws_query(partner=None, start_date=None, end_date=None):
+    """SQL and parameters for get_partner_draws."""
+    query = "SELECT * FROM partner_draws WHERE is_active = 1"
+    params = []
+
+    if partner:
+        query += " AND partner = ?"
+        params.append(partner)
+    if start_date:
+        query += " AND draw_date >= ?"
+        params.append(start_date)
+    if end_date:
+        query += " AND draw_date <= ?"
+        params.append(end_date)
+
+    query += " ORDER BY draw_date DESC, id DESC"
+    return query, params
+
+@cached('draws')
 def get_partner_draws(partner=None, start_date=None, end_date=None):
     """Get partner draws with optional filters."""
     with get_connection() as conn:
         cursor = conn.cursor()
-        query = "SELECT * FROM partner_draws WHERE 1=1"
-        params = []
-        
-        if partner:
-            query += " AND partner = ?"
-            params.append(partner)
-        if start_date:
-            query += " AND draw_date >= ?"
-            params.append(start_date)
-        if end_date:
-            query += " AND draw_date <= ?"
-            params.append(end_date)
-        
-        query += " ORDER BY draw_date DESC, id DESC"
-        cursor.execute(query, params)
+        cursor.execute(*partner_draws_query(partner, start_date, end_date))
         return cursor.fetchall()
 
+# Sort key column and direction for each list order; id breaks ties so
+# (key, id) is unique and can serve as the keyset cursor
+DRAW_SORTS = {
+    'newest': ('draw_date', 'DESC'),
+    'oldest': ('draw_date', 'ASC'),
+    'highest': ('amount', 'DESC'),
+    'lowest': ('amount', 'ASC'),
+}
+
+def _draw_filters(partner=None, search=None):
+    where, params = ["is_active = 1"], []
+    if partner:
+        where.append("partner = ?")
+        params.append(partner)
+    match = fts_query(search)
+    if match:
+        where.append("id IN (SELECT rowid FROM partner_draws_fts WHERE partner_draws_fts MATCH ?)")
+        params.append(match)
+    return where, params
+
+def partner_draws_page_query(partner=None, search=None, sort='newest', after=None, limit=50):
+    """SQL and parameters for get_partner_draws_page, fetching one row past the page."""
+    column, direction = DRAW_SORTS[sort]
+    where, params = _draw_filters(partner, search)
+    if after is not None:
+        where.append(f"({column}, id) {'<' if direction == 'DESC' else '>'} (?, ?)")
+        params.extend(after)
+    query = f"""
+        SELECT id, partner, draw_date, description, amount, notes
+        FROM partner_draws
+        WHERE {' AND '.join(where)}
+        ORDER BY {column} {direction}, id {direction}
+        LIMIT ?
+    """
+    return query, params + [limit + 1]
+
+@cached('draws')
+def get_partner_draws_page(partner=None, search=None, sort='newest', after=None, limit=50):
+    """One page of active draws, filtered and ordered in SQL.
+
+    Keyset pagination: pass the `next` cursor from the previous page as
+    `after`. Each page is an index range seek, so deep pages cost the same
+    as the first. Returns {'rows': [...], 'next': cursor or None}.
+    """
+    column = DRAW_SORTS[sort][0]
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(*partner_draws_page_query(partner, search, sort, after, limit))
+        rows = cursor.fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'rows': rows,
+        'next': (rows[-1][column], rows[-1]['id']) if has_more else None,
+    }
+
+@cached('draws')
+def count_partner_draws(partner=None, search=None):
+    """Number of active draws matching the list filters."""
+    if not search:
+        totals = get_partner_totals()
+        return totals[f"{partner}_count"] if partner else totals['Mark_count'] + totals['Katie_count']
+    where, params = _draw_filters(partner, search)
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM partner_draws WHERE {' AND '.join(where)}", params)
+        return cursor.fetchone()[0]
+
+@cached('draws')
 def get_partner_totals():
-    """Get total draws for each partner."""
+    """Get total draws for each partner (from the trigger-maintained summary)."""
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT partner, 
-                   COALESCE(SUM(amount), 0) as total,
-                   COUNT(*) as count
-            FROM partner_draws
-            GROUP BY partner
-        """)
+        cursor.execute("SELECT partner, total, count FROM partner_draw_totals")
         results = cursor.fetchall()
         totals = {'Mark': 0, 'Katie': 0, 'Mark_count': 0, 'Katie_count': 0}
         for row in results:
@@ -507,12 +808,41 @@ def get_partner_totals():
             totals[f"{row['partner']}_count"] = row['count']
         return totals
 
+@cached('draws')
+def get_partner_running_difference():
+    """Per-date draws and running totals for each partner, oldest first.
+
+    Built from the trigger-maintained daily summary, so it costs one pass
+    over distinct draw dates rather than over every draw.
+    `difference` is Mark's running total minus Katie's.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT draw_date,
+                   mark, katie,
+                   SUM(mark) OVER running AS mark_total,
+                   SUM(katie) OVER running AS katie_total,
+                   SUM(mark - katie) OVER running AS difference
+            FROM (
+                SELECT draw_date,
+                       SUM(CASE WHEN partner = 'Mark' THEN total ELSE 0 END) AS mark,
+                       SUM(CASE WHEN partner = 'Katie' THEN total ELSE 0 END) AS katie
+                FROM partner_draw_daily
+                GROUP BY draw_date
+            )
+            WINDOW running AS (ORDER BY draw_date)
+            ORDER BY draw_date
+        """)
+        return cursor.fetchall()
+
 def delete_partner_draw(draw_id):
     """Delete a partner draw entry."""
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM partner_draws WHERE id = ?", (draw_id,))
         conn.commit()
+        invalidate('draws')
 
 def update_partner_draw(draw_id, **kwargs):
     """Update a partner draw entry."""
@@ -525,89 +855,215 @@ def update_partner_draw(draw_id, **kwargs):
         cursor = conn.cursor()
         cursor.execute(f"UPDATE partner_draws SET {set_clause} WHERE id = ?", values)
         conn.commit()
+        invalidate('draws')
 
-def import_partner_draws_from_excel(filepath):
-    """Import partner draws from the MK_Private.xlsx format."""
+DRAW_SHEET = 'Draw 2025'
+DRAW_FALLBACK_DATE = '2024-01-01'
+
+def _read_draw_sheet(filepath):
+    """Columns 0-7 of the draws sheet, header row skipped, as a DataFrame.
+
+    .xlsx files are streamed with openpyxl in read-only mode so only the eight
+    draw columns are ever materialized; legacy .xls goes through pandas.
+    """
     import pandas as pd
-    from datetime import datetime
-    
-    df = pd.read_excel(filepath, sheet_name='Draw 2025', header=None)
-    
-    imported = {'Mark': 0, 'Katie': 0}
-    
+
+    if str(filepath).lower().endswith('.xls'):
+        df = pd.read_excel(filepath, sheet_name=DRAW_SHEET, header=None, usecols=range(8))
+        return df.iloc[1:].reindex(columns=range(8)).reset_index(drop=True)
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        if DRAW_SHEET not in workbook.sheetnames:
+            raise ValueError(f"Worksheet named '{DRAW_SHEET}' not found")
+        rows = workbook[DRAW_SHEET].iter_rows(min_row=2, max_col=8, values_only=True)
+        return pd.DataFrame.from_records(list(rows), columns=range(8))
+    finally:
+        workbook.close()
+
+def _draw_dates(values):
+    """Date cells -> 'YYYY-MM-DD'; other filled cells kept as text; blanks stay NaN."""
+    import pandas as pd
+
+    dates = pd.to_datetime(values, errors='coerce', format='ISO8601')
+    return (dates.dt.strftime('%Y-%m-%d')
+            .where(dates.notna(), values.astype(str))
+            .where(values.notna()))
+
+def _draw_frame(partner, dates, descriptions, amounts, notes=None):
+    """Rows with a description and amount, undated ones taking the date above."""
+    import pandas as pd
+
+    keep = descriptions.notna() & amounts.notna()
+    frame = pd.DataFrame({
+        'partner': partner,
+        'draw_date': dates[keep].ffill().fillna(DRAW_FALLBACK_DATE).astype(object),
+        'description': descriptions[keep].astype(str).astype(object),
+        'amount': amounts[keep].astype(float),
+        'notes': notes[keep].astype(object) if notes is not None else None,
+    })
+    frame['notes'] = frame['notes'].where(frame['notes'].notna(), None)
+    return frame
+
+def compute_draw_hash(partner, draw_date, description, amount, occurrence=0):
+    """Stable hash identifying one imported draw across re-imports of the workbook.
+
+    `occurrence` keeps genuinely repeated lines (same partner, day,
+    description and amount) apart.
+    """
+    key = f"{partner}|{draw_date}|{str(description).strip()}|{float(amount):.2f}|{occurrence}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def import_partner_draws_from_excel(filepath, remove_missing=False):
+    """Merge partner draws from the MK_Private.xlsx format.
+
+    Katie's draws are in columns 0-3 and Mark's in columns 5-7. Mark's rows
+    usually have no date of their own and use Katie's date on the same row;
+    rows with no date at all take the previous row's date.
+
+    Each draw is keyed by a content hash, so re-importing a growing workbook
+    only writes the new lines. Manual entries are never touched; with
+    remove_missing, previously imported draws no longer in the file are
+    tombstoned (is_active = 0) and come back if they reappear.
+    """
+    import pandas as pd
+
+    df = _read_draw_sheet(filepath)
+
+    katie = _draw_frame('Katie', _draw_dates(df[0]), df[1], df[2], notes=df[3])
+    mark = _draw_frame('Mark', _draw_dates(df[5]).fillna(_draw_dates(df[0])), df[6], df[7])
+    draws = pd.concat([katie, mark], ignore_index=True)
+    occurrence = draws.groupby(['partner', 'draw_date', 'description', 'amount'], sort=False).cumcount()
+    draws.insert(0, 'import_hash', [
+        compute_draw_hash(*key)
+        for key in zip(draws['partner'], draws['draw_date'], draws['description'], draws['amount'], occurrence)
+    ])
+
+    removed = 0
     with get_connection() as conn:
         cursor = conn.cursor()
-        
-        # Clear existing draws (optional - could also append)
-        cursor.execute("DELETE FROM partner_draws")
-        
-        # Import Katie's entries (columns 0-3)
-        # Track the last valid date for entries without dates
-        last_katie_date = None
-        for idx, row in df.iloc[1:].iterrows():  # Skip header row
-            draw_date = row[0]
-            description = row[1]
-            amount = row[2]
-            notes = row[3] if pd.notna(row[3]) else None
-            
-            # Skip if no description or amount
-            if pd.isna(description) or pd.isna(amount):
-                continue
-            
-            # Handle missing date - use last valid date or a placeholder
-            if pd.notna(draw_date):
-                if isinstance(draw_date, datetime):
-                    draw_date = draw_date.strftime('%Y-%m-%d')
-                else:
-                    draw_date = str(draw_date)
-                last_katie_date = draw_date
-            else:
-                # Use last valid date if available, otherwise use placeholder
-                draw_date = last_katie_date if last_katie_date else '2024-01-01'
-            
+        cursor.execute("BEGIN")
+        try:
             cursor.execute("""
-                INSERT INTO partner_draws (partner, draw_date, description, amount, notes)
-                VALUES (?, ?, ?, ?, ?)
-            """, ('Katie', draw_date, str(description), float(amount), notes))
-            imported['Katie'] += 1
-        
-        # Import Mark's entries (columns 5-7)
-        # Mark's entries often don't have their own date - use Katie's date from same row
-        last_mark_date = None
-        for idx, row in df.iloc[1:].iterrows():
-            mark_date = row[5]  # Mark's date column (often empty)
-            description = row[6]
-            amount = row[7]
-            katie_date = row[0]  # Katie's date on same row
-            
-            # Skip if no description or amount
-            if pd.isna(description) or pd.isna(amount):
-                continue
-            
-            # Determine the date to use (priority: Mark's date > Katie's date > last date > fallback)
-            if pd.notna(mark_date):
-                if isinstance(mark_date, datetime):
-                    draw_date = mark_date.strftime('%Y-%m-%d')
-                else:
-                    draw_date = str(mark_date)
-            elif pd.notna(katie_date):
-                if isinstance(katie_date, datetime):
-                    draw_date = katie_date.strftime('%Y-%m-%d')
-                else:
-                    draw_date = str(katie_date)
-            elif last_mark_date:
-                draw_date = last_mark_date
-            else:
-                draw_date = '2024-01-01'
-            
-            last_mark_date = draw_date
-            
+                CREATE TEMP TABLE IF NOT EXISTS _draw_import (
+                    import_hash TEXT PRIMARY KEY, partner TEXT, draw_date TEXT,
+                    description TEXT, amount REAL, notes TEXT
+                )
+            """)
+            cursor.execute("DELETE FROM _draw_import")
+            cursor.executemany("INSERT INTO _draw_import VALUES (?, ?, ?, ?, ?, ?)",
+                               draws.itertuples(index=False, name=None))
+
+            # Notes aren't part of the key: refresh them, and revive tombstoned draws
             cursor.execute("""
-                INSERT INTO partner_draws (partner, draw_date, description, amount, notes)
-                VALUES (?, ?, ?, ?, ?)
-            """, ('Mark', str(draw_date), str(description), float(amount), None))
-            imported['Mark'] += 1
-        
-        conn.commit()
-    
-    return imported
+                UPDATE partner_draws
+                SET notes = i.notes, is_active = 1
+                FROM _draw_import i
+                WHERE partner_draws.import_hash = i.import_hash
+                AND (partner_draws.notes IS NOT i.notes OR partner_draws.is_active = 0)
+            """)
+            updated = cursor.rowcount
+            cursor.execute("""
+                INSERT OR IGNORE INTO partner_draws (partner, draw_date, description, amount, notes, import_hash)
+                SELECT partner, draw_date, description, amount, notes, import_hash FROM _draw_import
+            """)
+            inserted = cursor.rowcount
+            if remove_missing:
+                cursor.execute("""
+                    UPDATE partner_draws SET is_active = 0
+                    WHERE is_active = 1 AND import_hash IS NOT NULL
+                    AND import_hash NOT IN (SELECT import_hash FROM _draw_import)
+                """)
+                removed = cursor.rowcount
+            cursor.execute("DELETE FROM _draw_import")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        if inserted or updated or removed:
+            invalidate('draws')
+
+    return {
+        'Mark': len(mark),
+        'Katie': len(katie),
+        'inserted': inserted,
+        'updated': updated,
+        'unchanged': len(draws) - inserted - updated,
+        'removed': removed,
+    }
+
+# ============ Full-Text Search ============
+
+_SEARCH_WORD = re.compile(r"\w+")
+
+def fts_query(text, prefix=True):
+    """Turn search box text into an FTS5 MATCH expression (None if it has no words).
+
+    Every word must match. With prefix, each word also matches longer words,
+    so 'amaz pri' finds 'AMAZON PRIME'. Words are quoted, so FTS operators
+    typed by the user are searched for literally.
+    """
+    words = _SEARCH_WORD.findall(text or '')
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' if prefix else f'"{word}"' for word in words)
+
+@cached('draws')
+def search_partner_draws(text, partner=None, limit=50, prefix=True, ranked=True):
+    """Active draws whose description or notes match the search text.
+
+    ranked orders by BM25 relevance (description weighted over notes);
+    otherwise newest first.
+    """
+    match = fts_query(text, prefix)
+    if not match:
+        return []
+    query = """
+        SELECT d.id, d.partner, d.draw_date, d.description, d.amount, d.notes
+        FROM partner_draws_fts
+        JOIN partner_draws d ON d.id = partner_draws_fts.rowid
+        WHERE partner_draws_fts MATCH ? AND d.is_active = 1
+    """
+    params = [match]
+    if partner:
+        query += " AND d.partner = ?"
+        params.append(partner)
+    query += " ORDER BY bm25(partner_draws_fts, 2.0, 1.0)" if ranked else " ORDER BY d.draw_date DESC, d.id DESC"
+    query += " LIMIT ?"
+    params.append(limit)
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+@cached('transactions')
+def search_transactions(text, account_id=None, limit=50, prefix=True, ranked=True):
+    """Transactions whose description, clean description or merchant match the search text.
+
+    ranked orders by BM25 relevance (merchant > clean description >
+    raw description); otherwise newest first.
+    """
+    match = fts_query(text, prefix)
+    if not match:
+        return []
+    query = """
+        SELECT t.id, t.account_id, t.transaction_date, t.description, t.clean_description,
+               t.merchant_name, t.amount, t.bucket, t.category, t.is_categorized
+        FROM transactions_fts
+        JOIN transactions t ON t.id = transactions_fts.rowid
+        WHERE transactions_fts MATCH ?
+    """
+    params = [match]
+    if account_id:
+        query += " AND t.account_id = ?"
+        params.append(account_id)
+    query += " ORDER BY bm25(transactions_fts, 1.0, 2.0, 3.0)" if ranked else " ORDER BY t.transaction_date DESC, t.id DESC"
+    query += " LIMIT ?"
+    params.append(limit)
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return cursor.fetchall()
@@ -0,0 +1,241 @@
+"""
+Liquidity Engine - Cash Flow Forecast
+Expands recurring items and the account payment calendar into dated cash events and
+projects the daily cash balance with vectorized NumPy
+"""
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+
+import config
+from utils import database as db
+
+CASH_ACCOUNT_TYPES = ('checking', 'savings')
+
+# Months between occurrences for month-anchored frequencies,
+# weeks between occurrences for week-anchored ones
+MONTHLY_PERIODS = {'monthly': 1, 'quarterly': 3, 'semiannual': 6, 'annual': 12, 'annually': 12, 'yearly': 12}
+WEEKLY_PERIODS = {'daily': 0, 'weekly': 1, 'biweekly': 2, 'bi-weekly': 2}
+
+CashItems = namedtuple('CashItems', [
+    'descriptions',  # list of str
+    'amounts',       # float64 (k,): positive = cash in, negative = cash out
+    'kind',          # int8 (k,): 0 = month-anchored, 1 = week-anchored, 2 = daily, 3 = once on anchor
+    'period',        # int64 (k,): months or weeks between occurrences
+    'day_of_month',  # int64 (k,)
+    'day_of_week',   # int64 (k,), Monday = 0
+    'anchor',        # int64 (k,): days since epoch of a known occurrence (or -1)
+    'starts',        # int64 (k,): first day an item may occur (days since epoch)
+    'fixed',         # bool (k,): contractual account payments (vs. estimated recurring items)
+])
+
+CashForecast = namedtuple('CashForecast', [
+    'dates',          # datetime64[D] (n,)
+    'inflows',        # float64 (n,)
+    'outflows',       # float64 (n,), negative
+    'balance',        # float64 (n,), end-of-day balance
+    'start_balance',
+    'end_balance',
+    'low_balance',
+    'low_date',
+    'first_warning',  # first date below CASH_WARNING_THRESHOLD, or None
+    'first_danger',   # first date below CASH_DANGER_THRESHOLD, or None
+    'warning_days',   # days below warning (includes danger days)
+    'danger_days',
+    'occurrences',    # bool (k, n): item x day event matrix
+    'items',
+])
+
+def _epoch_day(value):
+    """ISO date string / date -> days since 1970-01-01, or -1."""
+    if not value:
+        return -1
+    return int(np.datetime64(str(value)[:10], 'D').astype(np.int64))
+
+def build_cash_items(recurring, accounts, payments=()):
+    """Turn recurring_transactions rows and account payment calendar rows into CashItems.
+
+    payments are rows of db.get_upcoming_payments, one per due date, so the
+    forecast uses the same due dates as the rest of the app.
+    """
+    descriptions, amounts, kind, period = [], [], [], []
+    day_of_month, day_of_week, anchor, starts, fixed = [], [], [], [], []
+
+    def add(description, amount, freq, dom, dow, anchor_day, start_day, is_fixed=False):
+        freq = (freq or 'monthly').strip().lower()
+        if freq == 'once':
+            kind.append(3)
+            period.append(0)
+        elif freq in MONTHLY_PERIODS:
+            if dom is None and anchor_day < 0:
+                return
+            if dom is None:
+                dom = int(np.datetime64(anchor_day, 'D').astype(object).day)
+            kind.append(0)
+            period.append(MONTHLY_PERIODS[freq])
+        elif freq in WEEKLY_PERIODS:
+            if WEEKLY_PERIODS[freq] == 0:
+                kind.append(2)
+                period.append(1)
+            else:
+                if dow is None:
+                    dow = (anchor_day + 3) % 7 if anchor_day >= 0 else 0
+                kind.append(1)
+                period.append(WEEKLY_PERIODS[freq])
+        else:
+            return
+        descriptions.append(description)
+        amounts.append(amount)
+        day_of_month.append(int(dom or 1))
+        day_of_week.append(int(dow or 0))
+        anchor.append(anchor_day)
+        starts.append(start_day)
+        fixed.append(is_fixed)
+
+    # Charges recurring on a card or loan reach cash through that account's payment
+    paid_through = {a['id'] for a in accounts if a['account_type'] not in CASH_ACCOUNT_TYPES}
+    for r in recurring:
+        if not r['is_active'] or not r['expected_amount'] or r['account_id'] in paid_through:
+            continue
+        amount = abs(r['expected_amount']) if r['is_income'] else -abs(r['expected_amount'])
+        next_day = _epoch_day(r['next_expected'])
+        anchor_day = next_day if next_day >= 0 else _epoch_day(r['last_occurrence'])
+        add(r['description'], amount, r['frequency'], r['day_of_month'], r['day_of_week'], anchor_day, next_day)
+
+    for p in payments:
+        if p['account_type'] in CASH_ACCOUNT_TYPES:
+            continue
+        due = _epoch_day(p['due_date'])
+        add(p['name'], -float(p['minimum_payment']), 'once', None, None, due, due, is_fixed=True)
+
+    return CashItems(
+        descriptions=descriptions,
+        amounts=np.asarray(amounts, dtype=np.float64),
+        kind=np.asarray(kind, dtype=np.int8),
+        period=np.asarray(period, dtype=np.int64),
+        day_of_month=np.asarray(day_of_month, dtype=np.int64),
+        day_of_week=np.asarray(day_of_week, dtype=np.int64),
+        anchor=np.asarray(anchor, dtype=np.int64),
+        starts=np.asarray(starts, dtype=np.int64),
+        fixed=np.asarray(fixed, dtype=bool),
+    )
+
+def occurrence_matrix(items, start_date, days):
+    """Boolean (items x days) matrix of when each item hits the account.
+
+    Built with broadcasting per frequency family - no per-day Python loop.
+    Month-anchored days past the end of a short month fall on its last day.
+    """
+    dates = np.datetime64(start_date, 'D') + np.arange(days)
+    day_num = dates.astype(np.int64)
+    months = dates.astype('datetime64[M]')
+    month_num = months.astype(np.int64)
+    dom = (dates - months.astype('datetime64[D]')).astype(np.int64) + 1
+    month_len = ((months + 1).astype('datetime64[D]') - months.astype('datetime64[D]')).astype(np.int64)
+    weekday = (day_num + 3) % 7  # 1970-01-01 was a Thursday
+
+    k = len(items.amounts)
+    hits = np.zeros((k, days), dtype=bool)
+    if not k:
+        return dates, hits
+
+    monthly = items.kind == 0
+    if monthly.any():
+        target = np.minimum(items.day_of_month[monthly, None], month_len[None, :])
+        on_day = dom[None, :] == target
+        anchor_month = np.where(
+            items.anchor[monthly] >= 0,
+            items.anchor[monthly].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64),
+            month_num[0]
+        )
+        in_cycle = (month_num[None, :] - anchor_month[:, None]) % items.period[monthly, None] == 0
+        hits[monthly] = on_day & in_cycle
+
+    weekly = items.kind == 1
+    if weekly.any():
+        on_day = weekday[None, :] == items.day_of_week[weekly, None]
+        anchor_day = np.where(items.anchor[weekly] >= 0, items.anchor[weekly], day_num[0])
+        in_cycle = ((day_num[None, :] - anchor_day[:, None]) // 7) % items.period[weekly, None] == 0
+        hits[weekly] = on_day & in_cycle
+
+    hits[items.kind == 2] = True
+
+    once = items.kind == 3
+    if once.any():
+        hits[once] = day_num[None, :] == items.anchor[once, None]
+
+    # Nothing before an item's next expected date
+    hits &= day_num[None, :] >= items.starts[:, None]
+    return dates, hits
+
+def project_cash_flow(start_balance, items, start_date=None, days=None,
+                      warning=None, danger=None):
+    """Project end-of-day cash balances over the horizon.
+
+    Pure NumPy over prebuilt CashItems, cheap enough to rerun on every
+    slider change.
+    """
+    start_date = start_date or date.today()
+    days = days or config.FORECAST_DAYS
+    warning = config.CASH_WARNING_THRESHOLD if warning is None else warning
+    danger = config.CASH_DANGER_THRESHOLD if danger is None else danger
+
+    dates, hits = occurrence_matrix(items, start_date, days)
+    amounts = items.amounts
+    inflows = np.clip(amounts, 0, None) @ hits if len(amounts) else np.zeros(days)
+    outflows = np.clip(amounts, None, 0) @ hits if len(amounts) else np.zeros(days)
+    balance = start_balance + np.cumsum(inflows + outflows)
+
+    below_warning = balance < warning
+    below_danger = balance < danger
+    low = int(np.argmin(balance))
+
+    return CashForecast(
+        dates=dates,
+        inflows=inflows,
+        outflows=outflows,
+        balance=balance,
+        start_balance=start_balance,
+        end_balance=float(balance[-1]),
+        low_balance=float(balance[low]),
+        low_date=dates[low].astype(object),
+        first_warning=dates[below_warning.argmax()].astype(object) if below_warning.any() else None,
+        first_danger=dates[below_danger.argmax()].astype(object) if below_danger.any() else None,
+        warning_days=int(below_warning.sum()),
+        danger_days=int(below_danger.sum()),
+        occurrences=hits,
+        items=items,
+    )
+
+def cash_events(forecast):
+    """Dated (date, description, amount) events behind a forecast, in date order."""
+    day_idx, item_idx = np.nonzero(forecast.occurrences.T)
+    return [
+        (forecast.dates[d].astype(object), forecast.items.descriptions[i], float(forecast.items.amounts[i]))
+        for i, d in zip(item_idx, day_idx)
+    ]
+
+# ============ Inputs ============
+
+@db.cached('accounts')
+def get_cash_on_hand():
+    """Total balance of active checking and savings accounts."""
+    with db.get_connection() as conn:
+        row = conn.execute(f"""
+            SELECT COALESCE(SUM(current_balance), 0) AS total
+            FROM accounts
+            WHERE is_active = 1 AND account_type IN ({', '.join('?' * len(CASH_ACCOUNT_TYPES))})
+        """, CASH_ACCOUNT_TYPES).fetchone()
+        return row['total']
+
+def get_cash_items(start_date=None, days=None):
+    """CashItems for all active recurring transactions and the account payments due in the window."""
+    start_date = start_date or date.today()
+    return _cash_items(start_date.isoformat(), days or config.FORECAST_DAYS)
+
+@db.cached('accounts', 'recurring')
+def _cash_items(start, days):
+    # Keyed on the dates, so the payment calendar rolls over with the day
+    return build_cash_items(db.get_recurring_transactions(), db.get_all_accounts(),
+                            db.get_upcoming_payments(days=days, start=date.fromisoformat(start)))
@@ -0,0 +1,244 @@
+"""
+Liquidity Engine - Bank CSV Import
+Streams Chase, Capital One and Amex exports into the transactions table
+"""
+import csv
+import hashlib
+import io
+import time
+from functools import lru_cache
+
+import config
+from utils.database import get_connection, invalidate
+from utils.merchants import normalize_description
+
+# Amounts are stored from the account holder's point of view:
+# negative = money out (purchases, fees), positive = money in (payments, refunds)
+
+@lru_cache(maxsize=4096)
+def _parse_date(value):
+    """Normalize MM/DD/YYYY, M/D/YY or YYYY-MM-DD to an ISO date string."""
+    value = value.strip()
+    if not value:
+        return None
+    if len(value) == 10 and value[4] == '-':
+        return value
+    parts = value.split('/')
+    if len(parts) != 3:
+        return None
+    month, day, year = parts
+    if len(year) == 2:
+        year = '20' + year
+    return f"{year}-{int(month):02d}-{int(day):02d}"
+
+def _parse_amount(value):
+    """Parse '$1,234.56', '-12.00' or '(12.00)' into a float; blank is None."""
+    value = value.strip().replace('$', '').replace(',', '')
+    if not value:
+        return None
+    if value.startswith('(') and value.endswith(')'):
+        return -float(value[1:-1])
+    return float(value)
+
+# ============ Institution Mappers ============
+# Each mapper takes the header index and a raw row and returns
+# (transaction_date, post_date, description, amount, reference_number)
+
+def _map_chase(idx, row):
+    # Credit card: Transaction Date,Post Date,Description,Category,Type,Amount,Memo
+    # Checking:    Details,Posting Date,Description,Amount,Type,Balance,Check or Slip #
+    if 'Transaction Date' in idx:
+        txn_date = _parse_date(row[idx['Transaction Date']])
+        post_date = _parse_date(row[idx['Post Date']])
+    else:
+        txn_date = post_date = _parse_date(row[idx['Posting Date']])
+    ref = row[idx['Check or Slip #']] if 'Check or Slip #' in idx else None
+    return txn_date, post_date, row[idx['Description']], _parse_amount(row[idx['Amount']]), ref or None
+
+def _map_capital_one(idx, row):
+    # Transaction Date,Posted Date,Card No.,Description,Category,Debit,Credit
+    debit = _parse_amount(row[idx['Debit']]) or 0.0
+    credit = _parse_amount(row[idx['Credit']]) or 0.0
+    return (_parse_date(row[idx['Transaction Date']]), _parse_date(row[idx['Posted Date']]),
+            row[idx['Description']], round(credit - debit, 2), None)
+
+def _map_amex(idx, row):
+    # Date,Description,Amount[,...,Reference,...] - charges are positive in Amex exports
+    amount = _parse_amount(row[idx['Amount']])
+    ref = row[idx['Reference']].strip("' ") if 'Reference' in idx else None
+    return (_parse_date(row[idx['Date']]), None, row[idx['Description']],
+            -amount if amount is not None else None, ref or None)
+
+INSTITUTION_MAPPERS = {
+    'Chase': {'required': ('Description', 'Amount'), 'map': _map_chase},
+    'Capital One': {'required': ('Transaction Date', 'Posted Date', 'Description', 'Debit', 'Credit'), 'map': _map_capital_one},
+    'Amex': {'required': ('Date', 'Description', 'Amount'), 'map': _map_amex},
+}
+
+def detect_institution(header):
+    """Guess the institution from a CSV header row."""
+    columns = {h.strip() for h in header}
+    if {'Debit', 'Credit', 'Posted Date'} <= columns:
+        return 'Capital One'
+    if 'Post Date' in columns or 'Posting Date' in columns:
+        return 'Chase'
+    if {'Date', 'Description', 'Amount'} <= columns:
+        return 'Amex'
+    return None
+
+def compute_import_hash(account_id, txn_date, description, amount, occurrence=0):
+    """Stable hash identifying one transaction line across overlapping exports.
+
+    `occurrence` distinguishes genuinely repeated lines (two identical
+    charges on the same day) so they are not collapsed into one.
+    """
+    key = f"{account_id}|{txn_date}|{description.strip().upper()}|{amount:.2f}|{occurrence}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def _open_text(source):
+    """Accept a path, a text stream, or a binary upload (e.g. st.file_uploader).
+
+    Returns the text stream and a function that releases it without closing
+    a caller-owned upload buffer.
+    """
+    if isinstance(source, (str, bytes)) or hasattr(source, '__fspath__'):
+        stream = open(source, newline='', encoding='utf-8-sig')
+        return stream, stream.close
+    if isinstance(source, io.TextIOBase):
+        return source, lambda: None
+    stream = io.TextIOWrapper(source, newline='', encoding='utf-8-sig')
+    return stream, stream.detach
+
+def iter_transaction_chunks(source, account_id, institution=None, chunk_size=None, stats=None):
+    """Yield lists of transaction rows ready for INSERT, chunk_size at a time.
+
+    Reads the file lazily, one chunk of rows at a time. Repeated lines (same
+    date, description and amount) are numbered across the whole file, since
+    exports aren't reliably ordered by transaction date - Chase sorts by
+    post date. Descriptions are normalized on the way in, so
+    clean_description and merchant_name are set before the rules run.
+    """
+    chunk_size = chunk_size or config.IMPORT_CHUNK_SIZE
+    stats = stats if stats is not None else {}
+    stats.setdefault('rows', 0)
+    stats.setdefault('skipped', 0)
+
+    stream, release = _open_text(source)
+    try:
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if not header:
+            return
+        header = [h.strip() for h in header]
+        institution = institution or detect_institution(header)
+        if institution not in INSTITUTION_MAPPERS:
+            raise ValueError(f"Unrecognized CSV format: {', '.join(header)}")
+        mapper = INSTITUTION_MAPPERS[institution]
+        missing = [c for c in mapper['required'] if c not in header]
+        if missing:
+            raise ValueError(f"{institution} CSV is missing columns: {', '.join(missing)}")
+        stats['institution'] = institution
+
+        idx = {name: i for i, name in enumerate(header)}
+        width = len(header)
+        map_row = mapper['map']
+        seen = {}  # digest of (date, description, amount) -> lines so far
+        chunk = []
+
+        for row in reader:
+            if not row:
+                continue
+            stats['rows'] += 1
+            if len(row) < width:
+                row = row + [''] * (width - len(row))
+            try:
+                txn_date, post_date, description, amount, ref = map_row(idx, row)
+            except (ValueError, IndexError):
+                txn_date = None
+            if not txn_date or amount is None or not description.strip():
+                stats['skipped'] += 1
+                continue
+
+            description = description.strip()
+            # An 8-byte digest keeps the counter small when most lines are unique
+            dup_key = hashlib.blake2b(f"{txn_date}|{description.upper()}|{amount:.2f}".encode('utf-8'),
+                                      digest_size=8).digest()
+            occurrence = seen.get(dup_key, 0)
+            seen[dup_key] = occurrence + 1
+
+            chunk.append((
+                account_id, txn_date, post_date, description, *normalize_description(description),
+                amount, 'credit' if amount > 0 else 'debit', ref,
+                compute_import_hash(account_id, txn_date, description, amount, occurrence),
+            ))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        release()
+
+def import_transactions_csv(source, account_id, institution=None, chunk_size=None, progress=None):
+    """Import a bank CSV export into transactions, skipping lines already imported.
+
+    Each chunk is staged in a temp table and moved into transactions with
+    one INSERT OR IGNORE on import_hash, all inside one transaction, so
+    memory stays bounded by one chunk, a failed import leaves nothing
+    behind, and re-importing an overlapping export only adds the new lines;
+    the result's id_range covers exactly the rows added. Moving a chunk in a
+    single statement lets the full-text index triggers flush once per chunk
+    instead of once per row. progress, if given, is called with the rows
+    read so far after each chunk; an exception it raises aborts the import.
+    """
+    stats = {'rows': 0, 'skipped': 0}
+    started = time.perf_counter()
+    inserted = 0
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        # The import holds the write lock from its first chunk anyway; taking it
+        # up front makes every id above the current maximum one of ours
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            first_id = cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM transactions").fetchone()[0]
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS _txn_import (
+                    account_id INTEGER, transaction_date TEXT, post_date TEXT, description TEXT,
+                    clean_description TEXT, merchant_name TEXT, amount REAL,
+                    transaction_type TEXT, reference_number TEXT, import_hash TEXT
+                )
+            """)
+            cursor.execute("DELETE FROM _txn_import")
+            for chunk in iter_transaction_chunks(source, account_id, institution, chunk_size, stats):
+                cursor.executemany("INSERT INTO _txn_import VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", chunk)
+                cursor.execute("""
+                    INSERT OR IGNORE INTO transactions (account_id, transaction_date, post_date,
+                                                        description, clean_description, merchant_name,
+                                                        amount, transaction_type, reference_number,
+                                                        import_hash)
+                    SELECT * FROM _txn_import ORDER BY rowid
+                """)
+                inserted += cursor.rowcount
+                cursor.execute("DELETE FROM _txn_import")
+                if progress:
+                    progress(stats['rows'])
+            last_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+            conn.commit()
+            invalidate('transactions')
+        except BaseException:
+            conn.rollback()
+            raise
+
+    elapsed = time.perf_counter() - started
+    parsed = stats['rows'] - stats['skipped']
+    return {
+        'institution': stats.get('institution', institution),
+        'rows': stats['rows'],
+        'inserted': inserted,
+        'id_range': (first_id, last_id),  # ids of the inserted rows (empty when first > last)
+        'duplicates': parsed - inserted,
+        'skipped': stats['skipped'],
+        'seconds': elapsed,
+        'rows_per_sec': stats['rows'] / elapsed if elapsed > 0 else 0.0,
+    }
@@ -0,0 +1,54 @@
+"""
+Background job status for pages: polls the jobs table without blocking the page
+"""
+import streamlit as st
+
+from utils import jobs
+
+POLL_SECONDS = 1  # How often a page refreshes a running job's progress
+
+def job_panel(key):
+    """Progress of the job whose id is in st.session_state[key].
+
+    While the job is active only this panel reruns, once a second, so the
+    rest of the page stays usable. When it finishes the whole page reruns
+    once to pick up the new data, then shows the outcome until dismissed.
+    """
+    job_id = st.session_state.get(key)
+    job = jobs.get_job(job_id) if job_id is not None else None
+    if job is None:
+        st.session_state.pop(key, None)
+        return
+
+    @st.fragment(run_every=POLL_SECONDS if job['active'] else None)
+    def panel():
+        current = jobs.get_job(job_id)
+        if job['active'] and not current['active']:
+            st.rerun()
+
+        if current['active']:
+            c1, c2 = st.columns([5, 1])
+            with c1:
+                text = current['message'] or ("Waiting for a free worker" if current['status'] == 'queued' else "Starting")
+                st.progress(current['progress'] or 0.0, text=f"{current['label']}: {text}")
+            with c2:
+                if current['cancel_requested']:
+                    st.caption("Cancelling...")
+                elif not current['cancellable']:
+                    st.caption("Can't be stopped")
+                elif st.button("Cancel", key=f"{key}_cancel"):
+                    jobs.cancel(job_id)  # the next poll shows it stopped
+                    st.caption("Cancelling...")
+            return
+
+        if current['status'] == 'succeeded':
+            st.success(current['message'])
+        elif current['status'] == 'cancelled':
+            st.info(f"{current['label']} was cancelled; nothing it had started was saved")
+        else:
+            st.error(f"{current['label']} failed: {current['error']}")
+        if st.button("Dismiss", key=f"{key}_dismiss"):
+            st.session_state.pop(key, None)
+            st.rerun()
+
+    panel()
@@ -0,0 +1,329 @@
+"""
+Liquidity Engine - Background Jobs
+Imports and maintenance run on a worker pool, tracked in the jobs table so pages can poll them
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from utils.database import get_connection
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation was requested."""
+
+class JobContext:
+    """Handed to a running job for reporting progress and noticing cancellation."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._cancel = _cancel_events[job_id]
+
+    def check(self):
+        """Raise JobCancelled if the job was cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def progress(self, fraction, message=None):
+        """Record progress (0-1) and check for cancellation. Cheap enough to call once per chunk."""
+        self.check()
+        self.report(fraction, message)
+
+    def report(self, fraction, message=None):
+        """Record progress without checking for cancellation, for a job past its point of no return."""
+        # Kept in memory, not written to the jobs table: a job is often inside
+        # its own write transaction, which a progress UPDATE would wait on
+        _live[self.job_id] = (max(0.0, min(float(fraction), 1.0)), message)
+
+# ============ Registry ============
+
+_JOBS = {}  # kind -> (function, default label, cancellable once running)
+
+def job(kind, label, cancellable=True):
+    """Register function(ctx, **params) as a job kind.
+
+    It returns (message, result): a one-line summary for the page and a
+    JSON-serializable result. A cancellable job calls ctx.progress often
+    enough for a cancel to land; any job can be cancelled while queued.
+    """
+    def decorator(func):
+        _JOBS[kind] = (func, label, cancellable)
+        return func
+    return decorator
+
+# ============ Runner ============
+
+_executor = None
+_executor_lock = threading.Lock()
+_cancel_events = {}
+_live = {}  # job id -> (progress, message) of jobs running in this process
+
+def _process_token(pid):
+    """pid:start time where /proc has it, so a later process reusing the pid doesn't count."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return str(pid)
+    # Field 22 is the start time; the command name before it can hold spaces
+    return f"{pid}:{stat.rsplit(')', 1)[1].split()[19]}"
+
+_OWNER = _process_token(os.getpid())
+
+def _owner_alive(owner):
+    if not owner:
+        return False
+    pid = int(owner.split(':')[0])
+    if ':' in owner:
+        return _process_token(pid) == owner
+    if os.name == 'nt':
+        # No signal-0 probe there (os.kill terminates); one app process is the norm
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _recover_interrupted()
+                _executor = ThreadPoolExecutor(max_workers=config.JOB_WORKERS, thread_name_prefix="job")
+    return _executor
+
+def _recover_interrupted():
+    # Settle jobs left queued or running by a process that has since exited;
+    # another app process sharing the database keeps its live ones
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, owner, params FROM jobs WHERE status IN ('queued', 'running')")
+        stale = [row for row in cursor.fetchall() if not _owner_alive(row['owner'])]
+        cursor.executemany("""
+            UPDATE jobs SET status = 'failed', error = 'Interrupted by an app restart',
+                            finished_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status IN ('queued', 'running')
+        """, [(row['id'],) for row in stale])
+        conn.commit()
+    for row in stale:
+        _remove_upload(json.loads(row['params'] or '{}'))
+
+def _remove_upload(params):
+    """Delete the uploaded file a job was given, unless it was submitted with remove_file=False."""
+    path = params.get('path')
+    if path and params.get('remove_file', True):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _update(job_id, **fields):
+    columns = ', '.join(f"{name} = ?" for name in fields)
+    with get_connection() as conn:
+        conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", list(fields.values()) + [job_id])
+        conn.commit()
+
+def submit(kind, label=None, **params):
+    """Queue a job and return its id. At most JOB_WORKERS jobs run at once; the rest wait.
+
+    A path param is an upload the job owns: it is deleted when the job ends
+    however it ends (pass remove_file=False to keep it).
+    """
+    if kind not in _JOBS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    executor = _get_executor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO jobs (kind, label, params, owner) VALUES (?, ?, ?, ?)",
+                       (kind, label or _JOBS[kind][1], json.dumps(params), _OWNER))
+        conn.commit()
+        job_id = cursor.lastrowid
+    _cancel_events[job_id] = threading.Event()
+    executor.submit(_run, job_id, kind, params)
+    return job_id
+
+def ensure_queued(kind, label=None, **params):
+    """Submit a job unless one of this kind is already waiting to start.
+
+    For jobs that catch up on whatever has changed since their last run
+    (rule learning): a queued one will see the new changes anyway, so a
+    burst of requests runs it once or twice instead of once per request.
+    """
+    with get_connection() as conn:
+        row = conn.execute("SELECT id FROM jobs WHERE kind = ? AND status = 'queued' ORDER BY id DESC LIMIT 1",
+                           (kind,)).fetchone()
+    if row is not None:
+        return row['id']
+    return submit(kind, label, **params)
+
+def _run(job_id, kind, params):
+    try:
+        # Only a job still queued starts; one cancelled in the meantime stays cancelled
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'queued'",
+                           (_now(), job_id))
+            conn.commit()
+            if not cursor.rowcount:
+                return
+        func = _JOBS[kind][0]
+        kwargs = {name: value for name, value in params.items() if name != 'remove_file'}
+        try:
+            message, result = func(JobContext(job_id), **kwargs)
+        except JobCancelled:
+            _update(job_id, status='cancelled', message='Cancelled', finished_at=_now())
+        except Exception as e:
+            _update(job_id, status='failed', error=str(e) or type(e).__name__, finished_at=_now())
+        else:
+            _update(job_id, status='succeeded', progress=1.0, message=message,
+                    result=json.dumps(result, default=str), finished_at=_now())
+    finally:
+        _cancel_events.pop(job_id, None)
+        _live.pop(job_id, None)
+        _remove_upload(params)
+
+def _now():
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+
+def cancel(job_id):
+    """Ask a job to stop. A queued job never starts; a running one stops at its next progress check.
+
+    Returns True if the job was still active.
+    """
+    # Signal first: the UPDATE below may wait on the job's own write transaction
+    event = _cancel_events.get(job_id)
+    if event is not None:
+        event.set()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE jobs SET cancel_requested = 1,
+                status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+                finished_at = CASE WHEN status = 'queued' THEN CURRENT_TIMESTAMP ELSE finished_at END
+            WHERE id = ? AND status IN ('queued', 'running')
+        """, (job_id,))
+        conn.commit()
+        return cursor.rowcount > 0 or event is not None
+
+# Job status is read straight from the table rather than the read cache,
+# with a running job's live progress laid over it
+
+def _decode(row):
+    job_row = dict(row)
+    live = _live.get(job_row['id'])
+    if live is not None and job_row['status'] == 'running':
+        job_row['progress'], job_row['message'] = live
+    job_row['params'] = json.loads(job_row['params'] or '{}')
+    job_row['result'] = json.loads(job_row['result']) if job_row['result'] else None
+    job_row['active'] = job_row['status'] in ACTIVE_STATUSES
+    job_row['cancellable'] = job_row['status'] == 'queued' or (
+        job_row['status'] == 'running' and _JOBS.get(job_row['kind'], (None, None, False))[2])
+    return job_row
+
+def get_job(job_id):
+    """A job as a dict (params and result decoded), or None."""
+    _get_executor()  # first use in a process settles jobs a previous one left behind
+    with get_connection() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _decode(row) if row else None
+
+def get_jobs(limit=20, active_only=False):
+    """Most recent jobs first."""
+    query = "SELECT * FROM jobs"
+    if active_only:
+        query += f" WHERE status IN ({', '.join('?' * len(ACTIVE_STATUSES))})"
+    query += " ORDER BY id DESC LIMIT ?"
+    params = (ACTIVE_STATUSES if active_only else ()) + (limit,)
+    _get_executor()
+    with get_connection() as conn:
+        return [_decode(row) for row in conn.execute(query, params).fetchall()]
+
+# ============ Job Kinds ============
+
+def _count_lines(path):
+    with open(path, 'rb') as f:
+        return sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 20), b''))
+
+@job('transactions_csv', "Import transactions")
+def _import_transactions(ctx, path, account_id, institution=None):
+    from utils import categorizer, importer
+
+    total = max(_count_lines(path) - 1, 1)
+    ctx.progress(0, "Reading CSV")
+    result = importer.import_transactions_csv(
+        path, account_id, institution=institution,
+        progress=lambda rows: ctx.progress(0.9 * rows / total, f"{rows:,} of ~{total:,} rows read")
+    )
+    # The import is committed now, so the job runs to the end from here.
+    # Only the rows it added are categorized; duplicates and older rows are left alone
+    ctx.report(0.9, "Categorizing")
+    categorized = categorizer.categorize_transactions(id_range=result['id_range'])
+    result['categorized'] = categorized['categorized']
+    message = (f"Imported {result['inserted']:,} new transactions from {result['institution']} "
+               f"({result['duplicates']:,} duplicates skipped, {result['rows_per_sec']:,.0f} rows/s), "
+               f"auto-categorized {result['categorized']:,}")
+    if result['skipped']:
+        message += f"; {result['skipped']:,} rows could not be parsed"
+    return message, result
+
+@job('partner_draws_excel', "Import partner draws", cancellable=False)
+def _import_partner_draws(ctx, path, remove_missing=False):
+    from utils import database as db
+
+    ctx.progress(0, "Reading workbook")
+    result = db.import_partner_draws_from_excel(path, remove_missing=remove_missing)
+    message = (f"Read Mark ({result['Mark']}), Katie ({result['Katie']}): "
+               f"{result['inserted']} new, {result['updated']} updated, "
+               f"{result['unchanged']} unchanged, {result['removed']} removed")
+    return message, result
+
+@job('recategorize', "Apply auto-categorization rules")
+def _recategorize(ctx):
+    from utils import categorizer
+
+    with get_connection() as conn:
+        total = max(conn.execute("SELECT COUNT(*) FROM transactions WHERE is_categorized = 0").fetchone()[0], 1)
+    result = categorizer.categorize_transactions(
+        progress=lambda scanned: ctx.progress(0.95 * scanned / total, f"{scanned:,} of {total:,} scanned")
+    )
+    return f"Categorized {result['categorized']:,} of {result['scanned']:,} uncategorized transactions", result
+
+@job('rebuild_rollup', "Rebuild monthly rollup", cancellable=False)
+def _rebuild_rollup(ctx):
+    from utils import reports
+
+    # Two statements in one transaction; the rebuild is all or nothing
+    ctx.progress(0, "Recomputing")
+    rows = reports.rebuild_rollup()
+    return f"Rebuilt the monthly rollup ({rows:,} rows)", {'rows': rows}
+
+@job('detect_recurring', "Detect recurring transactions")
+def _detect_recurring(ctx):
+    from utils import recurring
+
+    ctx.progress(0, "Scanning history")
+    detected = recurring.detect_recurring()
+    ctx.progress(0.8, f"Saving {len(detected)} series")
+    result = recurring.sync_recurring(detected)
+    return (f"Found {result['detected']} recurring series: {result['added']} added, "
+            f"{result['updated']} updated, {result['retired']} no longer recurring"), result
+
+@job('learn_rules', "Learn categorization rules")
+def _learn_rules(ctx):
+    from utils import rule_learning
+
+    with get_connection() as conn:
+        total = max(conn.execute("SELECT COUNT(*) FROM rule_learning_log").fetchone()[0], 1)
+    ctx.progress(0, "Learning")
+    result = rule_learning.learn_rules(
+        progress=lambda processed: ctx.progress(0.9 * processed / total, f"{processed:,} of {total:,} events read")
+    )
+    return f"Proposed {result['proposed']} rules, updated {result['updated']}, withdrew {result['withdrawn']}", result
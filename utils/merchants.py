@@ -0,0 +1,182 @@
+"""
+Liquidity Engine - Merchant Normalization
+Turns raw bank descriptions into a clean description and a canonical merchant
+"""
+import re
+import time
+from functools import lru_cache
+
+from utils.database import get_connection, invalidate
+
+# Payment processors and wallets that prefix the real merchant: "SQ *BLUE BOTTLE"
+PROCESSOR_PREFIXES = {
+    'SQ', 'TST', 'SP', 'PP', 'PAYPAL', 'PY', 'IN', 'DD', 'BT', 'CKE', 'SMP',
+    'APLPAY', 'APPLEPAY', 'GPAY', 'SQU', 'PMT',
+}
+
+# Cleaned leading words -> canonical merchant. The longest matching prefix wins,
+# and its words are replaced by the canonical name in clean_description so
+# auto_rules written against the real name ("FACEBOOK") match the
+# abbreviation the bank prints ("FACEBK"). Single-word keys here must be
+# abbreviations or brand names that never start an unrelated merchant's name.
+MERCHANT_ALIASES = {
+    'AMZN': 'Amazon', 'AMAZON': 'Amazon', 'AMZ': 'Amazon',
+    'FACEBK': 'Facebook', 'FACEBOOK': 'Facebook', 'FB': 'Facebook',
+    'META PLATFORMS': 'Meta', 'META ADS': 'Meta', 'GOOGLE': 'Google', 'TIKTOK': 'TikTok',
+    'UBER': 'Uber', 'LYFT': 'Lyft', 'DOORDASH': 'DoorDash', 'GRUBHUB': 'Grubhub',
+    'SBUX': 'Starbucks', 'STARBUCKS': 'Starbucks',
+    'WHOLEFDS': 'Whole Foods', 'WHOLE FOODS': 'Whole Foods',
+    'WM SUPERCENTER': 'Walmart', 'WAL-MART': 'Walmart', 'WALMART': 'Walmart',
+    'COSTCO': 'Costco', 'COSTCO WHSE': 'Costco', 'TARGET STORE': 'Target',
+    'TRADER JOES': "Trader Joe's", 'HOME DEPOT': 'The Home Depot', 'THE HOME DEPOT': 'The Home Depot',
+    'NETFLIX': 'Netflix', 'SPOTIFY': 'Spotify', 'APPLE STORE': 'Apple',
+    'ADOBE': 'Adobe', 'INTUIT': 'Intuit', 'GUSTO': 'Gusto', 'CHEWY': 'Chewy',
+    'SHELL OIL': 'Shell', 'SHELL SERVICE': 'Shell', 'CHEVRON': 'Chevron', 'EXXONMOBIL': 'ExxonMobil',
+    'DELTA AIR': 'Delta Air Lines', 'DELTA AIRLINES': 'Delta Air Lines',
+    'UNITED AIRLINES': 'United Airlines', 'UNITED AIR': 'United Airlines',
+    'ALASKA AIR': 'Alaska Airlines', 'MARRIOTT': 'Marriott', 'HILTON': 'Hilton',
+    'BEST EGG': 'Best Egg', 'LENDINGPOINT': 'LendingPoint',
+    'IRS': 'IRS', 'EFTPS': 'EFTPS', 'DIGITAL VIKING': 'Digital Viking',
+}
+_ALIAS_WORDS = max(len(key.split()) for key in MERCHANT_ALIASES)
+
+# Ordinary words that name a merchant only when they are the whole
+# description: "SHELL" is the gas station, "SHELL LUMBER" is not
+EXACT_ALIASES = {
+    'APPLE': 'Apple', 'TARGET': 'Target', 'SHELL': 'Shell', 'META': 'Meta',
+    'DELTA': 'Delta Air Lines', 'UNITED': 'United Airlines',
+}
+
+US_STATES = {
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'DC', 'FL', 'GA', 'HI', 'ID', 'IL', 'IN', 'IA',
+    'KS', 'KY', 'LA', 'ME', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM',
+    'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA',
+    'WV', 'WI', 'WY', 'US', 'USA',
+}
+
+# Words banks put in front of the merchant on debit and ACH lines
+_LEAD_IN = re.compile(
+    r"^(?:POS (?:DEBIT|PURCHASE)|DEBIT CARD PURCHASE|PURCHASE AUTHORIZED ON \d\d/\d\d"
+    r"|CHECKCARD \d{4}|RECURRING (?:PAYMENT|DEBIT)|ACH (?:DEBIT|CREDIT)|POS|PURCHASE)\s+"
+)
+_PROCESSOR = re.compile(r"^([A-Z]{2,8})\s*\*\s*")
+_GLUED_NUMBER = re.compile(r"\b([A-Z]{3,})(\d{4,})\b")  # "ADS1234567" -> "ADS 1234567"
+_NOISE = re.compile(r"""
+      \b\d{3}[-.\s]?\d{3}[-.]\d{4}\b              # phone numbers
+    | \b\d{1,2}/\d{1,2}(?:/\d{2,4})?\b           # dates
+    | \#\s*[A-Z\d-]+                             # store / terminal numbers
+    | \.(?:COM|NET|ORG)\b(?:/\S*)?               # web suffixes: NETFLIX.COM, AMZN.COM/BILL
+    | \bWWW\.
+    | \b(?=[A-Z]*\d)(?=\d*[A-Z])[A-Z\d]{5,}\b     # reference codes mixing letters and digits
+    | \b\d+\b                                    # remaining bare numbers
+""", re.VERBOSE)
+_PUNCT = re.compile(r"[^A-Z&\s-]+")
+_SPACE = re.compile(r"\s+")
+
+_DIGITS = str.maketrans('123456789', '000000000')
+
+def normalize_description(raw):
+    """Raw bank description -> (clean_description, merchant_name).
+
+    Strips processor prefixes, store numbers, dates, phone numbers and
+    reference codes, then maps known abbreviations to a canonical merchant.
+    Unknown merchants fall back to the cleaned text.
+    """
+    # No rule keeps a digit, and zeroing them keeps every digit pattern
+    # matching the same way, so lines that differ only in store numbers,
+    # dates or reference codes share one memo entry
+    normalized = _normalize(raw.upper().translate(_DIGITS)) if raw else None
+    if normalized is None:
+        clean = (raw or '').strip().upper()
+        return clean, clean.title()
+    return normalized
+
+@lru_cache(maxsize=65536)
+def _normalize(text):
+    text = _LEAD_IN.sub('', text.strip())
+    processor = _PROCESSOR.match(text)
+    if processor:
+        # "SQ *JOES" drops the processor; "FACEBK *ADS" keeps the merchant
+        text = text[processor.end():] if processor.group(1) in PROCESSOR_PREFIXES else \
+            processor.group(1) + ' ' + text[processor.end():]
+    text = _NOISE.sub(' ', _GLUED_NUMBER.sub(r'\1 \2', text.replace("'", '')))
+    words = _SPACE.sub(' ', _PUNCT.sub(' ', text)).strip(' -').split()
+    if len(words) > 2 and words[-1] in US_STATES:
+        words.pop()
+    if not words:
+        return None
+
+    clean = ' '.join(words)
+    if clean in EXACT_ALIASES:
+        return clean, EXACT_ALIASES[clean]
+    for size in range(min(_ALIAS_WORDS, len(words)), 0, -1):
+        merchant = MERCHANT_ALIASES.get(' '.join(words[:size]))
+        if merchant:
+            return ' '.join([merchant.upper()] + words[size:]), merchant
+    return clean, clean.title()
+
+def normalize_transactions(transaction_ids=None, batch_size=10000, force=False):
+    """Fill clean_description / merchant_name for transactions missing them.
+
+    Imports normalize as they insert; this backfills older rows (or, with
+    force, re-normalizes everything after the alias table changes). Updates
+    are staged in a temp table and written with one UPDATE ... FROM.
+    """
+    started = time.perf_counter()
+    scanned = 0
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS _merchant_updates (
+                txn_id INTEGER PRIMARY KEY, clean_description TEXT, merchant_name TEXT
+            )
+        """)
+        cursor.execute("DELETE FROM _merchant_updates")
+
+        query = "SELECT id, description FROM transactions WHERE 1=1"
+        if not force:
+            query += " AND (clean_description IS NULL OR merchant_name IS NULL)"
+        if transaction_ids is not None:
+            ids = list(transaction_ids)
+            if not ids:
+                return {'scanned': 0, 'normalized': 0, 'seconds': 0.0}
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS _merchant_targets (txn_id INTEGER PRIMARY KEY)")
+            cursor.execute("DELETE FROM _merchant_targets")
+            cursor.executemany("INSERT OR IGNORE INTO _merchant_targets VALUES (?)", ((i,) for i in ids))
+            query += " AND id IN (SELECT txn_id FROM _merchant_targets)"
+
+        reader = conn.cursor()
+        reader.row_factory = None
+        reader.execute(query)
+        while True:
+            rows = reader.fetchmany(batch_size)
+            if not rows:
+                break
+            scanned += len(rows)
+            cursor.executemany(
+                "INSERT INTO _merchant_updates VALUES (?, ?, ?)",
+                [(txn_id,) + normalize_description(description) for txn_id, description in rows]
+            )
+
+        # Only rows whose values actually change, so the search index isn't churned
+        cursor.execute("""
+            UPDATE transactions
+            SET clean_description = u.clean_description,
+                merchant_name = u.merchant_name
+            FROM _merchant_updates u
+            WHERE transactions.id = u.txn_id
+            AND (transactions.clean_description IS NOT u.clean_description
+                 OR transactions.merchant_name IS NOT u.merchant_name)
+        """)
+        normalized = cursor.rowcount
+        cursor.execute("DELETE FROM _merchant_updates")
+        conn.commit()
+        if normalized:
+            invalidate('transactions')
+
+    return {
+        'scanned': scanned,
+        'normalized': normalized,
+        'seconds': time.perf_counter() - started,
+    }
@@ -0,0 +1,737 @@
+"""
+Liquidity Engine - Schema Migrations
+Numbered schema and data changes tracked with PRAGMA user_version
+"""
+import sqlite3
+
+import config
+
+# Each migration runs in its own transaction together with the user_version
+# bump, so a failure leaves the database at the previous version.
+# Steps must be safe on databases created before migrations existed
+# (user_version 0 with tables and data already in place).
+
+def _create_base_schema(conn):
+    cursor = conn.cursor()
+
+    # Accounts table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            institution TEXT NOT NULL,
+            account_type TEXT NOT NULL,
+            last_four TEXT,
+            current_balance DECIMAL(12,2) DEFAULT 0,
+            credit_limit DECIMAL(12,2),
+            minimum_payment DECIMAL(12,2) DEFAULT 0,
+            due_day INTEGER,
+            interest_rate DECIMAL(5,2),
+            payoff_date DATE,
+            is_business BOOLEAN DEFAULT 1,
+            is_active BOOLEAN DEFAULT 1,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Transactions table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id INTEGER NOT NULL,
+            transaction_date DATE NOT NULL,
+            post_date DATE,
+            description TEXT NOT NULL,
+            clean_description TEXT,
+            amount DECIMAL(12,2) NOT NULL,
+            transaction_type TEXT,
+            bucket TEXT,
+            category TEXT,
+            subcategory TEXT,
+            tag TEXT,
+            is_categorized BOOLEAN DEFAULT 0,
+            is_reviewed BOOLEAN DEFAULT 0,
+            auto_categorized BOOLEAN DEFAULT 0,
+            merchant_name TEXT,
+            reference_number TEXT,
+            notes TEXT,
+            import_hash TEXT UNIQUE,
+            imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (account_id) REFERENCES accounts(id)
+        )
+    """)
+    
+    # Categories table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bucket TEXT NOT NULL,
+            category TEXT NOT NULL,
+            subcategory TEXT,
+            is_active BOOLEAN DEFAULT 1,
+            display_order INTEGER,
+            UNIQUE(bucket, category, subcategory)
+        )
+    """)
+    
+    # Tags table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            description TEXT,
+            start_date DATE,
+            end_date DATE,
+            budget DECIMAL(12,2),
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Auto-categorization rules table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS auto_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            match_pattern TEXT NOT NULL,
+            match_type TEXT DEFAULT 'contains',
+            bucket TEXT NOT NULL,
+            category TEXT NOT NULL,
+            subcategory TEXT,
+            tag TEXT,
+            priority INTEGER DEFAULT 100,
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Recurring transactions table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS recurring_transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id INTEGER,
+            description TEXT NOT NULL,
+            expected_amount DECIMAL(12,2),
+            frequency TEXT NOT NULL,
+            day_of_month INTEGER,
+            day_of_week INTEGER,
+            bucket TEXT,
+            category TEXT,
+            subcategory TEXT,
+            is_income BOOLEAN DEFAULT 0,
+            is_active BOOLEAN DEFAULT 1,
+            last_occurrence DATE,
+            next_expected DATE,
+            notes TEXT,
+            FOREIGN KEY (account_id) REFERENCES accounts(id)
+        )
+    """)
+    
+    # Balance history table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS balance_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id INTEGER NOT NULL,
+            balance_date DATE NOT NULL,
+            balance DECIMAL(12,2) NOT NULL,
+            recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (account_id) REFERENCES accounts(id),
+            UNIQUE(account_id, balance_date)
+        )
+    """)
+    
+    # Rewards points table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rewards_points (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            program_name TEXT NOT NULL UNIQUE,
+            current_balance INTEGER DEFAULT 0,
+            point_value DECIMAL(6,4),
+            last_updated DATE,
+            notes TEXT
+        )
+    """)
+    
+    # Partner draws table (Mark & Kelly personal draws from business)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS partner_draws (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            partner TEXT NOT NULL,
+            draw_date DATE NOT NULL,
+            description TEXT NOT NULL,
+            amount DECIMAL(12,2) NOT NULL,
+            notes TEXT,
+            transaction_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (transaction_id) REFERENCES transactions(id)
+        )
+    """)
+
+def _add_credit_limit_column(conn):
+    # Formerly update_database.py: very old databases predate credit_limit
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(accounts)")}
+    if 'credit_limit' not in columns:
+        conn.execute("ALTER TABLE accounts ADD COLUMN credit_limit DECIMAL(12,2)")
+
+def _seed_initial_data(conn):
+    """Seed Mark's accounts, rewards programs, categories and default rules."""
+    cursor = conn.cursor()
+
+    # Databases created before migrations existed already hold real data
+    cursor.execute("SELECT COUNT(*) FROM accounts")
+    if cursor.fetchone()[0] > 0:
+        return
+    
+    # Insert accounts (name, institution, type, last4, balance, credit_limit, payment, due_day, rate, payoff, business, active, notes)
+    accounts = [
+        # Credit Cards
+        ("Chase Ink Reserve", "Chase", "credit_card", "0678", 141398.50, 150000, 122291.79, 17, None, None, 1, 1, "CRITICAL: Huge payment due"),
+        ("Capital One Venture X", "Capital One", "credit_card", "8615", 17538.56, 30000, 17538.56, 20, None, None, 1, 1, "Pay Full Balance"),
+        ("Amex Gold (Ad Account)", "Amex", "credit_card", "51008", 6560.22, 25000, 4355.21, 2, None, None, 1, 1, "Primary ad spend card"),
+        ("Amex Gold (Marketing)", "Amex", "credit_card", "51001", 5465.09, 25000, 1282.11, 18, None, None, 1, 1, "Marketing Card"),
+        ("Amex Amazon", "Amex", "credit_card", "61002", 1111.63, 10000, 35.00, 15, None, None, 1, 1, "Amazon Prime"),
+        ("Amex Plum", "Amex", "credit_card", "31003", 235.60, 50000, 0, None, None, None, 1, 1, "Flexible Pay"),
+        ("Chase Sapphire", "Chase", "credit_card", "5125", 887.07, 15000, 0, 4, None, None, 0, 1, "Personal"),
+        ("Chase Biz Ink", "Chase", "credit_card", "8187", 0, 25000, 0, 9, None, None, 1, 1, "Zero Balance"),
+        ("Capital One Savor", "Capital One", "credit_card", "5920", 1929.86, 10000, 1929.86, None, None, None, 0, 1, "Personal card"),
+        
+        # Loans (no credit limit)
+        ("Tax Debt (Katie)", "IRS", "tax_debt", None, 40377.78, None, 1230.00, 15, None, None, 1, 1, "2020/2021 Taxes"),
+        ("Land Rover Auto Loan", "Land Rover Financial", "auto_loan", None, 63940.87, None, 1596.07, 27, None, "2029-07-27", 0, 1, "Loan Ends July 2029"),
+        ("Best Egg Personal Loan", "Best Egg", "personal_loan", "1753", 32545.15, None, 1283.58, 7, None, None, 0, 1, "Autopay ON"),
+        ("LendingPoint Personal Loan", "LendingPoint", "personal_loan", "6143", 8744.74, None, 1139.15, 23, None, None, 0, 1, "16 Payments Left"),
+        
+        # Private Loans
+        ("Sandra Lopez Loan", "Sandra Lopez", "private_loan", None, 117000.00, None, 3000.00, 1, 0, None, 0, 1, "No interest - straight paydown"),
+        ("John Lyon Card", "Chase (for John Lyon)", "credit_card", None, 19600.00, 25000, 1400.00, 22, None, "2027-03-21", 0, 1, "Paying on behalf of John Lyon"),
+        ("Martin Toha", "Martin Toha", "private_loan", None, 30000.00, None, 0, None, None, None, 0, 1, "No payment plan yet - track balance only"),
+    ]
+    
+    cursor.executemany("""
+        INSERT INTO accounts (name, institution, account_type, last_four, current_balance, 
+                              credit_limit, minimum_payment, due_day, interest_rate, payoff_date,
+                              is_business, is_active, notes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, accounts)
+    
+    # Insert rewards points
+    rewards = [
+        ("Amex Membership Rewards", 1148376, 0.015, "2026-01-27"),
+        ("Chase Ultimate Rewards", 985997, 0.015, "2026-01-27"),
+        ("Capital One Miles", 313946, 0.01, "2026-01-27"),
+        ("Amazon Rewards", 221369, 0.01, "2026-01-27"),
+        ("American Airlines", 26789, 0.014, "2026-01-27"),
+        ("Atmos Rewards (Alaska/Hawaiian)", 551625, 0.014, "2026-01-27"),
+    ]
+    
+    cursor.executemany("""
+        INSERT INTO rewards_points (program_name, current_balance, point_value, last_updated)
+        VALUES (?, ?, ?, ?)
+    """, rewards)
+    
+    # Insert default categories
+    order = 0
+    for bucket, categories in config.DEFAULT_CATEGORIES.items():
+        for category, subcategories in categories.items():
+            if subcategories:
+                for subcategory in subcategories:
+                    cursor.execute("""
+                        INSERT OR IGNORE INTO categories (bucket, category, subcategory, display_order)
+                        VALUES (?, ?, ?, ?)
+                    """, (bucket, category, subcategory, order))
+                    order += 1
+            else:
+                cursor.execute("""
+                    INSERT OR IGNORE INTO categories (bucket, category, subcategory, display_order)
+                    VALUES (?, ?, NULL, ?)
+                """, (bucket, category, order))
+                order += 1
+    
+    # Insert default auto-categorization rules
+    rules = [
+        ("NEWLIN", "contains", "ENGINE", "Revenue", "Client Payments", None, 10),
+        ("RME", "contains", "ENGINE", "Revenue", "Client Payments", None, 10),
+        ("FACEBOOK", "contains", "ENGINE", "Ad Spend", "Facebook/Meta", None, 20),
+        ("META ADS", "contains", "ENGINE", "Ad Spend", "Facebook/Meta", None, 20),
+        ("GOOGLE ADS", "contains", "ENGINE", "Ad Spend", "Google", None, 20),
+        ("TIKTOK", "contains", "ENGINE", "Ad Spend", "TikTok", None, 20),
+        ("DIGITAL VIKING", "contains", "ENGINE", "Partner Payouts", "Digital Viking", None, 30),
+        ("GUSTO", "contains", "OVERHEAD", "Payroll", "Gusto/Salaries", None, 40),
+        ("BEST EGG", "contains", "OVERHEAD", "Debt Service", "Personal Loans", None, 50),
+        ("LENDINGPOINT", "contains", "OVERHEAD", "Debt Service", "Personal Loans", None, 50),
+        ("LAND ROVER FIN", "contains", "OVERHEAD", "Debt Service", "Auto Loan", None, 50),
+        ("IRS", "contains", "OVERHEAD", "Debt Service", "Tax Debt", None, 50),
+        ("EFTPS", "contains", "OVERHEAD", "Debt Service", "Tax Debt", None, 50),
+    ]
+    
+    cursor.executemany("""
+        INSERT INTO auto_rules (match_pattern, match_type, bucket, category, subcategory, tag, priority)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, rules)
+
+def _backfill_credit_limits(conn):
+    # Formerly update_database.py; only fills limits that were never set
+    credit_limits = {
+        "Chase Ink Reserve": 150000,
+        "Capital One Venture X": 30000,
+        "Amex Gold (Ad Account)": 25000,
+        "Amex Gold (Marketing)": 25000,
+        "Amex Amazon": 10000,
+        "Amex Plum": 50000,
+        "Chase Sapphire": 15000,
+        "Chase Biz Ink": 25000,
+        "Capital One Savor": 10000,
+        "John Lyon Card": 25000,
+    }
+    conn.executemany(
+        "UPDATE accounts SET credit_limit = ? WHERE name = ? AND credit_limit IS NULL",
+        [(limit, name) for name, limit in credit_limits.items()]
+    )
+
+def _refresh_airline_programs(conn):
+    # Formerly update_rewards.py: Alaska Airlines became Atmos Rewards (Alaska/Hawaiian).
+    # Balances are only touched if they predate the 2026-01-27 statement.
+    conn.execute("DELETE FROM rewards_points WHERE program_name = 'Alaska Airlines'")
+    conn.execute("""
+        UPDATE rewards_points SET current_balance = 26789, last_updated = '2026-01-27'
+        WHERE program_name = 'American Airlines'
+        AND (last_updated IS NULL OR last_updated < '2026-01-27')
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO rewards_points (program_name, current_balance, point_value, last_updated)
+        VALUES ('Atmos Rewards (Alaska/Hawaiian)', 551625, 0.014, '2026-01-27')
+    """)
+
+def _add_draw_import_hash(conn):
+    # Draws used to be wiped and reloaded on every import, so everything already
+    # in the table is the last import (plus any manual entries made since) and
+    # is hashed as imported. Manual entries added from now on keep a NULL hash.
+    from utils.database import compute_draw_hash
+
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(partner_draws)")}
+    if 'import_hash' not in columns:
+        conn.execute("ALTER TABLE partner_draws ADD COLUMN import_hash TEXT")
+    if 'is_active' not in columns:
+        conn.execute("ALTER TABLE partner_draws ADD COLUMN is_active INTEGER DEFAULT 1")
+
+    seen = {}
+    hashes = []
+    for draw_id, partner, draw_date, description, amount in conn.execute("""
+        SELECT id, partner, draw_date, description, amount FROM partner_draws
+        WHERE import_hash IS NULL ORDER BY id
+    """):
+        key = (partner, draw_date, description, amount)
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        hashes.append((compute_draw_hash(partner, draw_date, description, amount, occurrence), draw_id))
+    conn.executemany("UPDATE partner_draws SET import_hash = ? WHERE id = ?", hashes)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_partner_draws_import_hash ON partner_draws (import_hash)")
+
+# Active draws are folded into two summary tables as they are written:
+# per-partner totals, and per-partner per-day sums the running difference is
+# built from. Amounts are rounded to cents on every step so the sums don't drift.
+def _draw_summary_add(row, when):
+    return f"""
+        INSERT INTO partner_draw_totals (partner, total, count)
+        SELECT {row}.partner, {row}.amount, 1 WHERE {when}
+        ON CONFLICT (partner) DO UPDATE SET total = ROUND(total + excluded.total, 2), count = count + 1;
+        INSERT INTO partner_draw_daily (partner, draw_date, total, count)
+        SELECT {row}.partner, {row}.draw_date, {row}.amount, 1 WHERE {when}
+        ON CONFLICT (partner, draw_date) DO UPDATE SET total = ROUND(total + excluded.total, 2), count = count + 1;
+    """
+
+def _draw_summary_remove(row, when):
+    return f"""
+        UPDATE partner_draw_totals SET total = ROUND(total - {row}.amount, 2), count = count - 1
+        WHERE partner = {row}.partner AND {when};
+        UPDATE partner_draw_daily SET total = ROUND(total - {row}.amount, 2), count = count - 1
+        WHERE partner = {row}.partner AND draw_date = {row}.draw_date AND {when};
+        DELETE FROM partner_draw_daily
+        WHERE partner = {row}.partner AND draw_date = {row}.draw_date AND count <= 0;
+    """
+
+_DRAW_SUMMARY_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS partner_draw_totals (
+        partner TEXT PRIMARY KEY,
+        total DECIMAL(12,2) NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS partner_draw_daily (
+        partner TEXT NOT NULL,
+        draw_date DATE NOT NULL,
+        total DECIMAL(12,2) NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (draw_date, partner)
+    ) WITHOUT ROWID
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_partner_draws_summary_insert
+    AFTER INSERT ON partner_draws
+    BEGIN {_draw_summary_add('NEW', 'NEW.is_active = 1')} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_partner_draws_summary_delete
+    AFTER DELETE ON partner_draws
+    BEGIN {_draw_summary_remove('OLD', 'OLD.is_active = 1')} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_partner_draws_summary_update
+    AFTER UPDATE OF partner, draw_date, amount, is_active ON partner_draws
+    BEGIN
+        {_draw_summary_remove('OLD', 'OLD.is_active = 1')}
+        {_draw_summary_add('NEW', 'NEW.is_active = 1')}
+    END
+    """,
+    "DELETE FROM partner_draw_totals",
+    "DELETE FROM partner_draw_daily",
+    """
+    INSERT INTO partner_draw_totals (partner, total, count)
+    SELECT partner, ROUND(SUM(amount), 2), COUNT(*) FROM partner_draws
+    WHERE is_active = 1 GROUP BY partner
+    """,
+    """
+    INSERT INTO partner_draw_daily (partner, draw_date, total, count)
+    SELECT partner, draw_date, ROUND(SUM(amount), 2), COUNT(*) FROM partner_draws
+    WHERE is_active = 1 GROUP BY partner, draw_date
+    """,
+]
+
+# External-content FTS5 indexes: the text lives once, in the base table, and
+# triggers mirror every change into the index. Transaction updates only
+# reindex when a searched column changes, so categorization doesn't touch it.
+def _fts_index(table, columns):
+    fts = f"{table}_fts"
+    cols = ', '.join(columns)
+    old = ', '.join(f"old.{c}" for c in columns)
+    new = ', '.join(f"new.{c}" for c in columns)
+    return [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {cols}, content='{table}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});
+            INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new});
+        END
+        """,
+        f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')",
+    ]
+
+# Manual categorizations (categorized, not by a rule) are logged as +1/-1
+# label events as they happen, so rule learning only reads what changed since
+# its last run instead of rescanning history.
+_MANUAL = "{row}.is_categorized = 1 AND {row}.auto_categorized = 0 AND {row}.bucket IS NOT NULL AND {row}.category IS NOT NULL"
+
+def _rule_log(row, weight):
+    return f"""
+        INSERT INTO rule_learning_log (text, merchant_name, bucket, category, subcategory, weight)
+        SELECT COALESCE({row}.clean_description, {row}.description), {row}.merchant_name,
+               {row}.bucket, {row}.category, {row}.subcategory, {weight}
+        WHERE {_MANUAL.format(row=row)};
+    """
+
+def _add_rule_learning(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(auto_rules)")}
+    if 'source' not in columns:
+        # manual | proposed | learned (accepted proposal) | rejected
+        conn.execute("ALTER TABLE auto_rules ADD COLUMN source TEXT DEFAULT 'manual'")
+    if 'confidence' not in columns:
+        conn.execute("ALTER TABLE auto_rules ADD COLUMN confidence REAL")
+    if 'support' not in columns:
+        conn.execute("ALTER TABLE auto_rules ADD COLUMN support INTEGER")
+
+    for statement in [
+        """
+        CREATE TABLE IF NOT EXISTS rule_learning_log (
+            id INTEGER PRIMARY KEY,
+            text TEXT,
+            merchant_name TEXT,
+            bucket TEXT,
+            category TEXT,
+            subcategory TEXT,
+            weight INTEGER NOT NULL
+        )
+        """,
+        # subcategory is '' rather than NULL so the UNIQUE constraint holds
+        """
+        CREATE TABLE IF NOT EXISTS rule_labels (
+            id INTEGER PRIMARY KEY,
+            bucket TEXT NOT NULL,
+            category TEXT NOT NULL,
+            subcategory TEXT NOT NULL DEFAULT '',
+            UNIQUE (bucket, category, subcategory)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS rule_feature_counts (
+            feature TEXT NOT NULL,
+            label_id INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (feature, label_id)
+        ) WITHOUT ROWID
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rule_log_insert
+        AFTER INSERT ON transactions
+        BEGIN {_rule_log('NEW', 1)} END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rule_log_delete
+        AFTER DELETE ON transactions
+        BEGIN {_rule_log('OLD', -1)} END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rule_log_update
+        AFTER UPDATE OF bucket, category, subcategory, is_categorized, auto_categorized,
+                        clean_description, merchant_name ON transactions
+        BEGIN
+            {_rule_log('OLD', -1)}
+            {_rule_log('NEW', 1)}
+        END
+        """,
+    ]:
+        conn.execute(statement)
+
+    # Everything categorized by hand so far is the first batch to learn from
+    conn.execute(f"""
+        INSERT INTO rule_learning_log (text, merchant_name, bucket, category, subcategory, weight)
+        SELECT COALESCE(clean_description, description), merchant_name, bucket, category, subcategory, 1
+        FROM transactions WHERE {_MANUAL.format(row='transactions')}
+    """)
+
+# Transactions are folded into a monthly rollup as they are written, one row
+# per month x account x bucket x category x tag. Missing dimensions are stored
+# as '' because primary key columns of a WITHOUT ROWID table can't be NULL.
+_ROLLUP_KEY = ("substr({row}.transaction_date, 1, 7), {row}.account_id, COALESCE({row}.bucket, ''), "
+               "COALESCE({row}.category, ''), COALESCE({row}.tag, '')")
+
+def _rollup_add(row):
+    return f"""
+        INSERT INTO transaction_rollup (month, account_id, bucket, category, tag, inflow, outflow, count)
+        VALUES ({_ROLLUP_KEY.format(row=row)}, MAX({row}.amount, 0), MIN({row}.amount, 0), 1)
+        ON CONFLICT (month, account_id, bucket, category, tag) DO UPDATE SET
+            inflow = ROUND(inflow + excluded.inflow, 2),
+            outflow = ROUND(outflow + excluded.outflow, 2),
+            count = count + 1;
+    """
+
+def _rollup_remove(row):
+    match = f"(month, account_id, bucket, category, tag) = ({_ROLLUP_KEY.format(row=row)})"
+    return f"""
+        UPDATE transaction_rollup
+        SET inflow = ROUND(inflow - MAX({row}.amount, 0), 2),
+            outflow = ROUND(outflow - MIN({row}.amount, 0), 2),
+            count = count - 1
+        WHERE {match};
+        DELETE FROM transaction_rollup WHERE {match} AND count <= 0;
+    """
+
+# Recomputes the rollup from transactions; also run by the rebuild_rollup job
+ROLLUP_REBUILD_SQL = [
+    "DELETE FROM transaction_rollup",
+    """
+    INSERT INTO transaction_rollup (month, account_id, bucket, category, tag, inflow, outflow, count)
+    SELECT substr(transaction_date, 1, 7), account_id, COALESCE(bucket, ''), COALESCE(category, ''),
+           COALESCE(tag, ''), ROUND(SUM(MAX(amount, 0)), 2), ROUND(SUM(MIN(amount, 0)), 2), COUNT(*)
+    FROM transactions
+    GROUP BY 1, 2, 3, 4, 5
+    """,
+]
+
+_TRANSACTION_ROLLUP_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS transaction_rollup (
+        month TEXT NOT NULL,
+        account_id INTEGER NOT NULL,
+        bucket TEXT NOT NULL,
+        category TEXT NOT NULL,
+        tag TEXT NOT NULL,
+        inflow DECIMAL(12,2) NOT NULL DEFAULT 0,
+        outflow DECIMAL(12,2) NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (month, account_id, bucket, category, tag)
+    ) WITHOUT ROWID
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_insert
+    AFTER INSERT ON transactions
+    BEGIN {_rollup_add('NEW')} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_delete
+    AFTER DELETE ON transactions
+    BEGIN {_rollup_remove('OLD')} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_update
+    AFTER UPDATE OF transaction_date, account_id, bucket, category, tag, amount ON transactions
+    BEGIN
+        {_rollup_remove('OLD')}
+        {_rollup_add('NEW')}
+    END
+    """,
+] + ROLLUP_REBUILD_SQL + [
+    # Read-only reporting views over the rollup
+    """
+    CREATE VIEW IF NOT EXISTS v_bucket_monthly AS
+    SELECT month, NULLIF(bucket, '') AS bucket,
+           ROUND(SUM(inflow), 2) AS inflow, ROUND(SUM(outflow), 2) AS outflow,
+           ROUND(SUM(inflow + outflow), 2) AS net, SUM(count) AS count
+    FROM transaction_rollup
+    GROUP BY month, bucket
+    """,
+    """
+    CREATE VIEW IF NOT EXISTS v_category_monthly AS
+    SELECT month, NULLIF(bucket, '') AS bucket, NULLIF(category, '') AS category,
+           ROUND(SUM(inflow), 2) AS inflow, ROUND(SUM(outflow), 2) AS outflow,
+           ROUND(SUM(inflow + outflow), 2) AS net, SUM(count) AS count
+    FROM transaction_rollup
+    GROUP BY month, bucket, category
+    """,
+]
+
+def _add_recurring_detection(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(recurring_transactions)")}
+    if 'source' not in columns:
+        # manual | detected | dismissed (a detected item the user removed)
+        conn.execute("ALTER TABLE recurring_transactions ADD COLUMN source TEXT DEFAULT 'manual'")
+    if 'merchant_key' not in columns:
+        # Normalized merchant a detected item was found under
+        conn.execute("ALTER TABLE recurring_transactions ADD COLUMN merchant_key TEXT")
+    if 'confidence' not in columns:
+        conn.execute("ALTER TABLE recurring_transactions ADD COLUMN confidence REAL")
+
+MIGRATIONS = [
+    (1, "Base schema", _create_base_schema),
+    (2, "credit_limit column on accounts", _add_credit_limit_column),
+    (3, "Seed accounts, rewards, categories and rules", _seed_initial_data),
+    (4, "Secondary indexes for hot query paths", [
+        # get_partner_draws / Partner Draws page: partner filter + date range, newest first
+        "CREATE INDEX IF NOT EXISTS idx_partner_draws_partner_date ON partner_draws (partner, draw_date)",
+        # Unfiltered date range / date ordering
+        "CREATE INDEX IF NOT EXISTS idx_partner_draws_date ON partner_draws (draw_date)",
+        # Amount sort per partner
+        "CREATE INDEX IF NOT EXISTS idx_partner_draws_partner_amount ON partner_draws (partner, amount)",
+        # Per-account statement views and date-range reports
+        "CREATE INDEX IF NOT EXISTS idx_transactions_account_date ON transactions (account_id, transaction_date)",
+        "CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (transaction_date)",
+        # Bucket / category drill-downs
+        "CREATE INDEX IF NOT EXISTS idx_transactions_bucket_category ON transactions (bucket, category, transaction_date)",
+        "CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions (category, transaction_date)",
+    ]),
+    (5, "Credit limits for existing cards", _backfill_credit_limits),
+    (6, "Airline rewards programs refresh", _refresh_airline_programs),
+    (7, "Content hashes and tombstones for imported partner draws", _add_draw_import_hash),
+    (8, "Trigger-maintained partner draw totals and daily series", _DRAW_SUMMARY_SQL),
+    (9, "Amount index for the all-partners draw list", [
+        # Partner Draws page: Highest / Lowest Amount with no partner filter
+        "CREATE INDEX IF NOT EXISTS idx_partner_draws_amount ON partner_draws (amount)",
+    ]),
+    (10, "Full-text search over draw and transaction descriptions",
+        _fts_index('partner_draws', ['description', 'notes'])
+        + _fts_index('transactions', ['description', 'clean_description', 'merchant_name'])),
+    (11, "Partial index for the triage queue", [
+        # Only rows still waiting for triage are indexed, grouped by the same
+        # key the queue uses, so the queue stays small as history grows
+        "CREATE INDEX IF NOT EXISTS idx_transactions_triage "
+        "ON transactions (COALESCE(clean_description, description)) "
+        "WHERE is_categorized = 0 AND is_reviewed = 0",
+    ]),
+    (12, "Incremental rule learning from manual categorizations", _add_rule_learning),
+    (13, "Trigger-maintained monthly transaction rollup and bucket views", _TRANSACTION_ROLLUP_SQL),
+    (14, "Covering index for balance history ranges", [
+        # Trend reads seek each account's date range and take the balance
+        # from the index without touching the table
+        "CREATE INDEX IF NOT EXISTS idx_balance_history_range "
+        "ON balance_history (account_id, balance_date, balance)",
+    ]),
+    (15, "Source tracking for detected recurring transactions", _add_recurring_detection),
+    (16, "Background job queue", [
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            label TEXT,
+            params TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',  -- queued | running | succeeded | failed | cancelled
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)",
+    ]),
+    (17, "Owning process of each background job", [
+        # pid plus process start time, so a starting app only settles jobs whose process has exited
+        "ALTER TABLE jobs ADD COLUMN owner TEXT",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_version(conn):
+    """Get the last migration applied to this database."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def pending_migrations(conn):
+    """Migrations not yet applied, in order."""
+    current = get_version(conn)
+    return [m for m in MIGRATIONS if m[0] > current]
+
+def migrate(conn, target=None):
+    """Bring the database up to `target` (default: latest).
+
+    Costs a single PRAGMA read when the database is already current.
+    Returns the list of (version, description) applied.
+    """
+    target = LATEST_VERSION if target is None else target
+    current = get_version(conn)
+    if current >= target:
+        return []
+
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+        if conn.in_transaction:
+            conn.commit()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Another process may have migrated while we waited for the write lock
+            if get_version(conn) >= version:
+                conn.rollback()
+                continue
+            if callable(step):
+                step(conn)
+            else:
+                for statement in step:
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        applied.append((version, description))
+    return applied
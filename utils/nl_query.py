@@ -0,0 +1,776 @@
+"""
+Liquidity Engine - Natural-Language Query
+Turns plain-English questions into parameterized SQL. An offline
+intent/template matcher handles the questions the app knows about; the
+Anthropic API is an optional fallback that picks an intent, never SQL.
+"""
+import json
+import math
+import re
+import time
+from datetime import date, timedelta
+from functools import lru_cache
+
+import config
+from utils import forecast
+from utils import reports
+from utils.database import cached, get_connection
+
+# Intent -> what it answers (also the catalog the model backend chooses from)
+INTENTS = {
+    'tag_spend': "Total cost of everything tagged with a tag (a trip, project or event), by category",
+    'category_spend': "Spending in a category (ads, dining, travel...) over a period, by merchant",
+    'large_expenses': "Expenses over an amount, optionally in one category",
+    'top_expenses': "The largest expenses in a period",
+    'average_revenue': "Average daily, weekly or monthly revenue",
+    'revenue_compare': "Revenue in two or more periods side by side",
+    'roas': "Return on ad spend: revenue divided by ad spend over a period",
+    'burn_rate': "Average monthly net cash outflow",
+    'runway': "How long cash on hand lasts at the current burn rate",
+    'cash_projection': "Projected cash balance over the coming days",
+    'credit_card_debt': "Balances owed on credit cards",
+    'total_debt': "Balances owed on every account",
+    'debt_payments': "Total monthly minimum debt payments",
+    'payoff_date': "When a loan or card is paid off at its current payment",
+    'partner_draws': "Partner draws (Mark, Katie) over a period",
+}
+
+# Checked in order; the first intent whose pattern matches and whose required
+# entities are present wins
+INTENT_PATTERNS = [
+    ('payoff_date', r"\b(paid off|pay off|payoff)\b"),
+    ('debt_payments', r"\b(debt|minimum|monthly) payments?\b"),
+    ('credit_card_debt', r"\bcredit cards?\b.*\b(owe|debt|balances?)\b|\bowe\b.*\bcredit cards?\b"),
+    ('total_debt', r"\b(total|all) (my )?debt\b|\bhow much do i owe\b"),
+    ('runway', r"\brun out of (money|cash)\b|\brunway\b"),
+    ('cash_projection', r"\bproject(ed|ion)?\b|\bforecast\b|\bcash position\b"),
+    ('burn_rate', r"\bburn\b"),
+    ('roas', r"\broas\b|\breturn on ad spend\b"),
+    ('revenue_compare', r"\b(compare|vs|versus)\b.*\brevenue\b|\brevenue\b.*\b(vs|versus|compared to)\b"),
+    ('average_revenue', r"\b(average|avg|typical)\b.*\brevenue\b|\b(daily|weekly|monthly) revenue\b"),
+    ('partner_draws', r"\bdraws?\b|\bdrawn\b|\bdistributions\b"),
+    ('top_expenses', r"\b(top|largest|biggest) (\d+ )?(expenses|purchases|transactions|charges|spend)\b"),
+    ('large_expenses', r"\b(expenses|purchases|transactions|charges)\b.*\b(over|above|more than|greater than)\b"),
+    ('tag_spend', r"\bcost\b|\bspen[dt]\b|\bspending\b"),
+    ('category_spend', r"\bcost\b|\bspen[dt]\b|\bspending\b|\bexpenses?\b|\bpaid\b"),
+]
+_INTENT_REGEXES = [(name, re.compile(pattern)) for name, pattern in INTENT_PATTERNS]
+
+# Plain-English words for categories, beyond the category names themselves
+CATEGORY_SYNONYMS = {
+    'ads': ('Ad Spend', None), 'ad spend': ('Ad Spend', None), 'advertising': ('Ad Spend', None),
+    'marketing': ('Ad Spend', None), 'facebook ads': ('Ad Spend', 'Facebook/Meta'),
+    'meta ads': ('Ad Spend', 'Facebook/Meta'), 'google ads': ('Ad Spend', 'Google'),
+    'tiktok ads': ('Ad Spend', 'TikTok'),
+    'restaurant': ('Dining', None), 'restaurants': ('Dining', None), 'food': ('Dining', None),
+    'eating out': ('Dining', None), 'meals': ('Dining', None),
+    'flights': ('Travel', 'Flights'), 'hotels': ('Travel', 'Hotels'), 'trips': ('Travel', None),
+    'salaries': ('Payroll', None), 'contractors': ('Payroll', 'Contractors'),
+    'software': ('Subscriptions', 'Software'), 'legal': ('Professional Services', 'Legal'),
+    'accounting': ('Professional Services', 'Accounting'), 'gym': ('Health/Fitness', None),
+    'fitness': ('Health/Fitness', None), 'health': ('Health/Fitness', None),
+    'payouts': ('Partner Payouts', None), 'commission': ('Commissions', None),
+}
+
+PARTNERS = ('Mark', 'Katie')
+
+# Account-name words that don't identify an account on their own
+_GENERIC_ACCOUNT_WORDS = {
+    'loan', 'card', 'personal', 'auto', 'account', 'the', 'credit', 'debt', 'private',
+    'tax', 'ad', 'business', 'biz', 'reserve',
+}
+
+MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july', 'august',
+          'september', 'october', 'november', 'december']
+
+# ============ Normalization ============
+
+_CONTRACTIONS = {"what's": "what is", "how's": "how is", "i'm": "i am", "when's": "when is"}
+_STRIP = re.compile(r"[^a-z0-9$.,%&/' -]+")
+_SPACE = re.compile(r"\s+")
+
+def normalize_question(text):
+    """Lower-case, expand contractions and drop punctuation, so trivially
+    different phrasings of a question share one cache entry."""
+    text = (text or '').lower().replace('’', "'")
+    for short, long in _CONTRACTIONS.items():
+        text = text.replace(short, long)
+    text = _STRIP.sub(' ', text)
+    text = re.sub(r"(?<!\d)[.,]|[.,](?!\d)", ' ', text)  # keep "1,000" and "12.50"
+    return _SPACE.sub(' ', text).strip()
+
+# ============ Periods ============
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    last = (date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)).day
+    return date(year, month, min(day.day, last))
+
+def _month_start(day):
+    return day.replace(day=1)
+
+def _quarter_start(day):
+    return date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+
+def _period(start, end, label):
+    return {'start': start.isoformat(), 'end': end.isoformat(), 'label': label}
+
+def parse_period(q, today):
+    """First date range mentioned in a normalized question, or None."""
+    m = re.search(r"\b(last|past|previous|next) (\d+) (day|week|month|year)s?\b", q)
+    if m:
+        n = int(m.group(2))
+        span = {'day': timedelta(days=n), 'week': timedelta(weeks=n)}.get(m.group(3))
+        if m.group(1) == 'next':
+            end = today + span if span else _add_months(today, n * (12 if m.group(3) == 'year' else 1))
+            return _period(today, end, f"next {n} {m.group(3)}s")
+        start = today - span if span else _add_months(today, -n * (12 if m.group(3) == 'year' else 1))
+        return _period(start, today, f"last {n} {m.group(3)}s")
+
+    m = re.search(r"\b(this|last|previous) (week|month|quarter|year)\b", q)
+    if m:
+        unit = m.group(2)
+        if unit == 'week':
+            start = today - timedelta(days=today.weekday())
+            if m.group(1) == 'this':
+                return _period(start, today, "this week")
+            return _period(start - timedelta(weeks=1), start - timedelta(days=1), "last week")
+        months = {'month': 1, 'quarter': 3, 'year': 12}[unit]
+        start = {'month': _month_start, 'quarter': _quarter_start,
+                 'year': lambda d: date(d.year, 1, 1)}[unit](today)
+        if m.group(1) == 'this':
+            return _period(start, today, f"this {unit}")
+        previous = _add_months(start, -months)
+        return _period(previous, start - timedelta(days=1), f"last {unit}")
+
+    if re.search(r"\b(ytd|year to date)\b", q):
+        return _period(date(today.year, 1, 1), today, "year to date")
+
+    m = re.search(r"\bq([1-4])(?: (20\d\d))?\b", q)
+    if m:
+        quarter = int(m.group(1))
+        year = int(m.group(2)) if m.group(2) else today.year
+        start = date(year, 3 * quarter - 2, 1)
+        if not m.group(2) and start > today:
+            start = start.replace(year=year - 1)
+        return _period(start, _add_months(start, 3) - timedelta(days=1), f"Q{quarter} {start.year}")
+
+    # "in march" or "march 2025", but not "may" as a verb
+    names = '|'.join(MONTHS)
+    m = re.search(r"\b(?:in|for|during|of|from|since) (%s)(?: (20\d\d))?\b|\b(%s) (20\d\d)\b" % (names, names), q)
+    if m:
+        name, year = (m.group(1), m.group(2)) if m.group(1) else (m.group(3), m.group(4))
+        start = date(int(year) if year else today.year, MONTHS.index(name) + 1, 1)
+        if not year and start > today:
+            start = start.replace(year=start.year - 1)
+        return _period(start, _add_months(start, 1) - timedelta(days=1), start.strftime('%B %Y'))
+
+    m = re.search(r"(?<![$\d,.])\b(20\d\d)\b(?![\d,.])", q)
+    if m:
+        year = int(m.group(1))
+        return _period(date(year, 1, 1), min(date(year, 12, 31), today), str(year))
+
+    if re.search(r"\btoday\b", q):
+        return _period(today, today, "today")
+    if re.search(r"\byesterday\b", q):
+        return _period(today - timedelta(days=1), today - timedelta(days=1), "yesterday")
+    return None
+
+def parse_periods(q, today):
+    """Every period in a comparison: "q4 vs q3", "this month versus last month"."""
+    periods = []
+    for part in re.split(r"\b(?:vs|versus|compared to|compared with|against|and)\b", q):
+        period = parse_period(part, today)
+        if period and period not in periods:
+            periods.append(period)
+    return periods
+
+def _default_period(today, days):
+    return _period(today - timedelta(days=days), today, f"last {days} days")
+
+# ============ Entities ============
+
+@cached('accounts', 'transactions')
+def _vocabulary():
+    """Tag names and active accounts the matcher can recognize."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT name FROM tags
+            UNION SELECT DISTINCT tag FROM transactions WHERE tag IS NOT NULL AND tag != ''
+        """)
+        tags = tuple(row[0] for row in cursor.fetchall())
+        cursor.execute("SELECT id, name, account_type FROM accounts WHERE is_active = 1")
+        accounts = tuple((row['id'], row['name'], row['account_type']) for row in cursor.fetchall())
+    return {'tags': tags, 'accounts': accounts}
+
+def _contains_phrase(q, phrase):
+    return bool(phrase) and f" {phrase} " in f" {q} "
+
+def find_tag(q, tags):
+    """Longest tag named in the question."""
+    best = None
+    for tag in tags:
+        phrase = normalize_question(tag)
+        if _contains_phrase(q, phrase) and (best is None or len(phrase) > len(normalize_question(best))):
+            best = tag
+    return best
+
+def find_category(q):
+    """(category, subcategory) named in the question, longest phrase first."""
+    phrases = dict(CATEGORY_SYNONYMS)
+    for categories in config.DEFAULT_CATEGORIES.values():
+        for category, subcategories in categories.items():
+            phrases.setdefault(normalize_question(category), (category, None))
+            for subcategory in subcategories:
+                phrases.setdefault(normalize_question(subcategory), (category, subcategory))
+    for phrase in sorted(phrases, key=len, reverse=True):
+        if _contains_phrase(q, phrase):
+            return phrases[phrase]
+    return None
+
+def find_account(q, accounts):
+    """Account whose distinguishing name words appear in the question."""
+    words = set(re.findall(r"[a-z0-9]+", q))
+    best, best_score = None, 0
+    for account_id, name, _ in accounts:
+        distinct = set(re.findall(r"[a-z0-9]+", name.lower())) - _GENERIC_ACCOUNT_WORDS
+        score = len(distinct & words)
+        if score > best_score:
+            best, best_score = account_id, score
+    return best
+
+def find_partner(q):
+    for partner in PARTNERS:
+        if _contains_phrase(q, partner.lower()):
+            return partner
+    return None
+
+def find_threshold(q):
+    m = re.search(r"\b(?:over|above|more than|greater than|at least)\s*\$?\s*([\d,]+(?:\.\d+)?)\s*(k)?\b", q)
+    if not m:
+        return None
+    return float(m.group(1).replace(',', '')) * (1000 if m.group(2) else 1)
+
+def find_limit(q):
+    m = re.search(r"\b(?:top|largest|biggest) (\d+)\b", q)
+    return int(m.group(1)) if m else None
+
+def _entities(q, today):
+    vocabulary = _vocabulary()
+    found = {
+        'period': parse_period(q, today),
+        'tag': find_tag(q, vocabulary['tags']),
+        'category': find_category(q),
+        'account_id': find_account(q, vocabulary['accounts']),
+        'partner': find_partner(q),
+        'threshold': find_threshold(q),
+        'limit': find_limit(q),
+    }
+    return {key: value for key, value in found.items() if value is not None}
+
+# ============ Interpretation ============
+
+def _freeze(params):
+    # Hashable, order-independent form of a params dict for cache keys
+    def freeze(value):
+        if isinstance(value, dict):
+            return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+        if isinstance(value, (list, tuple)):
+            return tuple(freeze(v) for v in value)
+        return value
+    return freeze(params)
+
+def _thaw(frozen):
+    return {key: dict(value) if key == 'period' else
+            [dict(p) for p in value] if key == 'periods' else
+            value for key, value in frozen}
+
+def _params_for(intent, q, today, entities):
+    """Parameters an intent runs with, or None if the question lacks what it needs."""
+    params = dict(entities)
+    if intent == 'tag_spend' and 'tag' not in params:
+        return None
+    if intent == 'category_spend' and 'category' not in params:
+        return None
+    if intent == 'revenue_compare':
+        params['periods'] = parse_periods(q, today)
+        if len(params['periods']) < 2:
+            current = _month_start(today)
+            params['periods'] = [_period(current, today, "this month"),
+                                 _period(_add_months(current, -1), current - timedelta(days=1), "last month")]
+        params.pop('period', None)
+    if intent == 'average_revenue':
+        m = re.search(r"\b(daily|weekly|monthly)\b", q)
+        params['unit'] = m.group(1) if m else 'weekly'
+    return params
+
+@cached('accounts', 'transactions')
+def interpret(normalized, today):
+    """(intent, frozen params) for a normalized question, or None. Offline only."""
+    today = date.fromisoformat(today)
+    entities = _entities(normalized, today)
+    for intent, regex in _INTENT_REGEXES:
+        if regex.search(normalized):
+            params = _params_for(intent, normalized, today, entities)
+            if params is not None:
+                return intent, _freeze(params)
+    return None
+
+def follow_up(normalized, today, context):
+    """Re-run the previous intent with whatever the follow-up changes.
+
+    "How much did I spend on ads last month?" then "and this month?" keeps
+    the intent and category and swaps the period.
+    """
+    intent, frozen = context
+    changes = _entities(normalized, date.fromisoformat(today))
+    if not changes:
+        return None
+    params = _thaw(frozen)
+    if intent == 'revenue_compare' and 'period' in changes:
+        periods = parse_periods(normalized, date.fromisoformat(today))
+        params['periods'] = periods if len(periods) > 1 else periods + params['periods'][1:]
+        changes.pop('period')
+    params.update(changes)
+    return intent, _freeze(params)
+
+_MODEL_PROMPT = """You map questions about a small business's finances to one intent.
+Today is {today}. Intents:
+{catalog}
+
+Reply with JSON only: {{"intent": "<name>" or null, "params": {{...}}}}
+Optional params: "start" and "end" (YYYY-MM-DD), "category", "tag", "partner" ("Mark" or "Katie"),
+"account" (account name), "threshold" (dollars), "limit" (count), "unit" ("daily", "weekly" or "monthly").
+
+Question: {question}"""
+
+@lru_cache(maxsize=256)
+def _model_reply(normalized, today):
+    # Raises on any failure, so lru_cache only keeps replies that arrived
+    import anthropic
+
+    catalog = '\n'.join(f"- {name}: {description}" for name, description in INTENTS.items())
+    client = anthropic.Anthropic(api_key=config.ANTHROPIC_API_KEY)
+    message = client.messages.create(
+        model=config.AI_QUERY_MODEL,
+        max_tokens=300,
+        messages=[{'role': 'user', 'content': _MODEL_PROMPT.format(
+            today=today, catalog=catalog, question=normalized)}],
+    )
+    return json.loads(re.search(r"\{.*\}", message.content[0].text, re.DOTALL).group(0))
+
+def _interpret_with_model(normalized, today):
+    """Ask the model for an intent when the offline matcher can't place a question.
+
+    Only runs when the anthropic package is installed and an API key is
+    configured. Replies are memoized separately from the data-versioned
+    caches, so new imports never cause the same question to be sent again.
+    """
+    if not config.ANTHROPIC_API_KEY:
+        return None
+    try:
+        reply = _model_reply(normalized, today)
+    except Exception:
+        return None  # no package, no network, or an unparseable reply: answer offline only
+
+    intent = reply.get('intent')
+    if intent not in INTENTS:
+        return None
+    raw = reply.get('params') or {}
+    # Route the model's params back through the offline parsers so only
+    # known categories, tags and accounts reach the SQL
+    hints = ' '.join(str(raw[key]) for key in ('category', 'tag', 'partner', 'account') if raw.get(key))
+    params = _entities(normalize_question(hints), date.fromisoformat(today)) if hints else {}
+    params.pop('period', None)
+    try:
+        if raw.get('start') and raw.get('end'):
+            start, end = date.fromisoformat(raw['start']), date.fromisoformat(raw['end'])
+            params['period'] = _period(start, end, f"{start:%b %d, %Y} - {end:%b %d, %Y}")
+        if raw.get('threshold') is not None:
+            params['threshold'] = float(raw['threshold'])
+        if raw.get('limit') is not None:
+            params['limit'] = int(raw['limit'])
+    except (TypeError, ValueError):
+        return None
+    if raw.get('unit') in ('daily', 'weekly', 'monthly'):
+        params['unit'] = raw['unit']
+    if intent == 'tag_spend' and 'tag' not in params or intent == 'category_spend' and 'category' not in params:
+        return None
+    if intent == 'revenue_compare':
+        params['periods'] = [params.pop('period')] if 'period' in params else []
+        if not params['periods']:
+            return None
+    return intent, _freeze(params)
+
+# ============ Queries ============
+
+def _money(value):
+    value = value or 0
+    return f"-${abs(value):,.2f}" if value < 0 else f"${value:,.2f}"
+
+def _fetch(sql, params=()):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        return [tuple(row) for row in cursor.fetchall()]
+
+def _result(answer, columns=(), rows=(), sql=None, params=()):
+    return {'answer': answer, 'columns': tuple(columns), 'rows': tuple(rows),
+            'sql': ' '.join(sql.split()) if sql else None, 'sql_params': tuple(params)}
+
+def _range(params, today, days=30):
+    period = params.get('period') or _default_period(today, days)
+    return period['start'], period['end'], period['label']
+
+def _tag_spend(params, today):
+    sql = """
+        SELECT COALESCE(category, 'Uncategorized') AS category, -SUM(amount) AS spent, COUNT(*) AS transactions
+        FROM transactions WHERE tag = ? COLLATE NOCASE
+        GROUP BY 1 ORDER BY spent DESC
+    """
+    rows = _fetch(sql, (params['tag'],))
+    total = sum(row[1] for row in rows)
+    count = sum(row[2] for row in rows)
+    answer = f"**{params['tag']}** cost {_money(total)} all in, across {count:,} transactions."
+    return _result(answer, ('Category', 'Spent', 'Transactions'), rows, sql, (params['tag'],))
+
+def _category_spend(params, today):
+    start, end, label = _range(params, today)
+    category, subcategory = params['category']
+    sql = """
+        SELECT COALESCE(merchant_name, clean_description, description) AS merchant,
+               -SUM(amount) AS spent, COUNT(*) AS transactions
+        FROM transactions
+        WHERE category = ? AND transaction_date BETWEEN ? AND ?
+    """
+    args = [category, start, end]
+    if subcategory:
+        sql += " AND subcategory = ?"
+        args.append(subcategory)
+    sql += " GROUP BY 1 ORDER BY spent DESC"
+    rows = _fetch(sql, args)
+    total = sum(row[1] for row in rows)
+    name = f"{category} › {subcategory}" if subcategory else category
+    answer = f"You spent {_money(total)} on **{name}** ({label})."
+    return _result(answer, ('Merchant', 'Spent', 'Transactions'), rows, sql, args)
+
+def _expense_list(params, today, threshold=None, default_days=30):
+    start, end, label = _range(params, today, default_days)
+    sql = """
+        SELECT transaction_date, description, category, -amount AS spent
+        FROM transactions
+        WHERE amount < 0 AND transaction_date BETWEEN ? AND ?
+    """
+    args = [start, end]
+    if params.get('category'):
+        category, subcategory = params['category']
+        sql += " AND category = ?"
+        args.append(category)
+        if subcategory:
+            sql += " AND subcategory = ?"
+            args.append(subcategory)
+    if threshold is not None:
+        sql += " AND amount < ?"
+        args.append(-threshold)
+    sql += " ORDER BY transactions.amount LIMIT ?"
+    args.append(params.get('limit') or (500 if threshold is not None else 10))
+    return _fetch(sql, args), sql, args, label
+
+def _large_expenses(params, today):
+    threshold = params.get('threshold', 100.0)
+    rows, sql, args, label = _expense_list(params, today, threshold, default_days=90)
+    what = f"{params['category'][0]} expenses" if params.get('category') else "expenses"
+    count = f"{len(rows):,}" if len(rows) < args[-1] else f"The largest {len(rows):,}"
+    answer = f"{count} {what} over {_money(threshold)} ({label}), totalling {_money(sum(r[3] for r in rows))}."
+    return _result(answer, ('Date', 'Description', 'Category', 'Amount'), rows, sql, args)
+
+def _top_expenses(params, today):
+    if 'period' not in params:
+        params = dict(params, period=_period(_month_start(today), today, "this month"))
+    rows, sql, args, label = _expense_list(params, today)
+    answer = f"Your top {len(rows)} expenses ({label}) add up to {_money(sum(r[3] for r in rows))}."
+    return _result(answer, ('Date', 'Description', 'Category', 'Amount'), rows, sql, args)
+
+_BUCKET_FORMATS = {'daily': ('%Y-%m-%d', 1), 'weekly': ('%Y-W%W', 7), 'monthly': ('%Y-%m', 30.44)}
+
+def _average_revenue(params, today):
+    unit = params.get('unit', 'weekly')
+    fmt, days_per = _BUCKET_FORMATS[unit]
+    start, end, label = _range(params, today, {'daily': 30, 'weekly': 84, 'monthly': 183}[unit])
+    sql = f"""
+        SELECT strftime('{fmt}', transaction_date) AS period, SUM(amount) AS revenue
+        FROM transactions
+        WHERE category = 'Revenue' AND transaction_date BETWEEN ? AND ?
+        GROUP BY 1 ORDER BY 1
+    """
+    rows = _fetch(sql, (start, end))
+    periods = max((date.fromisoformat(end) - date.fromisoformat(start)).days + 1, 1) / days_per
+    average = sum(row[1] for row in rows) / max(periods, 1)
+    answer = f"Average {unit} revenue is {_money(average)} ({label})."
+    return _result(answer, ('Period', 'Revenue'), rows, sql, (start, end))
+
+def _revenue_total(period, today):
+    # Whole months come from the monthly rollup; partial months from the raw rows
+    span = reports.month_span(period['start'], period['end'], today)
+    if span:
+        sql, args = reports.rollup_query(*span, group_by=(), category='Revenue')
+        _, _, total, count = _fetch(sql, args)[0]
+    else:
+        sql = """
+            SELECT SUM(amount), COUNT(*) FROM transactions
+            WHERE category = 'Revenue' AND transaction_date BETWEEN ? AND ?
+        """
+        args = [period['start'], period['end']]
+        total, count = _fetch(sql, args)[0]
+    return total or 0, count or 0, sql, args
+
+def _revenue_compare(params, today):
+    rows, queries, args = [], [], []
+    for period in params['periods']:
+        total, count, sql, sql_args = _revenue_total(period, today)
+        rows.append((period['label'], total, count))
+        if sql not in queries:
+            queries.append(sql)
+        args.append(tuple(sql_args))
+    answer = ' vs '.join(f"**{label}** {_money(total)}" for label, total, _ in rows)
+    if len(rows) == 2 and rows[1][1]:
+        answer += f" ({(rows[0][1] - rows[1][1]) / abs(rows[1][1]):+.0%})"
+    return _result(answer, ('Period', 'Revenue', 'Payments'), rows, ';\n'.join(queries), args)
+
+def _roas(params, today):
+    start, end, label = _range(params, today)
+    span = reports.month_span(start, end, today)
+    if span:
+        sql, args = reports.rollup_query(*span, group_by=('category',))
+        net = {row[0]: row[3] for row in _fetch(sql, args)}
+        revenue, ad_spend = net.get('Revenue'), -(net.get('Ad Spend') or 0)
+    else:
+        sql = """
+            SELECT SUM(CASE WHEN category = 'Revenue' THEN amount ELSE 0 END) AS revenue,
+                   -SUM(CASE WHEN category = 'Ad Spend' THEN amount ELSE 0 END) AS ad_spend
+            FROM transactions
+            WHERE category IN ('Revenue', 'Ad Spend') AND transaction_date BETWEEN ? AND ?
+        """
+        args = (start, end)
+        revenue, ad_spend = _fetch(sql, args)[0]
+    revenue, ad_spend = revenue or 0, ad_spend or 0
+    if ad_spend > 0:
+        answer = f"ROAS is **{revenue / ad_spend:.2f}x** ({label}): {_money(revenue)} revenue on {_money(ad_spend)} ad spend."
+    else:
+        answer = f"No ad spend recorded ({label}); revenue was {_money(revenue)}."
+    return _result(answer, ('Revenue', 'Ad Spend'), [(revenue, ad_spend)], sql, args)
+
+def _monthly_burn(params, today):
+    # Default: the last three full months
+    current = _month_start(today)
+    default = _period(_add_months(current, -3), current - timedelta(days=1), "last 3 full months")
+    period = params.get('period') or default
+    span = reports.month_span(period['start'], period['end'], today)
+    if span:
+        sql, args = reports.rollup_query(*span, group_by=('month',))
+        rows = [(month, inflow, -outflow, -net) for month, inflow, outflow, net, _ in _fetch(sql, args)]
+    else:
+        sql = """
+            SELECT strftime('%Y-%m', transaction_date) AS month,
+                   SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) AS inflow,
+                   -SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END) AS outflow,
+                   -SUM(amount) AS net_burn
+            FROM transactions
+            WHERE transaction_date BETWEEN ? AND ?
+            GROUP BY 1 ORDER BY 1
+        """
+        args = (period['start'], period['end'])
+        rows = _fetch(sql, args)
+    burn = sum(row[3] for row in rows) / len(rows) if rows else 0.0
+    return burn, rows, sql, args, period['label']
+
+def _burn_rate(params, today):
+    burn, rows, sql, args, label = _monthly_burn(params, today)
+    if burn > 0:
+        answer = f"Net burn is {_money(burn)} a month ({label})."
+    else:
+        answer = f"Cash is growing by {_money(-burn)} a month ({label}), so there's no burn."
+    return _result(answer, ('Month', 'Inflow', 'Outflow', 'Net Burn'), rows, sql, args)
+
+def _runway(params, today):
+    burn, rows, sql, args, label = _monthly_burn(params, today)
+    cash = forecast.get_cash_on_hand()
+    if burn <= 0:
+        answer = f"At the current pace ({label}) cash isn't declining - {_money(cash)} on hand."
+    else:
+        months = cash / burn
+        answer = (f"{_money(cash)} on hand at {_money(burn)}/month net burn lasts about **{months:.1f} months** "
+                  f"(around {today + timedelta(days=int(months * 30.44)):%B %d, %Y}).")
+    projection = forecast.project_cash_flow(cash, forecast.get_cash_items(start_date=today), start_date=today)
+    if projection.first_danger:
+        answer += (f" The {config.FORECAST_DAYS}-day forecast drops below {_money(config.CASH_DANGER_THRESHOLD)}"
+                   f" on {projection.first_danger:%B %d}.")
+    return _result(answer, ('Month', 'Inflow', 'Outflow', 'Net Burn'), rows, sql, args)
+
+def _cash_projection(params, today):
+    period = params.get('period')
+    end = date.fromisoformat(period['end']) if period and period['end'] > today.isoformat() else None
+    days = (end - today).days if end else config.FORECAST_DAYS
+    projection = forecast.project_cash_flow(forecast.get_cash_on_hand(),
+                                            forecast.get_cash_items(start_date=today, days=days),
+                                            start_date=today, days=days)
+    steps = list(range(0, days, 7)) + [days - 1]
+    rows = [(projection.dates[i].astype(object).isoformat(), float(projection.balance[i]))
+            for i in sorted(set(steps))]
+    answer = (f"Cash goes from {_money(projection.start_balance)} to {_money(projection.end_balance)} "
+              f"over the next {days} days, low point {_money(projection.low_balance)} on {projection.low_date:%B %d}.")
+    return _result(answer, ('Date', 'Projected Balance'), rows)
+
+def _debt_rows(sql):
+    rows = _fetch(sql)
+    return rows, sum(row[1] for row in rows)
+
+def _credit_card_debt(params, today):
+    sql = """
+        SELECT name, current_balance, credit_limit FROM accounts
+        WHERE is_active = 1 AND account_type = 'credit_card' AND current_balance > 0
+        ORDER BY current_balance DESC
+    """
+    rows, total = _debt_rows(sql)
+    answer = f"You owe {_money(total)} across {len(rows)} credit cards."
+    return _result(answer, ('Card', 'Balance', 'Limit'), rows, sql)
+
+def _total_debt(params, today):
+    sql = """
+        SELECT name, current_balance, account_type FROM accounts
+        WHERE is_active = 1 AND current_balance > 0
+        ORDER BY current_balance DESC
+    """
+    rows, total = _debt_rows(sql)
+    answer = f"Total debt is {_money(total)} across {len(rows)} accounts."
+    return _result(answer, ('Account', 'Balance', 'Type'), rows, sql)
+
+def _debt_payments(params, today):
+    sql = """
+        SELECT name, minimum_payment, due_day FROM accounts
+        WHERE is_active = 1 AND minimum_payment > 0
+        ORDER BY minimum_payment DESC
+    """
+    rows, total = _debt_rows(sql)
+    answer = f"Minimum debt payments total {_money(total)} a month across {len(rows)} accounts."
+    return _result(answer, ('Account', 'Payment', 'Due Day'), rows, sql)
+
+def months_to_payoff(balance, payment, annual_rate=None):
+    """Whole months to pay off a balance at a fixed payment, or None if it never is."""
+    if balance <= 0:
+        return 0
+    if not payment or payment <= 0:
+        return None
+    rate = (annual_rate or 0) / 1200
+    if rate <= 0:
+        return math.ceil(balance / payment)
+    if payment <= balance * rate:
+        return None
+    return math.ceil(-math.log(1 - rate * balance / payment) / math.log(1 + rate))
+
+def _payoff_date(params, today):
+    sql = """
+        SELECT name, current_balance, minimum_payment, interest_rate, payoff_date FROM accounts
+        WHERE is_active = 1 AND current_balance > 0
+    """
+    args = []
+    if params.get('account_id'):
+        sql += " AND id = ?"
+        args.append(params['account_id'])
+    else:
+        sql += " AND account_type != 'credit_card'"
+    sql += " ORDER BY current_balance DESC"
+
+    rows, months = [], []
+    for name, balance, payment, rate, stored in _fetch(sql, args):
+        months.append(months_to_payoff(balance, payment, rate))
+        when = _add_months(today, months[-1]).isoformat() if months[-1] is not None else None
+        rows.append((name, balance, payment, rate, when, stored))
+    if len(rows) == 1:
+        name, balance, payment, _, when, stored = rows[0]
+        if when:
+            answer = f"**{name}** is paid off in {months[0]} months ({when}) at {_money(payment)}/month."
+        else:
+            answer = f"**{name}** never pays off at its current payment of {_money(payment)}."
+        if stored:
+            answer += f" The payoff date on file is {stored}."
+    else:
+        answer = f"Payoff dates for {len(rows)} loans at their current payments."
+    return _result(answer, ('Account', 'Balance', 'Payment', 'APR %', 'Projected Payoff', 'On File'), rows, sql, args)
+
+def _partner_draws(params, today):
+    period = params.get('period') or _period(date(today.year, 1, 1), today, "year to date")
+    sql = """
+        SELECT partner, SUM(amount) AS total, COUNT(*) AS draws FROM partner_draws
+        WHERE is_active = 1 AND draw_date BETWEEN ? AND ?
+    """
+    args = [period['start'], period['end']]
+    if params.get('partner'):
+        sql += " AND partner = ?"
+        args.append(params['partner'])
+    sql += " GROUP BY partner ORDER BY partner"
+    rows = _fetch(sql, args)
+    answer = '; '.join(f"**{p}** drew {_money(total)} in {n} draws" for p, total, n in rows) or "No draws"
+    answer += f" ({period['label']})."
+    return _result(answer, ('Partner', 'Total', 'Draws'), rows, sql, args)
+
+RUNNERS = {
+    'tag_spend': _tag_spend,
+    'category_spend': _category_spend,
+    'large_expenses': _large_expenses,
+    'top_expenses': _top_expenses,
+    'average_revenue': _average_revenue,
+    'revenue_compare': _revenue_compare,
+    'roas': _roas,
+    'burn_rate': _burn_rate,
+    'runway': _runway,
+    'cash_projection': _cash_projection,
+    'credit_card_debt': _credit_card_debt,
+    'total_debt': _total_debt,
+    'debt_payments': _debt_payments,
+    'payoff_date': _payoff_date,
+    'partner_draws': _partner_draws,
+}
+
+@cached('transactions', 'accounts', 'draws', 'recurring')
+def run_intent(intent, frozen_params, today):
+    """Run one intent; memoized until the data it reads changes."""
+    return RUNNERS[intent](_thaw(frozen_params), date.fromisoformat(today))
+
+def ask(question, context=None):
+    """Answer a question; returns a dict with the answer, result rows and the SQL used.
+
+    context is the previous answer's 'context' value, which lets a
+    follow-up ("and last month?") reuse the previous intent. Interpretation
+    and results are both cached, keyed on the normalized question, today's
+    date and the data version, so a repeated question costs two dict
+    lookups.
+    """
+    started = time.perf_counter()
+    normalized = normalize_question(question)
+    if not normalized:
+        return None
+    today = date.today().isoformat()
+
+    backend = 'offline'
+    parsed = interpret(normalized, today)
+    if parsed is None and context is not None:
+        parsed, backend = follow_up(normalized, today, context), 'follow-up'
+    if parsed is None:
+        parsed, backend = _interpret_with_model(normalized, today), 'anthropic'
+    if parsed is None:
+        return {
+            'question': question, 'intent': None, 'context': context, 'backend': None,
+            'answer': "I couldn't match that to a question I know how to answer. Try one of the examples.",
+            'columns': (), 'rows': (), 'sql': None, 'sql_params': (),
+            'seconds': time.perf_counter() - started,
+        }
+
+    intent, frozen = parsed
+    result = run_intent(intent, frozen, today)
+    result.update(question=question, intent=intent, context=parsed, backend=backend,
+                  seconds=time.perf_counter() - started)
+    return result
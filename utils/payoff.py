@@ -0,0 +1,163 @@
+"""
+Liquidity Engine - Debt Payoff
+Month-by-month amortization of every debt at once, for avalanche, snowball or custom payoff orders
+"""
+import calendar
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+
+import config
+from utils import database as db
+from utils.forecast import CASH_ACCOUNT_TYPES
+
+STRATEGIES = ('avalanche', 'snowball', 'custom')
+
+Debts = namedtuple('Debts', [
+    'account_ids',   # int64 (k,)
+    'names',         # tuple of str (k,)
+    'balances',      # float64 (k,)
+    'rates',         # float64 (k,): APR in percent, 0 where unknown
+    'minimums',      # float64 (k,)
+    'due_days',      # tuple of int or None (k,)
+])
+
+PayoffPlan = namedtuple('PayoffPlan', [
+    'strategy',
+    'budgets',       # float64 (b,): monthly amount put toward debt
+    'debts',         # Debts the plan was run on; columns below follow its order
+    'months',        # int64 (b, k): month each debt reaches zero, -1 if not within the horizon
+    'interest',      # float64 (b, k): interest paid per debt
+    'total_interest',# float64 (b,)
+    'debt_free',     # int64 (b,): month the last debt is paid, -1 if not within the horizon
+    'remaining',     # float64 (b, months + 1): total balance owed after each month
+    'short',         # bool (b,): budget below the minimums, which are paid anyway
+])
+
+@db.cached('accounts')
+def get_debts():
+    """Active accounts with a balance owed (everything but checking and savings)."""
+    accounts = [a for a in db.get_all_accounts()
+                if a['account_type'] not in CASH_ACCOUNT_TYPES and (a['current_balance'] or 0) > 0]
+    return Debts(
+        account_ids=np.array([a['id'] for a in accounts], dtype=np.int64),
+        names=tuple(a['name'] for a in accounts),
+        balances=np.array([a['current_balance'] for a in accounts], dtype=np.float64),
+        rates=np.array([a['interest_rate'] or 0 for a in accounts], dtype=np.float64),
+        minimums=np.array([a['minimum_payment'] or 0 for a in accounts], dtype=np.float64),
+        due_days=tuple(a['due_day'] for a in accounts),
+    )
+
+def payoff_order(debts, strategy='avalanche', order=None):
+    """Column indexes of debts in the order extra money goes to them.
+
+    avalanche: highest APR first, smaller balance breaking ties.
+    snowball: smallest balance first, higher APR breaking ties.
+    custom: the account ids in order, then any others avalanche-style.
+    """
+    avalanche = np.lexsort((debts.balances, -debts.rates))
+    if strategy == 'avalanche':
+        return avalanche
+    if strategy == 'snowball':
+        return np.lexsort((-debts.rates, debts.balances))
+    if strategy == 'custom':
+        position = {account_id: i for i, account_id in enumerate(debts.account_ids.tolist())}
+        first = [position[a] for a in dict.fromkeys(order or ()) if a in position]
+        return np.array(first + [i for i in avalanche.tolist() if i not in first], dtype=np.int64)
+    raise ValueError(f"Unknown payoff strategy: {strategy}")
+
+def simulate_payoff(budgets, strategy='avalanche', order=None, debts=None, max_months=None):
+    """Amortize every debt month by month for one or many monthly budgets.
+
+    Each month interest accrues, every debt gets its minimum payment, and
+    whatever is left of the budget pays down debts in strategy order. A
+    paid-off debt's minimum rolls into the next one. Budgets are simulated
+    side by side as rows of one matrix, so sweeping hundreds of levels
+    costs about the same as one.
+    """
+    debts = get_debts() if debts is None else debts
+    max_months = max_months or config.PAYOFF_MAX_MONTHS
+    budgets = np.atleast_1d(np.asarray(budgets, dtype=np.float64))
+    ranked = payoff_order(debts, strategy, order)
+
+    balance = np.tile(debts.balances[ranked], (len(budgets), 1))
+    rate = debts.rates[ranked] / 1200
+    minimum = debts.minimums[ranked]
+    interest = np.zeros_like(balance)
+    months = np.where(balance > 0, -1, 0)
+    remaining = np.zeros((len(budgets), max_months + 1))
+    remaining[:, 0] = balance.sum(axis=1)
+    short = budgets < np.minimum(minimum, balance[0]).sum()
+
+    for month in range(1, max_months + 1):
+        accrued = balance * rate
+        interest += accrued
+        balance += accrued
+        paid = np.minimum(minimum, balance)
+        balance -= paid
+        extra = np.maximum(budgets - paid.sum(axis=1), 0)
+        # Waterfall: each debt takes what's left after the ones ahead of it
+        ahead = np.cumsum(balance, axis=1) - balance
+        balance -= np.clip(extra[:, None] - ahead, 0, balance)
+        balance[balance < 0.005] = 0
+        months[(balance == 0) & (months < 0)] = month
+        remaining[:, month] = balance.sum(axis=1)
+        if not balance.any():
+            remaining = remaining[:, :month + 1]
+            break
+
+    unranked = np.argsort(ranked)
+    months, interest = months[:, unranked], interest[:, unranked]
+    debt_free = np.where((months < 0).any(axis=1), -1, months.max(axis=1, initial=0))
+    return PayoffPlan(
+        strategy=strategy,
+        budgets=budgets,
+        debts=debts,
+        months=months,
+        interest=interest,
+        total_interest=interest.sum(axis=1),
+        debt_free=debt_free,
+        remaining=remaining,
+        short=short,
+    )
+
+def compare_strategies(budgets, order=None, debts=None, max_months=None):
+    """PayoffPlan per strategy for the same budgets; custom only when an order is given."""
+    debts = get_debts() if debts is None else debts
+    strategies = STRATEGIES if order else STRATEGIES[:2]
+    return {s: simulate_payoff(budgets, s, order, debts, max_months) for s in strategies}
+
+def minimum_budget(debts=None):
+    """Total of the minimum payments on the debts."""
+    debts = get_debts() if debts is None else debts
+    return float(np.minimum(debts.minimums, debts.balances).sum())
+
+def payoff_date(months, due_day=None, start=None):
+    """Calendar date of the payment made `months` months after start, or None."""
+    if months is None or months < 0:
+        return None
+    start = start or date.today()
+    index = start.year * 12 + start.month - 1 + int(months)
+    year, month = divmod(index, 12)
+    last = calendar.monthrange(year, month + 1)[1]
+    return date(year, month + 1, min(due_day or start.day, last))
+
+def payoff_schedule(plan, row=0, start=None):
+    """Per-debt payoff date and interest for one budget of a plan, as dicts in payoff order."""
+    debts = plan.debts
+    schedule = []
+    for i, account_id in enumerate(debts.account_ids.tolist()):
+        months = int(plan.months[row, i])
+        schedule.append({
+            'account_id': account_id,
+            'name': debts.names[i],
+            'balance': float(debts.balances[i]),
+            'interest_rate': float(debts.rates[i]),
+            'minimum_payment': float(debts.minimums[i]),
+            'months': months if months >= 0 else None,
+            'payoff_date': payoff_date(months, debts.due_days[i], start),
+            'interest': round(float(plan.interest[row, i]), 2),
+        })
+    schedule.sort(key=lambda d: (d['months'] is None, d['months'] or 0))
+    return schedule
@@ -0,0 +1,242 @@
+"""
+Liquidity Engine - Recurring Detection
+Finds weekly, monthly and annual charges and deposits in transaction history
+"""
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+import config
+from utils.database import get_connection, invalidate
+
+# name, nominal gap in days, tolerance in days, months per cycle (None = weekly family), min occurrences
+FREQUENCIES = (
+    ('weekly', 7.0, 1.0, None, 4),
+    ('biweekly', 14.0, 2.0, None, 4),
+    ('monthly', 30.44, 4.0, 1, 3),
+    ('quarterly', 91.31, 9.0, 3, 3),
+    ('annual', 365.25, 15.0, 12, 3),
+)
+RECENT_OCCURRENCES = 6  # Expected amount is the median of the latest few
+DEBT_SERVICE_CATEGORY = 'Debt Service'  # Already forecast from each account's minimum payment
+
+_NAMES = np.array([f[0] for f in FREQUENCIES])
+_NOMINAL = np.array([f[1] for f in FREQUENCIES])
+_TOLERANCE = np.array([f[2] for f in FREQUENCIES])
+_MONTHS = np.array([f[3] or 0 for f in FREQUENCIES])
+_MIN_COUNT = np.array([f[4] for f in FREQUENCIES])
+
+_HISTORY_QUERY = """
+    SELECT account_id, UPPER(COALESCE(merchant_name, clean_description, description)),
+           CAST(julianday(transaction_date) - 2440587.5 AS INTEGER), amount,
+           COALESCE(merchant_name, clean_description, description), bucket, category
+    FROM transactions
+    WHERE transaction_date >= ? AND amount != 0 AND COALESCE(category, '') != ?
+"""
+
+def _group_median(values, groups, n_groups):
+    """Median of values within each group (NaN for empty groups)."""
+    order = np.lexsort((values, groups))
+    values, groups = values[order], groups[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    low = starts + np.maximum(counts - 1, 0) // 2
+    high = starts + counts // 2
+    median = np.full(n_groups, np.nan)
+    has = counts > 0
+    median[has] = (values[low[has]] + values[np.minimum(high[has], len(values) - 1)]) / 2
+    return median
+
+def detect_recurring(since=None, today=None, max_cv=None, min_regularity=None):
+    """Recurring series in the transaction history, as dicts ready for recurring_transactions.
+
+    Transactions are grouped by account, normalized merchant and direction.
+    A series recurs when the median gap between its dates matches a
+    frequency, most gaps agree with it, the amounts are stable, and it has
+    not gone quiet. History is sorted once into series and every test is
+    a vectorized pass over the sorted arrays - no pairwise comparison of
+    transactions.
+    """
+    today = today or date.today()
+    since = since or today - timedelta(days=config.RECURRING_LOOKBACK_DAYS)
+    max_cv = config.RECURRING_AMOUNT_CV if max_cv is None else max_cv
+    min_regularity = config.RECURRING_MIN_REGULARITY if min_regularity is None else min_regularity
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(_HISTORY_QUERY, (since.isoformat(), DEBT_SERVICE_CATEGORY))
+        rows = cursor.fetchall()
+    if not rows:
+        return []
+
+    account = np.fromiter((r[0] for r in rows), np.int64, len(rows))
+    _, merchant = np.unique(np.array([r[1] for r in rows], dtype=object), return_inverse=True)
+    day = np.fromiter((r[2] for r in rows), np.int64, len(rows))
+    signed = np.fromiter((r[3] for r in rows), np.float64, len(rows))
+
+    # Sort into series (account, merchant, direction) by date; every later
+    # pass is a flat scan over the sorted arrays
+    order = np.lexsort((day, signed > 0, merchant, account))
+    account, merchant, day, signed = account[order], merchant[order], day[order], signed[order]
+    boundary = np.r_[True, (account[1:] != account[:-1]) | (merchant[1:] != merchant[:-1])
+                     | ((signed[1:] > 0) != (signed[:-1] > 0))]
+    series = np.cumsum(boundary) - 1
+    amount = np.abs(signed)
+
+    # Several charges from one merchant on one day count as one occurrence
+    first = np.r_[True, (series[1:] != series[:-1]) | (day[1:] != day[:-1])]
+    rows_kept = order[first]
+    series, day, amount = series[first], day[first], amount[first]
+    n = int(series[-1]) + 1
+    counts = np.bincount(series, minlength=n)
+    ends = np.cumsum(counts) - 1
+    last_day = day[ends]
+
+    # Gaps between consecutive occurrences within a series
+    same = series[1:] == series[:-1]
+    gaps = (day[1:] - day[:-1])[same].astype(np.float64)
+    gap_series = series[1:][same]
+    median_gap = _group_median(gaps, gap_series, n)
+
+    # Frequency whose nominal gap is nearest the median, within tolerance
+    distance = np.nan_to_num(np.abs(median_gap[:, None] - _NOMINAL[None, :]) / _TOLERANCE[None, :], nan=np.inf)
+    nearest = np.argmin(distance, axis=1)
+    frequency = np.where(distance[np.arange(n), nearest] <= 1, nearest, -1)
+    gap_frequency = frequency[gap_series]
+    fits = (gap_frequency >= 0) & (np.abs(gaps - _NOMINAL[gap_frequency]) <= _TOLERANCE[gap_frequency])
+    regularity = np.bincount(gap_series, weights=fits, minlength=n) / np.maximum(counts - 1, 1)
+
+    # Amount stability, and the typical amount from the latest occurrences
+    total = np.bincount(series, weights=amount, minlength=n)
+    squares = np.bincount(series, weights=amount * amount, minlength=n)
+    mean = total / np.maximum(counts, 1)
+    cv = np.sqrt(np.maximum(squares / np.maximum(counts, 1) - mean * mean, 0)) / np.maximum(mean, 0.01)
+    recent = (ends[series] - np.arange(len(series))) < RECENT_OCCURRENCES
+    expected = _group_median(amount[recent], series[recent], n)
+
+    # Day of month as the median and day of week as the most common over the
+    # series, so a payment shifted around a weekend doesn't move them
+    dates = day.astype('datetime64[D]')
+    month_day = (dates - dates.astype('datetime64[M]').astype('datetime64[D]')).astype(np.int64) + 1
+    day_of_month = np.rint(_group_median(month_day.astype(np.float64), series, n))
+    weekday = (day + 3) % 7  # Monday = 0; 1970-01-01 was a Thursday
+    day_of_week = np.bincount(series * 7 + weekday, minlength=n * 7).reshape(n, 7).argmax(axis=1)
+
+    f = np.maximum(frequency, 0)
+    recurring = (
+        (frequency >= 0)
+        & (counts >= _MIN_COUNT[f])
+        & (regularity >= min_regularity)
+        & (cv <= max_cv)
+        & (np.datetime64(today, 'D').astype(np.int64) - last_day <= _NOMINAL[f] * 1.5 + _TOLERANCE[f])
+    )
+
+    detected = []
+    for s in np.flatnonzero(recurring).tolist():
+        row = rows[rows_kept[ends[s]]]  # the latest occurrence carries the current name and category
+        last = np.datetime64(int(last_day[s]), 'D').astype(object)
+        name, months = _NAMES[f[s]], int(_MONTHS[f[s]])
+        if months:
+            dom, dow = int(day_of_month[s]), None
+            step = lambda day: _month_day(day, months, dom)
+        else:
+            dom, dow = None, int(day_of_week[s])
+            step = lambda day: day + timedelta(days=int(_NOMINAL[f[s]]))
+        next_expected = step(last)
+        while next_expected < today:  # a late or skipped occurrence rolls to the next cycle
+            next_expected = step(next_expected)
+        detected.append({
+            'account_id': row[0],
+            'merchant_key': row[1],
+            'description': row[4],
+            'bucket': row[5],
+            'category': row[6],
+            'is_income': row[3] > 0,
+            'frequency': str(name),
+            'day_of_month': dom,
+            'day_of_week': dow,
+            'expected_amount': round(float(expected[s]), 2),
+            'last_occurrence': last.isoformat(),
+            'next_expected': next_expected.isoformat(),
+            'occurrences': int(counts[s]),
+            'confidence': round(float(regularity[s]), 3),
+        })
+    detected.sort(key=lambda d: -d['expected_amount'])
+    return detected
+
+def _month_day(day, months, day_of_month):
+    """day moved ahead by whole months, landing on day_of_month (or the month's last day)."""
+    month = np.datetime64(day, 'M') + months
+    length = int(((month + 1).astype('datetime64[D]') - month.astype('datetime64[D]')).astype(np.int64))
+    return (month.astype('datetime64[D]') + min(day_of_month, length) - 1).astype(object)
+
+def sync_recurring(detected=None):
+    """Write detected series into recurring_transactions.
+
+    New series are added with source 'detected'; ones already on file are
+    refreshed with the latest amount and dates. Detected items that no
+    longer recur are deactivated. Series the user entered by hand or
+    removed after detection are left alone.
+    """
+    started = time.perf_counter()
+    detected = detect_recurring() if detected is None else detected
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, account_id, UPPER(COALESCE(merchant_key, description)) AS merchant_key,
+                   is_income, source, is_active
+            FROM recurring_transactions
+        """)
+        on_file = {}
+        manual = set()
+        for r in cursor.fetchall():
+            key = (r['merchant_key'], bool(r['is_income']))
+            if r['source'] in ('detected', 'dismissed'):
+                on_file[(r['account_id'],) + key] = r
+            else:
+                manual.add(key)
+
+        inserts, updates, seen = [], [], set()
+        for d in detected:
+            key = (d['merchant_key'], d['is_income'])
+            if key in manual:
+                continue
+            values = (d['description'], d['expected_amount'], d['frequency'], d['day_of_month'],
+                      d['day_of_week'], d['bucket'], d['category'], d['last_occurrence'],
+                      d['next_expected'], d['confidence'])
+            existing = on_file.get((d['account_id'],) + key)
+            if existing is None:
+                inserts.append(values + (d['account_id'], d['merchant_key'], d['is_income']))
+            elif existing['source'] == 'detected':
+                seen.add(existing['id'])
+                updates.append(values + (existing['id'],))
+        retired = [(r['id'],) for r in on_file.values()
+                   if r['source'] == 'detected' and r['is_active'] and r['id'] not in seen]
+
+        cursor.executemany("""
+            INSERT INTO recurring_transactions (description, expected_amount, frequency, day_of_month,
+                                                day_of_week, bucket, category, last_occurrence,
+                                                next_expected, confidence, account_id, merchant_key,
+                                                is_income, source, is_active)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'detected', 1)
+        """, inserts)
+        cursor.executemany("""
+            UPDATE recurring_transactions
+            SET description = ?, expected_amount = ?, frequency = ?, day_of_month = ?, day_of_week = ?,
+                bucket = ?, category = ?, last_occurrence = ?, next_expected = ?, confidence = ?, is_active = 1
+            WHERE id = ?
+        """, updates)
+        cursor.executemany("UPDATE recurring_transactions SET is_active = 0 WHERE id = ?", retired)
+        conn.commit()
+        if inserts or updates or retired:
+            invalidate('recurring')
+
+    return {
+        'detected': len(detected),
+        'added': len(inserts),
+        'updated': len(updates),
+        'retired': len(retired),
+        'seconds': time.perf_counter() - started,
+    }
@@ -0,0 +1,145 @@
+"""
+Liquidity Engine - Bucket Reporting
+Period totals and comparisons answered from the monthly transaction rollup
+"""
+import calendar
+import re
+from datetime import date
+
+from utils.database import cached, get_connection, invalidate
+from utils.migrations import ROLLUP_REBUILD_SQL
+
+# Columns a report can be grouped or filtered by
+DIMENSIONS = ('month', 'account_id', 'bucket', 'category', 'tag')
+
+def month_span(start, end, today=None):
+    """(first_month, last_month) if start..end (ISO dates) covers whole months, else None.
+
+    A range running through today counts as covering the current month.
+    """
+    today = (today or date.today()).isoformat()
+    start, end = str(start)[:10], str(end)[:10]
+    if start[8:] != '01':
+        return None
+    last_day = calendar.monthrange(int(end[:4]), int(end[5:7]))[1]
+    if int(end[8:]) != last_day and not (end >= today and end[:7] == today[:7]):
+        return None
+    return start[:7], end[:7]
+
+def period_months(period, today=None):
+    """(first_month, last_month) for a period, both 'YYYY-MM'.
+
+    Accepts 'YYYY-MM', 'YYYY-Qn', 'YYYY', 'this-month', 'last-month',
+    'this-quarter', 'last-quarter', 'this-year', 'last-year', or a
+    (first, last) tuple of months.
+    """
+    today = today or date.today()
+    if isinstance(period, tuple):
+        return period
+    period = period.strip().lower()
+    if re.fullmatch(r"\d{4}-\d{2}", period):
+        return period, period
+    m = re.fullmatch(r"(\d{4})-?q([1-4])", period)
+    if m:
+        year, quarter = int(m.group(1)), int(m.group(2))
+        return f"{year:04d}-{3 * quarter - 2:02d}", f"{year:04d}-{3 * quarter:02d}"
+    if re.fullmatch(r"\d{4}", period):
+        return f"{period}-01", f"{period}-12"
+
+    index = today.year * 12 + today.month - 1  # months since year 0
+    def month_at(i):
+        return f"{i // 12:04d}-{i % 12 + 1:02d}"
+    relative = {
+        'this-month': (index, index),
+        'last-month': (index - 1, index - 1),
+        'this-quarter': (index - index % 3, index - index % 3 + 2),
+        'last-quarter': (index - index % 3 - 3, index - index % 3 - 1),
+        'this-year': (index - index % 12, index - index % 12 + 11),
+        'last-year': (index - index % 12 - 12, index - index % 12 - 1),
+    }
+    if period in relative:
+        first, last = relative[period]
+        return month_at(first), month_at(last)
+    raise ValueError(f"Unrecognized period: {period!r}")
+
+def rollup_query(first_month, last_month, group_by=('bucket',), **filters):
+    """SQL and parameters for totals over a month range, grouped by rollup dimensions.
+
+    filters: account_id, bucket, category, tag (None = any); use '' to
+    select transactions missing that dimension.
+    """
+    for column in list(group_by) + list(filters):
+        if column not in DIMENSIONS:
+            raise ValueError(f"Unknown rollup dimension: {column}")
+    columns = [c if c in ('month', 'account_id') else f"NULLIF({c}, '') AS {c}" for c in group_by] + [
+        "ROUND(SUM(inflow), 2) AS inflow",
+        "ROUND(SUM(outflow), 2) AS outflow",
+        "ROUND(SUM(inflow + outflow), 2) AS net",
+        "SUM(count) AS count",
+    ]
+    sql = f"SELECT {', '.join(columns)} FROM transaction_rollup WHERE month BETWEEN ? AND ?"
+    params = [first_month, last_month]
+    for column, value in filters.items():
+        if value is not None:
+            sql += f" AND {column} = ?"
+            params.append(value)
+    if group_by:
+        positions = ', '.join(str(i + 1) for i in range(len(group_by)))
+        sql += f" GROUP BY {positions} ORDER BY {positions}"
+    return sql, params
+
+@cached('transactions')
+def _rollup(first_month, last_month, group_by, filters):
+    sql, params = rollup_query(first_month, last_month, group_by, **dict(filters))
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        return [dict(row) for row in cursor.fetchall()]
+
+def get_rollup(period, group_by=('bucket',), **filters):
+    """Inflow, outflow, net and count per group over a period, from the rollup."""
+    # Resolved before the cache so 'last-month' moves on when the month does
+    first, last = period_months(period)
+    return _rollup(first, last, tuple(group_by), tuple(sorted(filters.items())))
+
+def get_monthly_series(period, **filters):
+    """One row per month in the period with inflow, outflow, net and count."""
+    return get_rollup(period, group_by=('month',), **filters)
+
+def compare_periods(current, previous, group_by=('bucket',), measure='net', **filters):
+    """Side-by-side totals for two periods, e.g. compare_periods('2025-Q4', '2025-Q3').
+
+    Returns one dict per group with current, previous, change and
+    change_pct (None when the previous value is zero), largest first.
+    """
+    key = lambda row: tuple(row[c] for c in group_by)
+    now = {key(row): row[measure] or 0 for row in get_rollup(current, tuple(group_by), **filters)}
+    before = {key(row): row[measure] or 0 for row in get_rollup(previous, tuple(group_by), **filters)}
+    rows = []
+    for group in set(now) | set(before):
+        a, b = now.get(group, 0), before.get(group, 0)
+        row = dict(zip(group_by, group))
+        row.update(current=a, previous=b, change=round(a - b, 2),
+                   change_pct=(a - b) / abs(b) if b else None)
+        rows.append(row)
+    rows.sort(key=lambda row: -max(abs(row['current']), abs(row['previous'])))
+    return rows
+
+def rebuild_rollup():
+    """Recompute the rollup from transactions; returns the number of rollup rows.
+
+    The triggers keep it current on their own - this is for repairs after
+    writes that bypassed them.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        try:
+            for statement in ROLLUP_REBUILD_SQL:
+                cursor.execute(statement)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        invalidate('transactions')
+        return cursor.execute("SELECT COUNT(*) FROM transaction_rollup").fetchone()[0]
@@ -0,0 +1,234 @@
+"""
+Liquidity Engine - Rule Learning
+Proposes auto_rules from the categorizations made by hand
+"""
+import re
+import time
+from collections import Counter, defaultdict
+
+import config
+from utils.categorizer import get_matcher
+from utils.database import cached, get_connection, invalidate
+from utils.merchants import US_STATES
+
+LEARNED_RULE_PRIORITY = 90  # After the seeded rules, ahead of rules added with the default 100
+
+# Words too generic to categorize anything on their own
+STOPWORDS = {
+    'THE', 'AND', 'FOR', 'INC', 'LLC', 'LTD', 'CORP', 'COM', 'WWW', 'PAYMENT', 'PURCHASE',
+    'ONLINE', 'DEBIT', 'CREDIT', 'CARD', 'TRANSFER', 'ACH', 'POS', 'BILL', 'PMT', 'FEE',
+}
+_WORD = re.compile(r"^[A-Z][A-Z&'-]{2,}$")
+
+def features(text, merchant_name=None):
+    """Candidate rule patterns for one transaction.
+
+    The canonical merchant, each meaningful word of the clean description and
+    each pair of adjacent meaningful words. Every feature is a substring of
+    the clean description, so it can be used as-is as a 'contains' pattern.
+    """
+    found = set()
+    if merchant_name:
+        merchant = merchant_name.upper()
+        if merchant in (text or '').upper():
+            found.add(merchant)
+    previous = None
+    for word in (text or '').upper().split():
+        if not _WORD.match(word) or word in STOPWORDS or word in US_STATES:
+            previous = None
+            continue
+        found.add(word)
+        if previous:
+            found.add(f"{previous} {word}")
+        previous = word
+    return found
+
+def _confidence(best, total):
+    # Rule of succession: 3 out of 3 agreeing scores 0.8, 30 out of 30 scores 0.97
+    return (best + 1) / (total + 2)
+
+def _sub_phrases(feature):
+    words = feature.split()
+    return {' '.join(words[i:j]) for i in range(len(words)) for j in range(i + 1, len(words) + 1)} - {feature}
+
+def learn_rules(batch_size=10000, min_support=None, min_confidence=None, progress=None):
+    """Fold new manual categorizations into the feature counts and refresh proposals.
+
+    Reads only the label events logged since the last run (triggers log a +1
+    for each manual categorization and a -1 when one is changed or undone),
+    updates the per-feature label counts, and re-scores just the features
+    those events touched. A feature becomes a proposed rule when enough
+    transactions carry it and nearly all of them share one category;
+    proposals that stop qualifying are withdrawn. progress, if given, is
+    called with the events read so far after each batch; an exception it
+    raises leaves the log and counts untouched.
+    """
+    started = time.perf_counter()
+    min_support = config.RULE_MIN_SUPPORT if min_support is None else min_support
+    min_confidence = config.RULE_MIN_CONFIDENCE if min_confidence is None else min_confidence
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(id) FROM rule_learning_log")
+        last_id = cursor.fetchone()[0]
+        if last_id is None:
+            return {'processed': 0, 'features': 0, 'proposed': 0, 'updated': 0, 'withdrawn': 0,
+                    'seconds': time.perf_counter() - started}
+
+        deltas = Counter()
+        processed = 0
+        reader = conn.cursor()
+        reader.row_factory = None
+        reader.execute("""
+            SELECT text, merchant_name, bucket, category, COALESCE(subcategory, ''), weight
+            FROM rule_learning_log WHERE id <= ?
+        """, (last_id,))
+        while True:
+            rows = reader.fetchmany(batch_size)
+            if not rows:
+                break
+            processed += len(rows)
+            for text, merchant_name, bucket, category, subcategory, weight in rows:
+                label = (bucket, category, subcategory)
+                for feature in features(text, merchant_name):
+                    deltas[feature, label] += weight
+            if progress:
+                progress(processed)
+
+        deltas = {key: n for key, n in deltas.items() if n}
+        labels = {label for _, label in deltas}
+        cursor.executemany(
+            "INSERT OR IGNORE INTO rule_labels (bucket, category, subcategory) VALUES (?, ?, ?)", labels)
+        cursor.execute("SELECT id, bucket, category, subcategory FROM rule_labels")
+        label_ids = {(r['bucket'], r['category'], r['subcategory']): r['id'] for r in cursor.fetchall()}
+        label_by_id = {label_id: label for label, label_id in label_ids.items()}
+
+        cursor.executemany("""
+            INSERT INTO rule_feature_counts (feature, label_id, count) VALUES (?, ?, ?)
+            ON CONFLICT (feature, label_id) DO UPDATE SET count = count + excluded.count
+        """, [(feature, label_ids[label], n) for (feature, label), n in deltas.items()])
+        cursor.execute("DELETE FROM rule_feature_counts WHERE count <= 0")
+        cursor.execute("DELETE FROM rule_learning_log WHERE id <= ?", (last_id,))
+
+        # Re-score only the features this batch touched
+        touched = {feature for feature, _ in deltas}
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS _touched_features (feature TEXT PRIMARY KEY)")
+        cursor.execute("DELETE FROM _touched_features")
+        cursor.executemany("INSERT INTO _touched_features VALUES (?)", ((f,) for f in touched))
+        cursor.execute("""
+            SELECT c.feature, c.label_id, c.count FROM rule_feature_counts c
+            WHERE c.feature IN (SELECT feature FROM _touched_features)
+        """)
+        counts = defaultdict(dict)
+        for feature, label_id, count in cursor.fetchall():
+            counts[feature][label_id] = count
+
+        candidates = {}
+        for feature, by_label in counts.items():
+            label_id, best = max(by_label.items(), key=lambda item: item[1])
+            confidence = _confidence(best, sum(by_label.values()))
+            if best >= min_support and confidence >= min_confidence:
+                candidates[feature] = (label_by_id[label_id], confidence, best)
+
+        # Among candidates for the same category, a phrase inside a longer one
+        # wins only if it has more support ("AMAZON" over "AMAZON MKTP" and
+        # "AMAZON PRIME"); with the same support the specific phrase is kept
+        # ("HOME DEPOT", not "HOME")
+        dominated = set()
+        for feature, (label, _, support) in candidates.items():
+            for phrase in _sub_phrases(feature):
+                other = candidates.get(phrase)
+                if other is None or other[0] != label:
+                    continue
+                dominated.add(phrase if other[2] <= support else feature)
+        for feature in dominated:
+            del candidates[feature]
+
+        cursor.execute("SELECT id, match_pattern, bucket, category, subcategory, source FROM auto_rules")
+        existing = {}
+        covered = {}  # pattern -> label of rules a new proposal would only duplicate
+        for rule in cursor.fetchall():
+            existing.setdefault(rule['match_pattern'], rule)
+            if rule['source'] != 'rejected':
+                covered[rule['match_pattern']] = (rule['bucket'], rule['category'], rule['subcategory'] or '')
+
+        matcher = get_matcher()
+        inserts, updates, withdrawals = [], [], []
+        for feature in sorted(touched):
+            rule = existing.get(feature)
+            if feature not in candidates:
+                if rule is not None and rule['source'] == 'proposed':
+                    withdrawals.append((rule['id'],))
+                continue
+            label, confidence, support = candidates[feature]
+            bucket, category, subcategory = label
+            if rule is not None:
+                if rule['source'] == 'proposed':
+                    updates.append((bucket, category, subcategory or None, confidence, support, rule['id']))
+                continue
+            if any(covered.get(phrase) == label for phrase in _sub_phrases(feature)):
+                continue
+            active = matcher.match(feature)
+            if active is not None and (active['bucket'], active['category'], active['subcategory'] or '') == label:
+                continue
+            inserts.append((feature, bucket, category, subcategory or None, LEARNED_RULE_PRIORITY, confidence, support))
+
+        cursor.executemany("""
+            INSERT INTO auto_rules (match_pattern, match_type, bucket, category, subcategory,
+                                    priority, is_active, source, confidence, support)
+            VALUES (?, 'contains', ?, ?, ?, ?, 0, 'proposed', ?, ?)
+        """, inserts)
+        cursor.executemany("""
+            UPDATE auto_rules SET bucket = ?, category = ?, subcategory = ?, confidence = ?, support = ?
+            WHERE id = ?
+        """, updates)
+        cursor.executemany("DELETE FROM auto_rules WHERE id = ?", withdrawals)
+        conn.commit()
+        if inserts or updates or withdrawals:
+            invalidate('rules')
+
+    return {
+        'processed': processed,
+        'features': len(touched),
+        'proposed': len(inserts),
+        'updated': len(updates),
+        'withdrawn': len(withdrawals),
+        'seconds': time.perf_counter() - started,
+    }
+
+@cached('rules')
+def get_rule_proposals(limit=None):
+    """Proposed rules awaiting review, most confident first."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        query = """
+            SELECT * FROM auto_rules WHERE source = 'proposed'
+            ORDER BY confidence DESC, support DESC, id
+        """
+        params = []
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+def accept_proposal(rule_id):
+    """Activate a proposed rule; returns True if it was still pending."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE auto_rules SET is_active = 1, source = 'learned'
+            WHERE id = ? AND source = 'proposed'
+        """, (rule_id,))
+        conn.commit()
+        invalidate('rules')
+        return cursor.rowcount > 0
+
+def reject_proposal(rule_id):
+    """Dismiss a proposed rule. It stays on file so the pattern isn't proposed again."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE auto_rules SET source = 'rejected' WHERE id = ? AND source = 'proposed'", (rule_id,))
+        conn.commit()
+        invalidate('rules')
+        return cursor.rowcount > 0
@@ -0,0 +1,169 @@
+"""
+Liquidity Engine - What-If Scenarios
+Monte Carlo cash-flow simulation on top of the forecast engine
+"""
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+
+import config
+from utils import database as db
+from utils import forecast
+from utils.recurring import DEBT_SERVICE_CATEGORY
+
+# Used when history is too thin to estimate variance
+DEFAULT_VARIANCE = {
+    'revenue_cv': 0.15,         # std / mean of monthly revenue
+    'revenue_delay_sd': 3.0,    # days a payment lands early/late
+    'expense_cv': 0.05,
+}
+
+ScenarioResult = namedtuple('ScenarioResult', [
+    'dates',
+    'p5', 'p50', 'p95',         # balance bands per day
+    'breach_prob',              # P(balance < danger) on each day
+    'cum_breach_prob',          # P(balance has dipped below danger by each day)
+    'paths',
+    'seconds',
+])
+
+REVENUE_CATEGORY = 'Revenue'  # Only inflows categorized as this count as revenue
+
+# Cash-account history only: a card payment or transfer between accounts
+# isn't revenue, and debt service is forecast as fixed account payments
+_VARIANCE_SCOPE = f"""
+    FROM transactions t
+    JOIN accounts a ON a.id = t.account_id
+    WHERE t.transaction_date >= ?
+      AND a.account_type IN ({', '.join(repr(t) for t in forecast.CASH_ACCOUNT_TYPES)})
+"""
+
+@db.cached('transactions', 'accounts')
+def estimate_variance(months=12, min_samples=3):
+    """Revenue amount/timing and expense variance from transaction history.
+
+    - revenue_cv / expense_cv: variation of monthly revenue / spending totals
+      on cash accounts; revenue is what is categorized as Revenue
+    - revenue_delay_sd: spread of each payer's day-of-month, pooled by median
+    Falls back to DEFAULT_VARIANCE for anything with too few samples.
+    """
+    since = (date.today() - timedelta(days=int(months * 30.5))).isoformat()
+    estimate = dict(DEFAULT_VARIANCE)
+    with db.get_connection() as conn:
+        monthly = conn.execute(f"""
+            SELECT strftime('%Y-%m', t.transaction_date) AS month,
+                   SUM(CASE WHEN t.amount > 0 AND t.category = ? THEN t.amount ELSE 0 END) AS inflow,
+                   SUM(CASE WHEN t.amount < 0 AND COALESCE(t.category, '') != ? THEN -t.amount ELSE 0 END) AS outflow
+            {_VARIANCE_SCOPE}
+            GROUP BY month
+        """, (REVENUE_CATEGORY, DEBT_SERVICE_CATEGORY, since)).fetchall()
+        credits = conn.execute(f"""
+            SELECT COALESCE(t.clean_description, t.description), CAST(strftime('%d', t.transaction_date) AS INTEGER)
+            {_VARIANCE_SCOPE}
+              AND t.amount > 0 AND t.category = ?
+        """, (since, REVENUE_CATEGORY)).fetchall()
+
+    if len(monthly) >= min_samples:
+        inflow = np.array([r['inflow'] for r in monthly], dtype=float)
+        outflow = np.array([r['outflow'] for r in monthly], dtype=float)
+        if inflow.mean() > 0:
+            estimate['revenue_cv'] = float(inflow.std() / inflow.mean())
+        if outflow.mean() > 0:
+            estimate['expense_cv'] = float(outflow.std() / outflow.mean())
+
+    if credits:
+        names, days = zip(*credits)
+        _, group = np.unique(np.array(names, dtype=object), return_inverse=True)
+        days = np.array(days, dtype=float)
+        counts = np.bincount(group)
+        sums = np.bincount(group, weights=days)
+        sq = np.bincount(group, weights=days * days)
+        regular = counts >= min_samples
+        if regular.any():
+            mean = sums[regular] / counts[regular]
+            sd = np.sqrt(np.maximum(sq[regular] / counts[regular] - mean * mean, 0))
+            estimate['revenue_delay_sd'] = float(np.median(sd))
+    return estimate
+
+def _simulate_chunk(args):
+    """Simulate a block of paths; returns the (paths x days) balance matrix."""
+    (seed, paths, days, start_balance, fixed_flows, in_day, in_amount, out_day, out_amount,
+     revenue_cv, revenue_delay_sd, revenue_delay_mean, expense_cv) = args
+    rng = np.random.default_rng(seed)
+    flows = np.broadcast_to(fixed_flows, (paths, days)).copy()
+    rows = np.arange(paths)[:, None] * days
+
+    if len(in_day):
+        # Each revenue event may land late/early and come in above/below plan
+        delay = np.rint(rng.normal(revenue_delay_mean, revenue_delay_sd, (paths, len(in_day)))).astype(np.int64)
+        land = in_day[None, :] + np.maximum(delay, -in_day[None, :])
+        amount = in_amount[None, :] * np.maximum(rng.normal(1.0, revenue_cv, (paths, len(in_day))), 0)
+        inside = land < days  # revenue slipping past the horizon is lost to this window
+        flows += np.bincount((rows + land)[inside], weights=amount[inside],
+                             minlength=paths * days).reshape(paths, days)
+
+    if len(out_day):
+        amount = out_amount[None, :] * np.maximum(rng.normal(1.0, expense_cv, (paths, len(out_day))), 0)
+        flows += np.bincount((rows + out_day[None, :]).ravel(), weights=amount.ravel(),
+                             minlength=paths * days).reshape(paths, days)
+
+    return start_balance + np.cumsum(flows, axis=1, dtype=np.float64).astype(np.float32)
+
+def simulate(start_balance, items=None, days=None, paths=None, start_date=None,
+             revenue_scale=1.0, expense_scale=1.0, revenue_delay_days=0.0,
+             variance=None, danger=None, seed=None, workers=None):
+    """Run a Monte Carlo what-if over the recurring items and account payments.
+
+    Revenue events get random timing and amount noise, variable expenses get
+    amount noise, and account minimum payments are fixed: expense_scale
+    scales the recurring expenses only. All paths are one
+    NumPy matrix; pass workers > 1 to split very large runs across processes.
+    """
+    started = time.perf_counter()
+    days = days or config.FORECAST_DAYS
+    start_date = start_date or date.today()
+    items = forecast.get_cash_items(start_date, days) if items is None else items
+    paths = paths or config.SCENARIO_PATHS
+    danger = config.CASH_DANGER_THRESHOLD if danger is None else danger
+    variance = {**DEFAULT_VARIANCE, **(variance or {})}
+
+    dates, hits = forecast.occurrence_matrix(items, start_date, days)
+    item_idx, day_idx = np.nonzero(hits)
+    amounts = items.amounts[item_idx]
+    # Recurring items carry variance; account payments are contractual and fixed
+    variable = ~items.fixed[item_idx]
+    income = variable & (amounts > 0)
+    expense = variable & (amounts < 0)
+
+    fixed_flows = np.bincount(day_idx[~variable], weights=amounts[~variable], minlength=days)
+    common = (
+        days, float(start_balance), fixed_flows,
+        day_idx[income], amounts[income] * revenue_scale,
+        day_idx[expense], amounts[expense] * expense_scale,
+        variance['revenue_cv'], variance['revenue_delay_sd'], revenue_delay_days, variance['expense_cv'],
+    )
+
+    seeds = np.random.SeedSequence(seed)
+    workers = workers or 1
+    if workers > 1 and paths >= 2 * config.SCENARIO_CHUNK_PATHS:
+        sizes = [len(c) for c in np.array_split(np.arange(paths), max(workers, paths // config.SCENARIO_CHUNK_PATHS))]
+        jobs = [(s, n) + common for s, n in zip(seeds.spawn(len(sizes)), sizes)]
+        with ProcessPoolExecutor(max_workers=min(workers, os.cpu_count() or 1)) as pool:
+            balances = np.concatenate(list(pool.map(_simulate_chunk, jobs)))
+    else:
+        balances = _simulate_chunk((seeds, paths) + common)
+
+    below = balances < danger
+    p5, p50, p95 = np.percentile(balances, [5, 50, 95], axis=0)
+    return ScenarioResult(
+        dates=dates,
+        p5=p5, p50=p50, p95=p95,
+        breach_prob=below.mean(axis=0),
+        cum_breach_prob=np.logical_or.accumulate(below, axis=1).mean(axis=0),
+        paths=paths,
+        seconds=time.perf_counter() - started,
+    )
@@ -0,0 +1,86 @@
+"""
+Liquidity Engine - Triage Queue
+Uncategorized transactions grouped by clean description, so one decision
+categorizes every matching line
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from utils.database import get_connection, invalidate
+
+# Same expression as idx_transactions_triage; queries must match it exactly
+# (and the index's WHERE clause) for SQLite to use the partial index
+GROUP_KEY = "COALESCE(clean_description, description)"
+PENDING = "is_categorized = 0 AND is_reviewed = 0"
+
+_prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="triage-prefetch")
+
+def queue_page_query(after=None, limit=None):
+    """SQL and parameters for get_queue_page."""
+    limit = limit or config.TRIAGE_BATCH_SIZE
+    query = f"""
+        SELECT {GROUP_KEY} AS group_key,
+               COUNT(*) AS count,
+               SUM(amount) AS total,
+               MIN(transaction_date) AS first_date,
+               MAX(transaction_date) AS last_date,
+               MAX(merchant_name) AS merchant_name,
+               MIN(description) AS sample
+        FROM transactions
+        WHERE {PENDING}
+    """
+    params = []
+    if after is not None:
+        query += f" AND {GROUP_KEY} > ?"
+        params.append(after)
+    query += f" GROUP BY {GROUP_KEY} ORDER BY {GROUP_KEY} LIMIT ?"
+    params.append(limit)
+    return query, params
+
+def get_queue_page(after=None, limit=None):
+    """Next groups of transactions awaiting triage, in key order.
+
+    Keyset-paged on the group key: pass the last key of the previous page as
+    `after`. Each group carries its row count, total, date range and a
+    sample raw description.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(*queue_page_query(after, limit))
+        return [dict(row) for row in cursor.fetchall()]
+
+def prefetch_queue_page(after=None, limit=None):
+    """Fetch the next queue page in the background; returns a Future."""
+    return _prefetcher.submit(get_queue_page, after, limit)
+
+def get_queue_size():
+    """(groups, transactions) still awaiting triage."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(DISTINCT {GROUP_KEY}), COUNT(*) FROM transactions WHERE {PENDING}")
+        groups, rows = cursor.fetchone()
+        return groups, rows
+
+def categorize_group(group_key, bucket, category=None, subcategory=None, tag=None):
+    """Categorize every pending transaction in a group with one UPDATE; returns rows changed."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            UPDATE transactions
+            SET bucket = ?, category = ?, subcategory = ?, tag = ?,
+                is_categorized = 1, is_reviewed = 1, auto_categorized = 0
+            WHERE {PENDING} AND {GROUP_KEY} = ?
+        """, (bucket, category, subcategory, tag, group_key))
+        conn.commit()
+        invalidate('transactions')
+        return cursor.rowcount
+
+def skip_group(group_key):
+    """Mark a group reviewed without categorizing it, taking it out of the queue."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"UPDATE transactions SET is_reviewed = 1 WHERE {PENDING} AND {GROUP_KEY} = ?",
+                       (group_key,))
+        conn.commit()
+        invalidate('transactions')
+        return cursor.rowcount